@@ -1,127 +1,342 @@
-from langchain_huggingface import HuggingFacePipeline
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+import os
+import queue
 import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+from cache import InProcessCache
+from metrics import Counter, Histogram
+from query_planner import QueryIntent
+
+MODEL_ID = os.environ.get("SMOLLM_MODEL", "HuggingFaceTB/SmolLM2-135M-Instruct")
+# SMOLLM_QUANTIZED=1: run an int8 dynamically quantized CPU copy of the model,
+# built once and then loaded from SMOLLM_CACHE_DIR
+QUANTIZED = os.environ.get("SMOLLM_QUANTIZED", "0") == "1"
+CACHE_DIR = os.environ.get("SMOLLM_CACHE_DIR", "model_cache")
+
+# Trademark-name extraction: answers are memoized per normalized question, and
+# concurrent questions are generated together, waiting at most BATCH_WAIT_MS
+# for up to MAX_BATCH prompts. Generation stops at the end of the answer line.
+EXTRACTION_CACHE_SIZE = int(os.environ.get("SMOLLM_EXTRACTION_CACHE_SIZE", 1024))
+EXTRACTION_CACHE_TTL = int(os.environ.get("SMOLLM_EXTRACTION_CACHE_TTL", 3600))
+MAX_BATCH = int(os.environ.get("SMOLLM_MAX_BATCH", 8))
+BATCH_WAIT_MS = float(os.environ.get("SMOLLM_BATCH_WAIT_MS", 5))
+# seconds a caller waits for its extraction before giving up
+SUBMIT_TIMEOUT = float(os.environ.get("SMOLLM_SUBMIT_TIMEOUT", 60))
+EXTRACTION_MAX_TOKENS = 16
+STOP_SEQUENCES = ["\n", "Question:"]
+
+# Filters recognised in a question besides the trademark name
+CATEGORY_PATTERN = re.compile(r'(?:category|class)\s*(\d+)', re.IGNORECASE)
+STATUS_PATTERN = re.compile(r'status\s*(?:code\s*)?(\d{3})', re.IGNORECASE)
+# "owned by Acme Inc in class 9" -> "Acme Inc"; a bare "owner" only counts when
+# a name follows it ("owner Acme", not "the owner of ..."), and the name ends
+# before a connective, another filter or trailing filler like "please"
+OWNER_PATTERN = re.compile(
+    r'\b(?:owned by|belonging to|owner(?!\s+(?:of|is|was|for|in)\b))\s+(.+?)'
+    r'(?=[\s,]+(?:in|under|with|for|and|please|thanks|thank you)\b|\s*(?:category|class|status)\b|[?!]|$)',
+    re.IGNORECASE,
+)
+# a cut-out filter leaves this behind, so "with status 700 for APPLE" cannot
+# become "with for APPLE"
+CUT = ' ; '
+# words a keyword pattern may land on that are never a trademark name
+NOT_A_NAME = {'FOR', 'THE', 'OF', 'IN', 'AND', 'ANY', 'BY', 'TO', 'IS', 'ARE'}
+
+
+llm_seconds = Histogram('llm_generate_seconds', "Duration of one batched generate() call", ['batch_size'],
+                        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+llm_extractions = Counter('llm_extractions_total', "Trademark-name extractions that needed the LLM", ['source'])
+
+
+def quantized_model_dir(model_id=MODEL_ID, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, model_id.strip('/').replace('/', '--') + '-int8')
+
+def load_quantized(model_id=MODEL_ID, cache_dir=CACHE_DIR):
+    """
+    (tokenizer, model) with every nn.Linear replaced by its int8 dynamic
+    quantized version. The first call quantizes the full-precision model and
+    saves the result (plus the tokenizer) under cache_dir; later starts load
+    that copy directly and never touch the fp32 weights.
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    path = quantized_model_dir(model_id, cache_dir)
+    model_file = os.path.join(path, 'model.pt')
+    if os.path.exists(model_file):
+        # our own pickled module, written below
+        model = torch.load(model_file, weights_only=False)
+        return AutoTokenizer.from_pretrained(path), model
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForCausalLM.from_pretrained(model_id)
+    model = torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+    os.makedirs(path, exist_ok=True)
+    tokenizer.save_pretrained(path)
+    torch.save(model, model_file + '.tmp')
+    os.replace(model_file + '.tmp', model_file)
+    return tokenizer, model
+
+
+def normalize_question(question):
+    """Cache key: case, spacing and trailing punctuation do not change the answer."""
+    return ' '.join(question.casefold().split()).rstrip('?!. ')
+
+def cut_at_stop(text, stop_sequences=STOP_SEQUENCES):
+    for stop in stop_sequences:
+        text = text.split(stop, 1)[0]
+    return text
+
+
+class GenerationBatcher:
+    """
+    Micro-batching queue in front of a batched generate(prompts) -> texts.
+    Callers block in submit() for at most `timeout` seconds; one worker thread
+    takes the first waiting prompt, gathers whatever else arrives within
+    `wait` seconds (up to max_batch) and runs them as one forward pass. A
+    failed batch fails only its own callers: the worker carries on, and is
+    restarted by the next submit() should it ever exit.
+    """
+    def __init__(self, generate, max_batch=MAX_BATCH, wait=BATCH_WAIT_MS / 1000, timeout=SUBMIT_TIMEOUT):
+        self.generate = generate
+        self.max_batch = max_batch
+        self.wait = wait
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.prompts = 0
+
+    def submit(self, prompt):
+        future = Future()
+        self._queue.put((prompt, future))
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='smollm-batcher', daemon=True)
+                self._worker.start()
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # if it is still queued, the worker skips it
+            future.cancel()
+            raise
+
+    def _run(self):
+        try:
+            while True:
+                self._run_batch(self._next_batch())
+        finally:
+            with self._lock:
+                self._worker = None
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # callers that gave up waiting are dropped
+        return [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run_batch(self, batch):
+        try:
+            # identical prompts in one batch are generated once
+            prompts = list(dict.fromkeys(prompt for prompt, _ in batch))
+            texts = list(self.generate(prompts)) if prompts else []
+            if len(texts) != len(prompts):
+                raise RuntimeError(f"generate() returned {len(texts)} texts for {len(prompts)} prompts")
+            texts = dict(zip(prompts, texts))
+            self.batches += 1
+            self.prompts += len(batch)
+            for prompt, future in batch:
+                future.set_result(texts[prompt])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
 
 class SmolLMWrapper:
-    def __init__(self):
-        self.tokenizer = AutoTokenizer.from_pretrained("HuggingFaceTB/SmolLM2-135M-Instruct")
-        self.model = AutoModelForCausalLM.from_pretrained("HuggingFaceTB/SmolLM2-135M-Instruct")
-        
-        self.pipe = pipeline(
-            "text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
-            max_new_tokens=50,     # Short responses only
-            temperature=0.1,       # Very focused responses
-            do_sample=False        # Deterministic output
-        )
-        print("Loaded pipeline")
-        
-        self.llm = HuggingFacePipeline(pipeline=self.pipe)
-        print("Loaded LLM")
-        
-        self.query_templates = {
-            "search": (
-                "query { \n"
-                "    searchMarks(keyword: \"%s\") { \n"
-                "        id\n"
-                "        markIdentification\n"
-                "        serialNumber\n"
-                "        categoryCode\n"
-                "        status\n"
-                "        caseFileOwners\n"
-                "    } \n"
-                "}"
-            ),
-            "category": (
-                "query { \n"
-                "    trademarksByCategory(category_code: \"%s\") { \n"
-                "        id\n"
-                "        markIdentification\n"
-                "        serialNumber\n"
-                "        categoryCode\n"
-                "        status\n"
-                "        caseFileOwners\n"
-                "    } \n"
-                "}"
+    """
+    The model is loaded on first use (or by start_background_load), not when
+    the wrapper is created, so the app serving it starts immediately and the
+    regex-only paths below never wait for it.
+    """
+    def __init__(self, model_id=MODEL_ID, quantized=QUANTIZED, cache_dir=CACHE_DIR):
+        self.model_id = model_id
+        self.quantized = quantized
+        self.cache_dir = cache_dir
+        self.tokenizer = None
+        self.model = None
+        self._load_lock = threading.Lock()
+        self.load_error = None
+        self.load_seconds = None
+        self.extraction_cache = InProcessCache(maxsize=EXTRACTION_CACHE_SIZE, ttl=EXTRACTION_CACHE_TTL)
+        self.batcher = GenerationBatcher(self.generate_batch)
+
+    @property
+    def ready(self):
+        return self.model is not None
+
+    def load(self):
+        """Loads tokenizer and model once; concurrent callers wait for the first."""
+        with self._load_lock:
+            if self.model is not None:
+                return
+            start = time.perf_counter()
+            # heavy imports too are deferred until the model is needed
+            from transformers import AutoTokenizer, AutoModelForCausalLM
+
+            if self.quantized:
+                tokenizer, model = load_quantized(self.model_id, self.cache_dir)
+            else:
+                tokenizer = AutoTokenizer.from_pretrained(self.model_id)
+                model = AutoModelForCausalLM.from_pretrained(self.model_id)
+
+            # batched generation pads on the left (decoder-only model)
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = 'left'
+
+            # generate_batch calls model.generate directly; the model is set
+            # last, as `ready` and the check above look at it
+            self.tokenizer = tokenizer
+            self.model = model
+            self.load_seconds = time.perf_counter() - start
+            print(f"Loaded LLM in {self.load_seconds:.1f}s")
+
+    def generate_batch(self, prompts, max_new_tokens=EXTRACTION_MAX_TOKENS):
+        """Greedy completions of several prompts in one generate() call, cut at STOP_SEQUENCES."""
+        import torch
+
+        if self.model is None:
+            self.load()
+        inputs = self.tokenizer(prompts, return_tensors='pt', padding=True)
+        with torch.inference_mode(), llm_seconds.time(batch_size=len(prompts)):
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                stop_strings=STOP_SEQUENCES,
+                tokenizer=self.tokenizer,
+                pad_token_id=self.tokenizer.pad_token_id,
             )
-        }
+        # only the generated part, not the prompt
+        texts = self.tokenizer.batch_decode(output[:, inputs['input_ids'].shape[1]:], skip_special_tokens=True)
+        return [cut_at_stop(text) for text in texts]
 
-    def _extract_trademark_name(self, question: str) -> str:
+    def start_background_load(self):
+        """Warms the model up on a daemon thread; failures are kept in load_error."""
+        def run():
+            try:
+                self.load()
+            except Exception as e:
+                self.load_error = e
+                print(f"Loading {self.model_id} failed: {e}")
+        thread = threading.Thread(target=run, name='smollm-load', daemon=True)
+        thread.start()
+        return thread
+
+    def _match_trademark_name(self, question: str):
         """
-        Extracts the trademark name from the question.
-        First, try regex patterns (for cases like "with NTHLIFE", "mark NTHLIFE", etc.).
-        If no match is found, fall back to the LLM extraction.
-        Returns the trademark in uppercase.
+        Regex-only trademark extraction (for cases like "with NTHLIFE",
+        "mark NTHLIFE", etc.); None when no pattern matches.
         """
         # Try several regex patterns to capture a likely trademark term.
         patterns = [
             r'with\s+([A-Z0-9]+)',         # e.g., "with NTHLIFE"
             r'mark(?:ed|)?\s+([A-Z0-9]+)',   # e.g., "mark NTHLIFE" or "marked NTHLIFE"
-            r'trademark(?:\s+name)?\s+([A-Z0-9]+)'  # e.g., "trademark NTHLIFE"
+            r'trademark(?:\s+name)?\s+([A-Z0-9]+)',  # e.g., "trademark NTHLIFE"
+            r'(?:for|called|named)\s+([A-Z0-9]+)'  # e.g., "status 700 for NTHLIFE"
         ]
         for pattern in patterns:
-            match = re.search(pattern, question, re.IGNORECASE)
-            if match:
+            for match in re.finditer(pattern, question, re.IGNORECASE):
                 trademark = match.group(1).upper()
                 # Additional check: if it’s a short word, we might not want it.
-                if len(trademark) >= 2:
+                if len(trademark) >= 2 and trademark not in NOT_A_NAME:
                     return trademark
+        return None
 
-        # Fallback: use LLM extraction.
+    def _extract_trademark_name(self, question: str) -> str:
+        """
+        Extracts the trademark name from the question.
+        First, try regex patterns, and if no match is found, fall back to the
+        LLM extraction. Returns the trademark in uppercase.
+        """
+        trademark = self._match_trademark_name(question)
+        if trademark:
+            return trademark
+
+        # Fallback: use LLM extraction (memoized, batched with concurrent questions).
+        key = normalize_question(question)
+        found, trademark = self.extraction_cache.get(key)
+        if found:
+            llm_extractions.inc(source='cache')
+            return trademark
+        llm_extractions.inc(source='model')
         prompt = (
             f"Extract ONLY the trademark name from this question. "
             f"Return just the name in capital letters.\n"
             f"Question: {question}\nTrademark:"
         )
-        response = self.llm(prompt).strip()
+        response = self.batcher.submit(prompt).strip()
         
         # Cleanup the response
         response = re.sub(r'["\']', '', response)  # Remove any quotes
         response = re.sub(r'trademark:\s*', '', response, flags=re.IGNORECASE)
         response = ' '.join(response.split())
-        return response.upper()
+        trademark = response.upper()
+        self.extraction_cache.set(key, trademark)
+        return trademark
 
     def _extract_category(self, question: str) -> str:
         """
         Extracts the category or class number from the question.
-        Supports phrases like "category 40" or "class 40".
+        Supports phrases like "category 40" or "class 40"; returned as the
+        stored three-digit code ("040").
         """
-        match = re.search(r'(?:category|class)\s*(\d+)', question, re.IGNORECASE)
+        match = CATEGORY_PATTERN.search(question)
+        if match:
+            return match.group(1).zfill(3)
+        return None
+
+    def _extract_status(self, question: str) -> str:
+        """USPTO status code, from phrases like "status 700" or "status code 630"."""
+        match = STATUS_PATTERN.search(question)
         if match:
             return match.group(1)
         return None
 
-    def get_graphql_query(self, user_question: str) -> str:
+    def _extract_owner(self, question: str) -> str:
+        """Owner name, from phrases like "owned by Acme Inc" or "owner Acme"."""
+        match = OWNER_PATTERN.search(question)
+        if match:
+            return match.group(1).strip(" ,")
+        return None
+
+    def get_intent(self, user_question: str) -> QueryIntent:
         """
-        Generates a GraphQL query based on the user's natural language question.
-        If a category/class number is provided, it includes it in the query.
-        Otherwise, it creates a simple trademark search query.
+        Structured form of the question. Category, status and owner phrases
+        are matched first and cut out before looking for a trademark name;
+        the LLM is only asked for one when the question has nothing else.
         """
-        # Extract trademark name
-        trademark = self._extract_trademark_name(user_question)
-        print("Extracted trademark:", trademark)
-        if not trademark:
-            raise ValueError("Could not extract a valid trademark name from the question")
-        
-        # Extract category (if any)
-        category = self._extract_category(user_question)
-        print("Extracted category:", category)
-        
-        if category:
-            # Generate query including both trademark and category filtering.
-            return (
-                "query {\n"
-                f"    searchMarks(keyword: \"{trademark}\", category_code: \"{category}\") {{\n"
-                "        id\n"
-                "        markIdentification\n"
-                "        serialNumber\n"
-                "        categoryCode\n"
-                "        status\n"
-                "        caseFileOwners\n"
-                "    }\n"
-                "}}"
-            )
-        else:
-            # Generate trademark-only search query.
-            return self.query_templates["search"] % trademark
\ No newline at end of file
+        intent = QueryIntent(
+            category=self._extract_category(user_question),
+            status=self._extract_status(user_question),
+            owner=self._extract_owner(user_question),
+        )
+        rest = user_question
+        for pattern in (CATEGORY_PATTERN, STATUS_PATTERN, OWNER_PATTERN):
+            rest = pattern.sub(CUT, rest)
+        intent.keyword = self._match_trademark_name(rest)
+        if not intent:
+            intent.keyword = self._extract_trademark_name(user_question) or None
+        return intent
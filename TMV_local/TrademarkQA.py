@@ -1,24 +1,35 @@
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-import graphene
+import os
+import sys
+from query_planner import QueryPlanner, flatten_page
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+from metrics import Histogram, resolver_middleware
+
+# 'intent' includes any LLM extraction; llm_generate_seconds times the model alone
+qa_stage_seconds = Histogram('qa_stage_seconds', "Time per /api/query stage", ['stage'])
 
 class TrademarkQA:
     def __init__(self, llm_wrapper, schema):
         self.llm = llm_wrapper
         self.schema = schema
+        # prebuilt, validated operations; questions only supply variables
+        self.planner = QueryPlanner(schema, middleware=resolver_middleware())
         # self.memory = ConversationBufferMemory(
         #     memory_key="chat_history",
         #     return_messages=True
         # )
     
-    def process_query(self, user_question: str):
+    def process_query(self, user_question: str, first=None, after=None):
+        # first / after page through the answer like the *Connection fields
         try:
-            # Generate GraphQL query
-            graphql_query = self.llm.get_graphql_query(user_question)
-            print('Generated GraphQL query:', graphql_query)
+            # Structured intent (keyword, category, owner, status)
+            with qa_stage_seconds.time(stage='intent'):
+                intent = self.llm.get_intent(user_question)
+            print('Query intent:', intent)
             
-            # Execute using your existing schema
-            result = self.schema.execute(graphql_query)
+            # Execute the matching prebuilt operation on your existing schema
+            with qa_stage_seconds.time(stage='graphql'):
+                result = self.planner.execute(intent, first, after)
             
             if result.errors:
                 return {"error": str(result.errors[0])}
@@ -27,7 +38,7 @@ class TrademarkQA:
             # self.memory.chat_memory.add_user_message(user_question)
             # self.memory.chat_memory.add_ai_message(str(result.data))
             
-            return result.data
+            return flatten_page(result.data)
             
         except Exception as e:
             return {"error": str(e)}
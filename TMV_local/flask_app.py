@@ -1,75 +1,34 @@
-from flask import Flask
+import os
+import sys
+from flask import Flask, Response
 from flask_graphql import GraphQLView
-import graphene
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import Session, declarative_base
-from sqlalchemy import Column, Integer, String, Text
 from TrademarkQA import TrademarkQA
 from SmolLMWrapper import SmolLMWrapper
 from flask import request, jsonify
 
+# Reuse the GraphQL schema of the deployed service (trademarkvista/)
+os.environ.setdefault('DATABASE_URL', 'postgresql://localhost/trademark_db')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+import db
+from schema import schema, start_index_builds
+from export import export
+import metrics
+
 # Flask App
 app = Flask(__name__)
+db.init_app(app)
+app.register_blueprint(export)
+start_index_builds()
 
-# Database Setup
-engine = create_engine('postgresql://localhost/trademark_db')
-Base = declarative_base()
-
-# SQLAlchemy Model
-class TrademarkModel(Base):
-    __tablename__ = 'trademarks'
-    id = Column(Integer, primary_key=True)
-    category_code = Column(String)
-    mark_identification = Column(Text)
-    serial_number = Column(String, unique=True)
-    case_file_owners = Column(Text)
-    status = Column(String)
-    xml_filename = Column(String)
-
-# GraphQL Schema
-class Trademark(graphene.ObjectType):
-    id = graphene.Int()
-    category_code = graphene.String()
-    mark_identification = graphene.String()
-    serial_number = graphene.String()
-    case_file_owners = graphene.String()
-    status = graphene.String()
-    xml_filename = graphene.String()
-
-class Query(graphene.ObjectType):
-    all_trademarks = graphene.List(Trademark)
-    trademark_by_serial = graphene.Field(Trademark, serial_number=graphene.String())
-    trademarks_by_category = graphene.List(Trademark, category_code=graphene.String())
-    search_marks = graphene.List(Trademark, keyword=graphene.String())
-
-    def resolve_all_trademarks(self, info):
-        with Session(engine) as session:
-            return session.execute(select(TrademarkModel)).scalars().all()
-
-    def resolve_trademark_by_serial(self, info, serial_number):
-        with Session(engine) as session:
-            return session.execute(
-                select(TrademarkModel).filter_by(serial_number=serial_number)
-            ).scalar_one_or_none()
-
-    def resolve_trademarks_by_category(self, info, category_code):
-        with Session(engine) as session:
-            return session.execute(
-                select(TrademarkModel).filter_by(category_code=category_code)
-            ).scalars().all()
-
-    def resolve_search_marks(self, info, keyword):
-        with Session(engine) as session:
-            return session.execute(
-                select(TrademarkModel).filter(
-                    TrademarkModel.mark_identification.ilike(f'%{keyword}%')
-                )
-            ).scalars().all()
-
-schema = graphene.Schema(query=Query)
-
-# Initialize QA components
+# Initialize QA components. The model loads in the background by default so
+# /graphql is served right away; SMOLLM_PRELOAD=lazy waits for the first
+# question that needs it, eager loads it before the app starts.
 llm_wrapper = SmolLMWrapper()
+preload = os.environ.get('SMOLLM_PRELOAD', 'background')
+if preload == 'eager':
+    llm_wrapper.load()
+elif preload == 'background':
+    llm_wrapper.start_background_load()
 qa_system = TrademarkQA(llm_wrapper, schema)
 
 # Add these new routes to your existing Flask app
@@ -81,9 +40,23 @@ def query_endpoint():
     if not user_question:
         return jsonify({"error": "No question provided"}), 400
         
-    result = qa_system.process_query(user_question)
+    # optional paging: first (page size) and after (pageInfo.endCursor of the previous page)
+    first, after = data.get('first'), data.get('after')
+    # bool is an int subclass: reject true / false explicitly
+    if first is not None and (not isinstance(first, int) or isinstance(first, bool) or first < 0):
+        return jsonify({"error": "first must be a non-negative integer"}), 400
+    result = qa_system.process_query(user_question, first, after)
     return jsonify(result)
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    # readiness probe: 200 once the model is loaded, 503 while loading or after a failure
+    if llm_wrapper.ready:
+        return jsonify({"model": "ready", "load_seconds": llm_wrapper.load_seconds})
+    if llm_wrapper.load_error is not None:
+        return jsonify({"model": "error", "error": str(llm_wrapper.load_error)}), 503
+    return jsonify({"model": "loading" if preload != 'lazy' else "not loaded"}), 503
+
 @app.route('/api/chat_history', methods=['GET'])
 def get_history():
     messages = qa_system.get_chat_history()
@@ -95,9 +68,14 @@ app.add_url_rule(
     view_func=GraphQLView.as_view(
         'graphql',
         schema=schema,
-        graphiql=True
+        graphiql=True,
+        middleware=metrics.resolver_middleware(),
     )
 )
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
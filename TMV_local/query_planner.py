@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from graphql import parse, validate
+from graphql.execution import execute
+
+# Answers a QueryIntent with one of a few fixed GraphQL operations. They are
+# parsed and validated against the schema once, then executed with variables,
+# so no query text is built or re-parsed per question. Every operation aliases
+# its connection field to searchMarks, the key the Streamlit front end renders;
+# pageInfo.endCursor is passed back as `after` to fetch the next page.
+
+RESULT_FIELDS = "id markIdentification serialNumber categoryCode status caseFileOwners"
+PAGE_FIELDS = f"edges {{ node {{ {RESULT_FIELDS} }} }} pageInfo {{ hasNextPage endCursor }}"
+
+DOCUMENTS = {
+    "search": (
+        "query Search($keyword: String, $owner: String, $categoryCode: String, $status: String, "
+        "$first: Int, $after: String) {\n"
+        "    searchMarks: searchMarksConnection(keyword: $keyword, owner: $owner, categoryCode: $categoryCode, "
+        "status: $status, first: $first, after: $after) {\n"
+        f"        {PAGE_FIELDS}\n"
+        "    }\n"
+        "}"
+    ),
+    "category": (
+        "query ByCategory($categoryCode: String!, $first: Int, $after: String) {\n"
+        "    searchMarks: trademarksByCategoryConnection(categoryCode: $categoryCode, first: $first, after: $after) {\n"
+        f"        {PAGE_FIELDS}\n"
+        "    }\n"
+        "}"
+    ),
+    "owner": (
+        "query ByOwner($owner: String!, $first: Int, $after: String) {\n"
+        "    searchMarks: trademarksByOwnerConnection(owner: $owner, first: $first, after: $after) {\n"
+        f"        {PAGE_FIELDS}\n"
+        "    }\n"
+        "}"
+    ),
+}
+
+
+@dataclass
+class QueryIntent:
+    """What a question asks for; any field may be missing."""
+    keyword: Optional[str] = None
+    category: Optional[str] = None
+    owner: Optional[str] = None
+    status: Optional[str] = None
+
+    def __bool__(self):
+        return any((self.keyword, self.category, self.owner, self.status))
+
+
+class QueryPlanner:
+    def __init__(self, schema, documents=DOCUMENTS, middleware=None):
+        self.schema = schema
+        self.middleware = middleware
+        self.documents = {}
+        for name, text in documents.items():
+            document = parse(text)
+            errors = validate(schema, document)
+            if errors:
+                raise ValueError(f"Invalid {name} query: {errors[0]}")
+            self.documents[name] = document
+
+    def plan(self, intent, first=None, after=None):
+        """(operation name, variables) for an intent."""
+        if not intent:
+            raise ValueError("Could not find a trademark, category, owner or status in the question")
+        page = {"first": first, "after": after}
+        if intent.category and not (intent.keyword or intent.owner or intent.status):
+            return "category", dict(page, categoryCode=intent.category)
+        if intent.owner and not (intent.keyword or intent.category or intent.status):
+            # exact (normalized) owner match through the owners tables
+            return "owner", dict(page, owner=intent.owner)
+        # keyword / owner substrings plus category and status filters, in one statement
+        return "search", dict(
+            page,
+            keyword=intent.keyword,
+            owner=intent.owner,
+            categoryCode=intent.category,
+            status=intent.status,
+        )
+
+    def execute(self, intent, first=None, after=None):
+        name, variables = self.plan(intent, first, after)
+        return execute(self.schema, self.documents[name], variable_values=variables, middleware=self.middleware)
+
+def flatten_page(data):
+    """{'searchMarks': [marks], 'pageInfo': {...}} from a connection-shaped result."""
+    page = data["searchMarks"] or {}
+    return {
+        "searchMarks": [edge["node"] for edge in page.get("edges") or []],
+        "pageInfo": page.get("pageInfo") or {"hasNextPage": False, "endCursor": None},
+    }
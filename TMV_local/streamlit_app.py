@@ -1,7 +1,12 @@
-import streamlit as st
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import pandas as pd
 import requests
-import json
-from typing import List, Dict, Any
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 st.set_page_config(
     page_title="TrademarkVista",
@@ -10,100 +15,170 @@ st.set_page_config(
 )
 
 # Constants
-API_ENDPOINT = "http://127.0.0.1:5000/api/query" #for local hosting only
+API_ENDPOINT = os.environ.get("TMV_API_ENDPOINT", "http://127.0.0.1:5000/api/query") #for local hosting only
+# (connect, read) seconds; the read timeout covers a cold LLM extraction
+API_TIMEOUT = (float(os.environ.get("TMV_CONNECT_TIMEOUT", 3.05)), float(os.environ.get("TMV_READ_TIMEOUT", 60)))
+# marks fetched per request; "Load more" asks the API for the next page
+PAGE_SIZE = int(os.environ.get("TMV_PAGE_SIZE", 50))
+# seconds a repeated question is answered from this app's cache
+CACHE_TTL = int(os.environ.get("TMV_CACHE_TTL", 300))
+# API calls run on these threads; open answers are checked every POLL_SECONDS
+FETCH_WORKERS = int(os.environ.get("TMV_FETCH_WORKERS", 8))
+POLL_SECONDS = 0.5
+
+COLUMNS = {
+    "markIdentification": "Mark",
+    "serialNumber": "Serial #",
+    "categoryCode": "Category",
+    "caseFileOwners": "Owner",
+    "status": "Status",
+}
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One pooled session for every user and rerun, so chat turns reuse the API connection."""
+    session = requests.Session()
+    # retry only failures to connect: a POST the API may have started is not repeated
+    retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries))
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+@st.cache_resource
+def fetch_pool() -> ThreadPoolExecutor:
+    """Worker threads shared by all sessions: a script run never waits on the API."""
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="tmv-fetch")
 
-def query_trademark_api(question: str) -> Dict[str, Any]:
+@st.cache_data(ttl=CACHE_TTL, max_entries=256, show_spinner=False)
+def fetch_page(question: str, first: int, after: Optional[str]) -> Dict[str, Any]:
+    """One page of answers; raising (instead of returning an error) keeps failures out of the cache."""
+    response = http_session().post(
+        API_ENDPOINT,
+        json={"question": question, "first": first, "after": after},
+        timeout=API_TIMEOUT,
+    )
+    response.raise_for_status()
+    data = response.json()
+    if "error" in data:
+        raise ValueError(data["error"])
+    return data
+
+def query_trademark_api(question: str, after: Optional[str] = None) -> Dict[str, Any]:
     """Send a natural language query to the TrademarkQA system"""
+    # the same question in other spacing is the same cache entry
+    question = " ".join(question.split())
     try:
-        response = requests.post(
-            API_ENDPOINT,
-            json={"question": question},
-            headers={"Content-Type": "application/json"}
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"API Error: {str(e)}")
+        return fetch_page(question, PAGE_SIZE, after)
+    except requests.exceptions.Timeout:
+        return {"error": f"The API did not answer within {API_TIMEOUT[1]:.0f}s, please try again."}
+    except (requests.exceptions.RequestException, ValueError) as e:
         return {"error": str(e)}
 
-def format_results(data: Dict[str, Any]) -> str:
-    """Format the GraphQL results into readable text"""
-    if "error" in data:
-        return f"❌ Error: {data['error']}"
-    
-    # Handle search results
-    if "searchMarks" in data:
-        marks = data["searchMarks"]
-        if not marks:
-            return "No matching trademarks found."
-        
-        results = []
-        for mark in marks:
-            owners = mark.get("caseFileOwners", "Unknown Owner")
-            status = mark.get("status", "Unknown Status")
-            results.append(
-                f"**{mark['markIdentification']}**\n"
-                f"Serial #: {mark.get('serialNumber', 'N/A')}\n"
-                f"Category: {mark.get('categoryCode', 'N/A')}\n"
-                f"Owner: {owners}\n"
-                f"Status: {status}"
-            )
-        return "\n\n".join(results)
-    
-    # Other query types can be added here
-    return json.dumps(data, indent=2)
+def results_table(marks) -> pd.DataFrame:
+    """The marks as a table; st.dataframe only draws the rows in view."""
+    table = pd.DataFrame(marks, columns=list(COLUMNS)).rename(columns=COLUMNS)
+    return table.fillna({"Owner": "Unknown Owner", "Status": "Unknown Status"})
+
+def answer(question: str) -> Dict[str, Any]:
+    """A new assistant message; its first page is fetched in the background."""
+    message = {"role": "assistant", "question": question, "marks": [], "page_info": {}}
+    message["pending"] = fetch_pool().submit(query_trademark_api, question)
+    return message
+
+def load_more(message: Dict[str, Any]):
+    message["pending"] = fetch_pool().submit(
+        query_trademark_api, message["question"], message["page_info"].get("endCursor")
+    )
+
+def add_page(message: Dict[str, Any], response: Dict[str, Any]):
+    if "error" in response:
+        message["error"] = response["error"]
+        return
+    message.pop("error", None)
+    message["marks"].extend(response.get("searchMarks") or [])
+    message["page_info"] = response.get("pageInfo") or {}
+
+@st.fragment(run_every=POLL_SECONDS)
+def pending_page(message: Dict[str, Any]):
+    """Reruns on its own until the fetch is done, leaving the rest of the page usable meanwhile."""
+    future = message["pending"]
+    if not future.done():
+        st.caption("⏳ Searching trademark database...")
+        return
+    add_page(message, future.result())
+    del message["pending"]
+    st.rerun()
+
+def show_message(index: int, message: Dict[str, Any]):
+    with st.chat_message(message["role"]):
+        if message["role"] == "user":
+            st.markdown(message["content"])
+            return
+        marks = message["marks"]
+        pending = "pending" in message
+        if marks:
+            more = message["page_info"].get("hasNextPage")
+            st.caption(f"{len(marks)} trademarks shown" + (", more available" if more else ""))
+            st.dataframe(results_table(marks), use_container_width=True, hide_index=True)
+            if more and not pending and st.button("Load more", key=f"more-{index}"):
+                load_more(message)
+                st.rerun()
+            with st.expander("View Results as JSON"):
+                st.json(marks, expanded=False)
+        elif not pending and "error" not in message:
+            st.markdown("No matching trademarks found.")
+        if pending:
+            pending_page(message)
+        elif "error" in message:
+            st.error(f"❌ Error: {message['error']}")
 
 def main():
     st.title("🔍 TrademarkVista")
     st.subheader("Search USPTO Trademark Database using Natural Language")
-    
+    if "messages" not in st.session_state:
+        st.session_state.messages = []
+
     # Sidebar
     #st.sidebar.image("https://via.placeholder.com/150x150?text=TM", width=150)
-    
+
     # Clear chat button
     if st.sidebar.button("🗑️ New Search", use_container_width=True):
         st.session_state.messages = []
         st.rerun()
-        
+
     st.sidebar.markdown("### About")
     st.sidebar.markdown(
         "TrademarkVista allows you to query USPTO trademark data "
         "using natural language. Ask questions about trademarks, "
         "owners, categories, and more."
     )
-    
+
     st.sidebar.markdown("### Example Questions")
     example_questions = [
         "Are there any trademarks with NTHLIFE?",
         "What trademarks are in class 40?",
     ]
-    
-    for question in example_questions:
-        if st.sidebar.button(f"Try: {question[:30]}...", key=question):
+
+    question = None
+    for example in example_questions:
+        if st.sidebar.button(f"Try: {example[:30]}...", key=example):
             # Clear previous conversation when using examples
             st.session_state.messages = []
-            st.session_state.messages.append({"role": "user", "content": question})
-            query_and_display(question)
-    
+            question = example
+
     #Chat input
     if prompt := st.chat_input("Ask about a trademark..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
-        query_and_display(prompt)
-
-def query_and_display(question: str):
-    """Query the API and display results in the chat interface"""
-    with st.chat_message("assistant"):
-        with st.spinner("Searching trademark database..."):
-            response = query_trademark_api(question)
-            formatted_response = format_results(response)
-            st.markdown(formatted_response)
-            
-            # Add a "GraphQL Query" expander to show the underlying query
-            if "searchMarks" in response and len(response["searchMarks"]) > 0:
-                with st.expander("View Results as JSON"):
-                    st.json(response)
+        question = prompt
+    if question:
+        st.session_state.messages.append({"role": "user", "content": question})
+        st.session_state.messages.append(answer(question))
+
+    # every turn is redrawn from session state on every rerun; answers still
+    # being fetched poll for their result (pending_page)
+    for index, message in enumerate(st.session_state.messages):
+        show_message(index, message)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
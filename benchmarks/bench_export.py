@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+parser = argparse.ArgumentParser(description="Full-table export: one GraphQL response vs streamed /export")
+parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+parser.add_argument('--rows', type=int, default=1000000, help="MAX_PAGE_SIZE for the single GraphQL request")
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database_url
+os.environ['MAX_PAGE_SIZE'] = str(args.rows)
+os.environ.setdefault('CACHE_BACKEND', 'none')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+import app
+
+FIELDS = "id categoryCode markIdentification serialNumber caseFileOwners status xmlFilename"
+
+
+def measure(request):
+    """(seconds to first byte, total seconds, bytes, peak traced MB) of one streamed response."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    size = 0
+    response = request()
+    for chunk in response.response:
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    response.close()
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, size, peak / 1024 / 1024
+
+
+def main():
+    client = app.app.test_client()
+    runs = {
+        'graphql allTrademarks': lambda: client.post(
+            '/graphql', json={'query': f'{{ allTrademarks(first: {args.rows}) {{ {FIELDS} }} }}'}, buffered=False
+        ),
+        'export ndjson': lambda: client.get('/export?format=ndjson', buffered=False),
+        'export csv': lambda: client.get('/export?format=csv', buffered=False),
+    }
+    print(f"{'request':>22} {'first byte s':>13} {'total s':>8} {'MB sent':>8} {'peak MB':>8}")
+    for name, request in runs.items():
+        first, total, size, peak = measure(request)
+        print(f"{name:>22} {first:>13.3f} {total:>8.2f} {size / 1024 / 1024:>8.1f} {peak:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'TMV_local'))
+import SmolLMWrapper as smollm
+
+# Questions the regex patterns do not match, so each one needs the model
+QUESTIONS = [
+    "is anything registered for dreamspark software",
+    "who owns the brand bluewave",
+    "does sunpeak exist as a brand",
+    "any filings for quantumleaf",
+    "lookup redfalcon please",
+    "what about silverpine",
+    "is there something called nightowl",
+    "search for coppercrest",
+]
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def langchain_pipeline(wrapper):
+    """The langchain text-generation pipeline SmolLMWrapper used to answer with, for comparison."""
+    from transformers import pipeline
+    from langchain_huggingface import HuggingFacePipeline
+
+    pipe = pipeline("text-generation", model=wrapper.model, tokenizer=wrapper.tokenizer,
+                    max_new_tokens=50, temperature=0.1, do_sample=False)
+    return HuggingFacePipeline(pipeline=pipe)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trademark-name extraction: one generation per question vs cached, batched")
+    parser.add_argument('--clients', type=int, default=8, help="concurrent questions")
+    args = parser.parse_args()
+    questions = (QUESTIONS * (args.clients // len(QUESTIONS) + 1))[:args.clients]
+
+    wrapper = smollm.SmolLMWrapper()
+    wrapper.load()
+    prompts = [
+        f"Extract ONLY the trademark name from this question. Return just the name in capital letters.\n"
+        f"Question: {q}\nTrademark:" for q in questions
+    ]
+    llm = langchain_pipeline(wrapper)
+    llm.invoke(prompts[0])  # warm-up
+
+    results = []
+    # before: the langchain pipeline, up to 50 new tokens per question, one at a time
+    results.append(('llm() per question', timed(lambda: [llm.invoke(p) for p in prompts])))
+
+    for max_batch in (1, args.clients):
+        wrapper.batcher = smollm.GenerationBatcher(wrapper.generate_batch, max_batch=max_batch)
+        wrapper.extraction_cache.clear()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            seconds = timed(lambda: list(pool.map(wrapper._extract_trademark_name, questions)))
+        results.append((f"batched (max_batch={max_batch})", seconds))
+
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results.append(('cached repeat', timed(lambda: list(pool.map(wrapper._extract_trademark_name, questions)))))
+
+    print(f"{args.clients} concurrent questions")
+    print(f"{'mode':>24} {'total s':>8} {'ms/question':>12}")
+    for mode, seconds in results:
+        print(f"{mode:>24} {seconds:>8.2f} {seconds / args.clients * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
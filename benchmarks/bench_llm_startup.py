@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+TMV_LOCAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'TMV_local')
+PROMPT = "Extract ONLY the trademark name from this question.\nQuestion: Is there a mark called DreamSpark?\nTrademark:"
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def child_app(preload):
+    """Seconds until the Flask app answers /graphql, with the model loaded per SMOLLM_PRELOAD."""
+    start = time.perf_counter()
+    os.environ['SMOLLM_PRELOAD'] = preload
+    sys.path.insert(0, TMV_LOCAL)
+    import flask_app
+    response = flask_app.app.test_client().post('/graphql', json={'query': '{ __typename }'})
+    assert response.status_code == 200
+    return {'first_graphql_seconds': time.perf_counter() - start, 'rss_mb': rss_mb()}
+
+
+def child_model(quantized, tokens):
+    """Cold start (imports + load), RSS and greedy per-token latency of one model variant."""
+    start = time.perf_counter()
+    sys.path.insert(0, TMV_LOCAL)
+    import torch
+    from SmolLMWrapper import SmolLMWrapper
+    wrapper = SmolLMWrapper(quantized=quantized)
+    wrapper.load()
+    load_seconds = time.perf_counter() - start
+
+    inputs = wrapper.tokenizer(PROMPT, return_tensors='pt')
+    with torch.inference_mode():
+        wrapper.model.generate(**inputs, max_new_tokens=4, do_sample=False)  # warm-up
+        timings = []
+        for _ in range(3):
+            generate_start = time.perf_counter()
+            wrapper.model.generate(**inputs, min_new_tokens=tokens, max_new_tokens=tokens, do_sample=False)
+            timings.append((time.perf_counter() - generate_start) / tokens)
+    return {'cold_start_seconds': load_seconds, 'rss_mb': rss_mb(), 'ms_per_token': min(timings) * 1000}
+
+
+def run_child(*args, env=None):
+    out = subprocess.run(
+        [sys.executable, __file__, '--child', *args],
+        capture_output=True, text=True, env=dict(os.environ, **(env or {})), check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SmolLM cold start, RSS and per-token latency (fp32 vs int8)")
+    parser.add_argument('--tokens', type=int, default=32, help="tokens generated per timed run")
+    parser.add_argument('--cache-dir', default='model_cache', help="SMOLLM_CACHE_DIR for the int8 copy")
+    parser.add_argument('--child', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, value = args.child
+        result = child_app(value) if kind == 'app' else child_model(value == 'int8', args.tokens)
+        print(json.dumps(result))
+        return
+
+    env = {'SMOLLM_CACHE_DIR': args.cache_dir}
+    print(f"{'app start':>26} {'first /graphql s':>17} {'RSS MB':>8}")
+    for preload in ('eager', 'background'):
+        r = run_child('app', preload, env=env)
+        print(f"{'SMOLLM_PRELOAD=' + preload:>26} {r['first_graphql_seconds']:>17.2f} {r['rss_mb']:>8.0f}")
+
+    print(f"\n{'model':>26} {'cold start s':>13} {'RSS MB':>8} {'ms/token':>9}")
+    for label, variant in (('fp32', 'fp32'), ('int8 (quantize+save)', 'int8'), ('int8 (from cache)', 'int8')):
+        r = run_child('model', variant, '--tokens', str(args.tokens), env=env)
+        print(f"{label:>26} {r['cold_start_seconds']:>13.2f} {r['rss_mb']:>8.0f} {r['ms_per_token']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
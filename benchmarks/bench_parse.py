@@ -0,0 +1,39 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uspto_db'))
+from process_xml import process_xml_files_parallel
+
+
+def run(xml_dir, workers):
+    xml_files = sorted(f for f in os.listdir(xml_dir) if f.endswith('.xml'))
+    start = time.perf_counter()
+    df = process_xml_files_parallel(xml_files, xml_dir, workers)
+    elapsed = time.perf_counter() - start
+    return {
+        'workers': workers,
+        'files': len(xml_files),
+        'case_files': len(df),
+        'seconds': elapsed,
+        'files_per_sec': len(xml_files) / elapsed,
+        'case_files_per_sec': len(df) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark XML parsing throughput")
+    parser.add_argument('xml_dir', help="directory containing extracted apc*.xml files")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'files':>6} {'case-files':>11} {'seconds':>8} {'files/s':>8} {'case-files/s':>13}")
+    for workers in args.workers:
+        r = run(args.xml_dir, workers)
+        print(f"{r['workers']:>8} {r['files']:>6} {r['case_files']:>11} {r['seconds']:>8.2f} "
+              f"{r['files_per_sec']:>8.2f} {r['case_files_per_sec']:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+parser = argparse.ArgumentParser(description="Rows/sec and memory for wide vs narrow selections")
+parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+parser.add_argument('--rows', type=int, default=1000, help="page size per query (capped by MAX_PAGE_SIZE)")
+parser.add_argument('--repeat', type=int, default=20)
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database_url
+os.environ.setdefault('MAX_PAGE_SIZE', str(args.rows))
+os.environ.setdefault('CACHE_BACKEND', 'none')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from db import engine, TrademarkModel, session_scope
+from schema import schema
+
+WIDE = "id categoryCode markIdentification serialNumber caseFileOwners status xmlFilename"
+NARROW = "markIdentification serialNumber"
+
+
+def measure(run):
+    run()  # warm up
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = 0
+    for _ in range(args.repeat):
+        rows += run()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows / elapsed, peak / 1024 / 1024
+
+
+def graphql_run(fields):
+    def run():
+        with session_scope():
+            result = schema.execute(f"{{ allTrademarks(first: {args.rows}) {{ {fields} }} }}")
+        assert not result.errors, result.errors
+        return len(result.data['allTrademarks'])
+    return run
+
+def sql_run(*entities):
+    def run():
+        with Session(engine) as session:
+            return len(session.execute(select(*entities).order_by(TrademarkModel.id).limit(args.rows)).all())
+    return run
+
+
+def main():
+    scenarios = [
+        ('sql  ORM entities', sql_run(TrademarkModel)),
+        ('sql  2 columns', sql_run(TrademarkModel.mark_identification, TrademarkModel.serial_number)),
+        ('gql  wide (7 fields)', graphql_run(WIDE)),
+        ('gql  narrow (2 fields)', graphql_run(NARROW)),
+    ]
+    print(f"{'scenario':<24} {'rows/s':>10} {'peak MiB':>9}")
+    for name, run in scenarios:
+        rate, peak = measure(run)
+        print(f"{name:<24} {rate:>10.0f} {peak:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
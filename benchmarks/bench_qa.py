@@ -0,0 +1,100 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="End-to-end /api/query latency: generated query text vs prebuilt operations")
+parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+parser.add_argument('--repeat', type=int, default=20)
+parser.add_argument('--cache', action='store_true', help="keep the API query cache on (CACHE_BACKEND=memory)")
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = args.database_url
+os.environ.setdefault('CACHE_BACKEND', 'memory' if args.cache else 'none')
+# measure the request path, not a model warming up on another thread
+os.environ.setdefault('SMOLLM_PRELOAD', 'lazy')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'TMV_local'))
+import flask_app
+from query_planner import DOCUMENTS
+
+QUESTIONS = [
+    "Are there any trademarks with NTHLIFE?",
+    "Is there a mark SUN in class 9?",
+    "What trademarks are in class 40?",
+    "trademarks owned by Acme Inc",
+    "marks with STAR status 700",
+]
+
+
+class TextQueries:
+    """
+    The previous path: the trademark name is always extracted (falling back to
+    the LLM), a query string is built with f-strings, and schema.execute parses
+    and validates it on every request. Uses the corrected categoryCode argument.
+    """
+    def __init__(self, wrapper, schema):
+        self.wrapper = wrapper
+        self.schema = schema
+
+    def process_query(self, question, first=None, after=None):
+        # always the first MAX_PAGE_SIZE rows, as before paging
+        keyword = self.wrapper._extract_trademark_name(question)
+        category = self.wrapper._extract_category(question)
+        arguments = f'keyword: {json.dumps(keyword)}'
+        if category:
+            arguments += f', categoryCode: {json.dumps(category)}'
+        result = self.schema.execute(
+            "query {\n"
+            f"    searchMarks({arguments}) {{\n"
+            "        id markIdentification serialNumber categoryCode status caseFileOwners\n"
+            "    }\n"
+            "}"
+        )
+        if result.errors:
+            return {"error": str(result.errors[0])}
+        return result.data
+
+
+def measure(client, question):
+    with contextlib.redirect_stdout(io.StringIO()):  # the per-request logging
+        return _measure(client, question)
+
+
+def _measure(client, question):
+    # the first request pays for any LLM extraction, later ones hit its cache
+    start = time.perf_counter()
+    client.post('/api/query', json={'question': question})
+    first = (time.perf_counter() - start) * 1000
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        response = client.post('/api/query', json={'question': question})
+        timings.append((time.perf_counter() - start) * 1000)
+    return response.get_json(), first, timings
+
+
+def main():
+    client = flask_app.app.test_client()
+    prebuilt = flask_app.qa_system
+    modes = {'text': TextQueries(flask_app.llm_wrapper, flask_app.schema), 'prebuilt': prebuilt}
+    print(f"{len(DOCUMENTS)} prebuilt operations, {args.repeat} requests per question, "
+          f"cache {os.environ['CACHE_BACKEND']}")
+    print(f"{'mode':>9} {'question':>40} {'rows':>5} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode, qa in modes.items():
+        flask_app.qa_system = qa
+        flask_app.llm_wrapper.extraction_cache.clear()
+        for question in QUESTIONS:
+            data, first, timings = measure(client, question)
+            rows = len(data.get('searchMarks') or []) if 'error' not in data else 'err'
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(f"{mode:>9} {question[:40]:>40} {rows:>5} {first:>9.1f} {statistics.median(timings):>8.2f} {p95:>8.2f}")
+    flask_app.qa_system = prebuilt
+    print(f"model loaded: {flask_app.llm_wrapper.ready}, LLM extractions: {flask_app.llm_wrapper.batcher.prompts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="searchMarks latency per search backend")
+    parser.add_argument('keywords', nargs='+', help="keywords to search for")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--backend', choices=['ilike', 'trigram', 'memory', 'fts'], nargs='+', default=['ilike', 'trigram'])
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        # or SNAPSHOT_PATH for a read-only snapshot (--backend fts)
+        os.environ['DATABASE_URL'] = args.database_url
+    # db.py connects at import time, so only once DATABASE_URL is set
+    sys.path.insert(0, os.path.join(HERE, '..', 'trademarkvista'))
+    from sqlalchemy.orm import Session
+    from db import engine, TrademarkModel
+    from search import IlikeSearch, TrigramSearch, InMemorySearch, FtsSearch
+
+    backends = {'ilike': IlikeSearch, 'trigram': TrigramSearch, 'memory': InMemorySearch, 'fts': FtsSearch}
+    columns = [TrademarkModel.id, TrademarkModel.mark_identification]
+
+    print(f"{'backend':>8} {'keyword':>16} {'rows':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in args.backend:
+        backend = backends[name]()
+        with Session(engine) as session:
+            # warm up (and build the in-memory index) outside the timed runs
+            backend.search(session, columns, keyword=args.keywords[0])
+            for keyword in args.keywords:
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    rows = backend.search(session, columns, keyword=keyword)
+                    timings.append((time.perf_counter() - start) * 1000)
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                print(f"{name:>8} {keyword:>16} {len(rows):>6} {statistics.median(timings):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
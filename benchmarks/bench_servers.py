@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(HERE, '..', 'trademarkvista')
+
+# The sync Flask app as deployed (gunicorn.conf.py: 2 workers x 4 threads)
+# against the ASGI app on uvicorn with the same number of worker processes.
+SERVERS = {
+    'sync (gunicorn app:app)': ['gunicorn', '-c', 'gunicorn.conf.py', '-b', '127.0.0.1:{port}', 'app:app'],
+    'async (uvicorn asgi:app)': ['uvicorn', 'asgi:app', '--workers', '2', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.post(url, json={'query': '{ __typename }'}, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Side-by-side throughput of the sync and async servers")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=10100)
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url, CACHE_BACKEND='none')
+    print(f"{'server':<26} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for name, command in SERVERS.items():
+        url = f"http://127.0.0.1:{args.port}/graphql"
+        server = subprocess.Popen([part.format(port=args.port) for part in command], cwd=APP_DIR, env=env)
+        try:
+            wait_until_up(url)
+            for concurrency in args.concurrency:
+                output = subprocess.check_output([
+                    sys.executable, os.path.join(HERE, 'load_test.py'), url,
+                    '--concurrency', str(concurrency), '--duration', str(args.duration), '--json',
+                ])
+                r = json.loads(output)
+                print(f"{name:<26} {concurrency:>7} {r['requests_per_sec']:>8.1f} "
+                      f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>6}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+parser = argparse.ArgumentParser(description="similarMarks index build time, memory and query latency")
+parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                    help="existing database; default: a synthetic SQLite database of --rows marks")
+parser.add_argument('--rows', type=int, default=1000000)
+parser.add_argument('--repeat', type=int, default=50)
+parser.add_argument('--limit', type=int, default=20)
+args = parser.parse_args()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SYLLABLES = ['ka', 'lo', 'mi', 'nex', 'tra', 'vo', 'zen', 'qui', 'ster', 'ph', 'ly', 'dor', 'sun', 'fi',
+             'gra', 'bel', 'cor', 'wix', 'ta', 'ri', 'on', 'ex', 'ul', 'sha', 'pe', 'go', 'ny', 'ke']
+QUERIES = ['NITE LIFE', 'KWIK STOP', 'ZENTRA', 'SUNFILY', 'PHONEX', 'GRABELCOR', 'MIKO', 'DORASHA']
+
+
+def synthetic_marks(rows, seed=0):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        words = rng.choice((1, 1, 2, 2, 3))
+        yield ' '.join(''.join(rng.choices(SYLLABLES, k=rng.randint(1, 3))) for _ in range(words)).upper()
+
+
+def build_database(path, rows):
+    sys.path.insert(0, os.path.join(HERE, '..', 'uspto_db'))
+    from sqlalchemy import create_engine
+    from stream_to_db import batched, index_marks, write_batch
+    from tables import create_tables
+
+    engine = create_engine(f'sqlite:///{path}')
+    create_tables(engine)
+    records = (
+        {'category_code': f'{i % 45 + 1:03d}', 'mark_identification': mark, 'serial_number': str(90000000 + i),
+         'case_file_owners': None, 'status': '700', 'xml_filename': 'synthetic.xml'}
+        for i, mark in enumerate(synthetic_marks(rows))
+    )
+    for batch in batched(records, 50000):
+        with engine.begin() as conn:
+            write_batch(conn, batch)
+            index_marks(conn, batch)
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def main():
+    if args.database_url is None:
+        path = f'/tmp/similar_marks_{args.rows}.db'
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            build_database(path, args.rows)
+            print(f"wrote {args.rows} synthetic marks (with mark_keys) to {path} in {time.perf_counter() - start:.0f}s")
+        args.database_url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, os.path.join(HERE, '..', 'trademarkvista'))
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+    from db import engine
+    from similar_marks import SimilarMarkIndex
+
+    index = SimilarMarkIndex()
+    with Session(engine) as session:
+        before = rss_mb()
+        start = time.perf_counter()
+        index.top_k(session, QUERIES[0])
+        print(f"index build: {time.perf_counter() - start:.1f}s, +{rss_mb() - before:.0f} MB RSS")
+
+        print(f"{'mark':>12} {'category':>9} {'best match':>22} {'score':>6} {'p50 ms':>8} {'p95 ms':>8}")
+        for mark in QUERIES:
+            for category_code in (None, '009'):
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    found = index.top_k(session, mark, category_code, args.limit)
+                    timings.append((time.perf_counter() - start) * 1000)
+                best_id, score = found[0] if found else (None, 0.0)
+                best = session.execute(
+                    text("SELECT mark_identification FROM trademarks WHERE id = :id"), {'id': best_id}
+                ).scalar()
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                print(f"{mark:>12} {category_code or '-':>9} {str(best)[:22]:>22} {score:>6.3f} "
+                      f"{statistics.median(timings):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
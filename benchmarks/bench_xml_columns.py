@@ -0,0 +1,40 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uspto_db'))
+from process_xml import CASE_FILE_FIELDS, EXTRA_FIELDS, extract_columns, extract_info_from_large_xml
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-file field extraction: find() per record vs the columnar extractor")
+    parser.add_argument('xml_file', help="an extracted apc*.xml file")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per extractor, the fastest is reported")
+    args = parser.parse_args()
+
+    extractors = [
+        ('extract_info_from_large_xml', lambda: len(extract_info_from_large_xml(args.xml_file))),
+        ('extract_columns', lambda: len(extract_columns(args.xml_file)['xml_filename'])),
+        ('extract_columns +extra fields',
+         lambda: len(extract_columns(args.xml_file, fields=CASE_FILE_FIELDS + EXTRA_FIELDS)['xml_filename'])),
+    ]
+    print(f"{'extractor':>30} {'case-files':>11} {'seconds':>8} {'case-files/s':>13} {'speedup':>8}")
+    baseline = None
+    for name, func in extractors:
+        seconds, rows = best_of(args.repeat, func)
+        baseline = baseline or seconds
+        print(f"{name:>30} {rows:>11} {seconds:>8.3f} {rows / seconds:>13.0f} {baseline / seconds:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uspto_db'))
+from process_xml import iter_case_files, iter_zipped_case_files
+
+
+def io_counters():
+    """Bytes read/written through syscalls by this process (Linux /proc/self/io)."""
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+        return int(fields['rchar']), int(fields['wchar'])
+    except OSError:
+        return 0, 0
+
+
+def measure(label, parse):
+    read_before, written_before = io_counters()
+    start = time.perf_counter()
+    case_files, scratch_bytes = parse()
+    elapsed = time.perf_counter() - start
+    read_after, written_after = io_counters()
+    return {
+        'mode': label,
+        'case_files': case_files,
+        'seconds': elapsed,
+        'read_mb': (read_after - read_before) / 1e6,
+        'written_mb': (written_after - written_before) / 1e6,
+        'scratch_mb': scratch_bytes / 1e6,
+    }
+
+
+def extract_then_parse(zip_paths, scratch_dir):
+    # what process_xml.py does by default: extractall, parse the files, delete them
+    case_files = scratch_bytes = 0
+    for zip_path in zip_paths:
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            zip_ref.extractall(scratch_dir)
+    for name in sorted(os.listdir(scratch_dir)):
+        xml_path = os.path.join(scratch_dir, name)
+        scratch_bytes += os.path.getsize(xml_path)
+        case_files += sum(1 for _ in iter_case_files(xml_path))
+        os.remove(xml_path)
+    return case_files, scratch_bytes
+
+
+def parse_from_zip(zip_paths):
+    return sum(sum(1 for _ in iter_zipped_case_files(zip_path)) for zip_path in zip_paths), 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract-then-parse vs parsing straight from the zip stream")
+    parser.add_argument('zip_dir', help="directory of apc*.zip files (e.g. several days)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per mode, the fastest is reported")
+    args = parser.parse_args()
+
+    zip_paths = sorted(os.path.join(args.zip_dir, f) for f in os.listdir(args.zip_dir) if f.endswith('.zip'))
+    scratch_dir = tempfile.mkdtemp(dir=args.zip_dir)
+    try:
+        results = []
+        for _ in range(args.repeat):
+            results.append(measure('extract', lambda: extract_then_parse(zip_paths, scratch_dir)))
+            results.append(measure('from-zip', lambda: parse_from_zip(zip_paths)))
+    finally:
+        shutil.rmtree(scratch_dir)
+
+    print(f"{len(zip_paths)} zip files")
+    print(f"{'mode':>9} {'case-files':>11} {'seconds':>8} {'read MB':>8} {'written MB':>11} {'scratch MB':>11}")
+    for mode in ('extract', 'from-zip'):
+        r = min((r for r in results if r['mode'] == mode), key=lambda r: r['seconds'])
+        print(f"{r['mode']:>9} {r['case_files']:>11} {r['seconds']:>8.2f} {r['read_mb']:>8.1f} "
+              f"{r['written_mb']:>11.1f} {r['scratch_mb']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
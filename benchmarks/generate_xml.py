@@ -0,0 +1,160 @@
+import argparse
+import math
+import os
+import random
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from xml.sax.saxutils import escape
+
+# Synthetic USPTO daily files (apcYYMMDD.xml) for the benchmark suite. Each
+# <case-file> carries the elements process_xml reads (classification,
+# mark-identification, serial number, owners' party-names, status code) plus
+# the usual bulk around them (statements, events, addresses), so parsing does
+# the same amount of skipping as on a real file. Output depends only on
+# --seed and the sizes: file i is generated from its own seeded generator.
+
+SYLLABLES = ['ka', 'lo', 'mi', 'nex', 'tra', 'vo', 'zen', 'qui', 'ster', 'ph', 'ly', 'dor', 'sun', 'fi',
+             'gra', 'bel', 'cor', 'wix', 'ta', 'ri', 'on', 'ex', 'ul', 'sha', 'pe', 'go', 'ny', 'ke']
+WORDS = ['STAR', 'LIFE', 'NITE', 'SUN', 'BLUE', 'GOLD', 'PURE', 'SMART', 'EARTH', 'ROYAL', 'HOME',
+         'COFFEE', 'LABS', 'WORKS', 'CO', 'THE', 'OF', 'AND']
+OWNER_SUFFIXES = ['INC.', 'LLC', 'CORPORATION', 'LTD.', 'GMBH', 'S.A.', 'CO., LTD.']
+# (status code, weight): mostly pending and registered marks, as in a daily file
+STATUSES = [('630', 30), ('641', 8), ('661', 5), ('686', 10), ('688', 5), ('700', 25), ('710', 4),
+            ('602', 6), ('800', 5), ('900', 2)]
+# the busiest classes (software, clothing, advertising, education, IT services) weigh more
+CATEGORIES = [f'{code:03d}' for code in range(1, 46)]
+CATEGORY_WEIGHTS = [8 if code in ('009', '025', '035', '041', '042') else 3 if code in ('003', '005', '030') else 1
+                    for code in CATEGORIES]
+STATES = ['CA', 'NY', 'TX', 'FL', 'WA', 'IL', 'DE', 'NJ']
+FIRST_SERIAL = 90000000
+PER_FILE = 10000
+
+
+def mark_text(rng):
+    if rng.random() < 0.3:
+        return ' '.join(rng.choices(WORDS, k=rng.randint(1, 3)))
+    words = rng.choice((1, 1, 2, 2, 3))
+    return ' '.join(''.join(rng.choices(SYLLABLES, k=rng.randint(1, 3))) for _ in range(words)).upper()
+
+def owner_names(count, seed):
+    """The owner pool: a few owners hold many marks, as in the real data."""
+    rng = random.Random(f'{seed}-owners')
+    names = []
+    for _ in range(count):
+        name = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 3))).upper()
+        if rng.random() < 0.1:
+            name += ' & ' + ''.join(rng.choices(SYLLABLES, k=2)).upper()
+        # "ACME, INC." / "ACME INC.": the forms normalize_owner has to fold together
+        separator = ', ' if rng.random() < 0.5 else ' '
+        names.append(f'{name}{separator}{rng.choice(OWNER_SUFFIXES)}')
+    return names
+
+def case_file_xml(rng, serial_number, day, owners):
+    filing = day - timedelta(days=rng.randint(30, 2000))
+    status = rng.choices([code for code, _ in STATUSES], [weight for _, weight in STATUSES])[0]
+    registration = f'{rng.randint(1000000, 7999999)}' if status in ('700', '710', '800', '900') else '0000000'
+    parts = [
+        '<case-file>',
+        f'<serial-number>{serial_number}</serial-number>',
+        f'<registration-number>{registration}</registration-number>',
+        f'<transaction-date>{day:%Y%m%d}</transaction-date>',
+        '<case-file-header>',
+        f'<filing-date>{filing:%Y%m%d}</filing-date>',
+        f'<status-code>{status}</status-code>',
+        f'<status-date>{day:%Y%m%d}</status-date>',
+    ]
+    # design-only marks have no words
+    if rng.random() < 0.95:
+        parts.append(f'<mark-identification>{escape(mark_text(rng))}</mark-identification>')
+    parts.append(f'<mark-drawing-code>{rng.choice("2345")}000</mark-drawing-code>')
+    parts.append('<attorney-name>JANE DOE</attorney-name></case-file-header>')
+
+    # one class for most marks, up to four for the rest
+    count = 1 if rng.random() < 0.8 else rng.randint(2, 4)
+    categories = list(dict.fromkeys(rng.choices(CATEGORIES, CATEGORY_WEIGHTS, k=count)))
+    parts.append('<case-file-statements>')
+    for code in categories:
+        parts.append(f'<case-file-statement><type-code>GS0{code}1</type-code>'
+                     f'<text>Goods and services in class {code}, namely {escape(mark_text(rng).lower())}</text>'
+                     '</case-file-statement>')
+    parts.append('</case-file-statements><case-file-event-statements>')
+    for n in range(rng.randint(2, 8)):
+        parts.append(f'<case-file-event-statement><code>E{n:03d}</code><type>I</type>'
+                     f'<description-text>EVENT {n}</description-text><date>{filing:%Y%m%d}</date>'
+                     f'<number>{n + 1}</number></case-file-event-statement>')
+    parts.append('</case-file-event-statements>')
+    # a few case-files carry no classification; process_xml skips those
+    if rng.random() < 0.98:
+        parts.append('<classifications>')
+        for code in categories:
+            parts.append(f'<classification><international-code-total-no>1</international-code-total-no>'
+                         f'<international-code>{code}</international-code><us-code>100</us-code>'
+                         f'<status-code>6</status-code><primary-code>{code}</primary-code></classification>')
+        parts.append('</classifications>')
+    parts.append('<case-file-owners>')
+    for entry, name in enumerate(rng.sample(owners, k=rng.choice((1, 1, 1, 2, 3))), 1):
+        parts.append(f'<case-file-owner><entry-number>{entry}</entry-number><party-type>10</party-type>'
+                     f'<party-name>{escape(name)}</party-name><address-1>{rng.randint(1, 9999)} MAIN STREET</address-1>'
+                     f'<city>SPRINGFIELD</city><state>{rng.choice(STATES)}</state>'
+                     f'<postcode>{rng.randint(10000, 99999)}</postcode></case-file-owner>')
+    parts.append('</case-file-owners></case-file>\n')
+    return ''.join(parts)
+
+def write_file(path, first_serial, count, day, owners, seed):
+    rng = random.Random(f'{seed}-{first_serial}')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<trademark-applications-daily>\n'
+                f'<version><version-no>2.0</version-no><version-date>{day:%Y%m%d}</version-date></version>\n'
+                f'<creation-datetime>{day:%Y%m%d}0500</creation-datetime>\n'
+                '<application-information><file-segments><file-segment>TRMN</file-segment>\n'
+                '<action-keys><action-key>AA</action-key>\n')
+        for serial_number in range(first_serial, first_serial + count):
+            f.write(case_file_xml(rng, serial_number, day, owners))
+        f.write('</action-keys></file-segments></application-information>\n</trademark-applications-daily>\n')
+
+def generate_file(out_dir, index, first_serial, count, owners, seed, zipped):
+    """Writes one apcYYMMDD file (file `index` counts days from 2024-01-01); returns its path."""
+    day = date(2024, 1, 1) + timedelta(days=index)
+    name = f'apc{day:%y%m%d}'
+    xml_path = os.path.join(out_dir, name + '.xml')
+    write_file(xml_path, first_serial, count, day, owners, seed)
+    if not zipped:
+        return xml_path
+    zip_path = os.path.join(out_dir, name + '.zip')
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.write(xml_path, name + '.xml')
+    os.remove(xml_path)
+    return zip_path
+
+def generate(out_dir, case_files, per_file=PER_FILE, seed=0, zipped=False, workers=1):
+    """Writes `case_files` case-files as ceil(case_files / per_file) daily files; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    owners = owner_names(max(case_files // 20, 10), seed)
+    jobs = []
+    for index in range(math.ceil(case_files / per_file)):
+        first = index * per_file
+        jobs.append((out_dir, index, FIRST_SERIAL + first, min(per_file, case_files - first), owners, seed, zipped))
+    if workers <= 1:
+        return [generate_file(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(generate_file, *zip(*jobs)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic USPTO apc*.xml files")
+    parser.add_argument('out_dir')
+    parser.add_argument('--case-files', type=int, default=10000, help="total case-files, e.g. 10000 to 10000000")
+    parser.add_argument('--per-file', type=int, default=PER_FILE, help="case-files per daily file")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--zip', action='store_true', help="write apcYYMMDD.zip archives like the USPTO download")
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    paths = generate(args.out_dir, args.case_files, args.per_file, args.seed, args.zip, args.workers)
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"wrote {args.case_files} case-files in {len(paths)} files ({size / 1024 / 1024:.0f} MB) to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
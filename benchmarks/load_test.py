@@ -0,0 +1,84 @@
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import requests
+
+DEFAULT_QUERIES = [
+    '{ trademarkBySerial(serialNumber: "%(serial)s") { markIdentification status caseFileOwners } }',
+    '{ trademarksByCategory(categoryCode: "%(category)s", first: 50) { serialNumber markIdentification } }',
+    '{ searchMarks(keyword: "%(keyword)s", first: 20) { serialNumber markIdentification } }',
+]
+
+
+def worker(url, queries, deadline, latencies, errors, seed):
+    http = requests.Session()
+    i = seed
+    while time.perf_counter() < deadline:
+        query = queries[i % len(queries)] % {
+            'serial': f"{90000000 + i % 5000}",
+            'category': f"{1 + i % 45:03d}",
+            'keyword': f"MARK {i % 1000}",
+        }
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = http.post(url, json={'query': query}, timeout=30)
+            ok = response.status_code == 200 and not response.json().get('errors')
+        except requests.RequestException:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        if not ok:
+            errors.append(1)
+
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100)[p - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent GraphQL load test; reports throughput and latency percentiles")
+    parser.add_argument('url', help="GraphQL endpoint, e.g. http://127.0.0.1:10000/graphql")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30, help="seconds")
+    parser.add_argument('--queries', help="file with one GraphQL query per line (may use %%(serial)s, %%(category)s, %%(keyword)s)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, queries, deadline, latencies, errors, n * 7919))
+        for n in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key, value in result.items():
+            print(f"{key:>16}: {value:.1f}" if isinstance(value, float) else f"{key:>16}: {value}")
+
+
+if __name__ == '__main__':
+    main()
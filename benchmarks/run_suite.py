@@ -0,0 +1,333 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import generate_xml
+
+# Reproducible benchmark suite: generates synthetic apc*.xml files
+# (generate_xml.py), then runs each scenario in its own process so its peak
+# RSS is its own:
+#   parse_columns  extract_columns over every file (the CSV / Parquet path)
+#   parse_records  iter_case_files over every file (the stream_to_db path)
+#   load           stream_to_db into an empty database, with per-stage timings
+#   graphql        latency percentiles of a fixed set of operations, posted to
+#                  /graphql in-process, against the loaded (or a given) database
+# Results are written as JSON tagged with the git commit; --compare prints the
+# change against an earlier results file.
+#
+#   python benchmarks/run_suite.py --case-files 100000
+#   python benchmarks/run_suite.py --case-files 100000 --compare benchmarks/results/<commit>.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+SCENARIOS = ['parse_columns', 'parse_records', 'load', 'graphql']
+
+FIELDS = "serialNumber markIdentification categoryCode status caseFileOwners"
+# (name, query, variables(sample)); sample holds values read from the database
+OPERATIONS = [
+    ('trademarkBySerial',
+     f'query ($serial: String) {{ trademarkBySerial(serialNumber: $serial) {{ {FIELDS} }} }}',
+     lambda s: {'serial': s['serial']}),
+    ('trademarksByCategory',
+     f'query ($category: String) {{ trademarksByCategory(categoryCode: $category, first: 50) {{ {FIELDS} }} }}',
+     lambda s: {'category': s['category']}),
+    ('trademarksByCategoryConnection',
+     'query ($category: String) { trademarksByCategoryConnection(categoryCode: $category, first: 50) '
+     f'{{ totalCount edges {{ node {{ {FIELDS} }} }} pageInfo {{ hasNextPage endCursor }} }} }}',
+     lambda s: {'category': s['category']}),
+    ('searchMarks',
+     f'query ($keyword: String) {{ searchMarks(keyword: $keyword, first: 20) {{ {FIELDS} }} }}',
+     lambda s: {'keyword': s['keyword']}),
+    ('searchMarksFiltered',
+     'query ($keyword: String, $category: String, $status: String) '
+     f'{{ searchMarks(keyword: $keyword, categoryCode: $category, status: $status, first: 20) {{ {FIELDS} }} }}',
+     lambda s: {'keyword': s['keyword'], 'category': s['category'], 'status': s['status']}),
+    ('trademarksByOwner',
+     f'query ($owner: String!) {{ trademarksByOwner(owner: $owner, first: 50) {{ {FIELDS} }} }}',
+     lambda s: {'owner': s['owner']}),
+    ('similarMarks',
+     'query ($mark: String!) { similarMarks(mark: $mark, limit: 20) { serialNumber markIdentification score } }',
+     lambda s: {'mark': s['mark']}),
+    ('aggregates',
+     'query ($category: String!, $status: String) { markCount(categoryCode: $category, status: $status) '
+     'topOwners(categoryCode: $category, first: 10) { owner count } filingsByDay(first: 30) { day count } }',
+     lambda s: {'category': s['category'], 'status': s['status']}),
+]
+
+
+def peak_rss_mb():
+    """Peak RSS of this process or any worker it waited for (ru_maxrss is in KB on Linux)."""
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return usage / 1024
+
+def percentiles(timings):
+    timings = sorted(timings)
+    cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return {'p50_ms': cuts[49], 'p95_ms': cuts[94], 'p99_ms': cuts[98],
+            'mean_ms': statistics.fmean(timings), 'max_ms': timings[-1]}
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return git('rev-parse', 'HEAD') or None, bool(git('status', '--porcelain', '--untracked-files=no'))
+
+
+''' -------------Scenarios (each runs in a child process)-----------------'''
+
+def xml_paths(args):
+    return sorted(os.path.join(args.xml_dir, f) for f in os.listdir(args.xml_dir) if f.endswith('.xml'))
+
+def input_totals(args, seconds, case_files):
+    size = sum(os.path.getsize(path) for path in xml_paths(args))
+    return {'seconds': seconds, 'case_files': case_files, 'case_files_per_sec': case_files / seconds,
+            'mb': size / 1024 / 1024, 'mb_per_sec': size / 1024 / 1024 / seconds}
+
+def run_parse_columns(args):
+    sys.path.insert(0, os.path.join(ROOT, 'uspto_db'))
+    from process_xml import iter_file_columns
+
+    xml_files = [os.path.basename(path) for path in xml_paths(args)]
+    start = time.perf_counter()
+    case_files = sum(len(columns['xml_filename'])
+                     for _, columns in iter_file_columns(xml_files, args.xml_dir, args.workers))
+    return dict(input_totals(args, time.perf_counter() - start, case_files), workers=args.workers)
+
+def run_parse_records(args):
+    sys.path.insert(0, os.path.join(ROOT, 'uspto_db'))
+    from process_xml import read_case_files
+
+    start = time.perf_counter()
+    case_files = sum(1 for path in xml_paths(args) for _ in read_case_files(path))
+    return input_totals(args, time.perf_counter() - start, case_files)
+
+def run_load(args):
+    sys.path.insert(0, os.path.join(ROOT, 'uspto_db'))
+    from sqlalchemy import create_engine
+    from stream_to_db import stream_xml_files_to_db
+    from tables import metadata
+    from metrics import ingest_stages
+
+    engine = create_engine(args.load_url)
+    # start from empty tables every run
+    metadata.drop_all(engine)
+    start = time.perf_counter()
+    rows = stream_xml_files_to_db(xml_paths(args), engine, args.batch_size)
+    seconds = time.perf_counter() - start
+    return {
+        'dialect': engine.dialect.name, 'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds,
+        'batch_size': args.batch_size,
+        'stages': {stage: {'seconds': totals['seconds'], 'items': totals['items']}
+                   for stage, totals in ingest_stages().items()},
+    }
+
+def sample_values(engine, seed, count=200):
+    """Serials, categories, keywords, owners and marks that exist in the database, picked by `seed`."""
+    from sqlalchemy import text
+
+    rng = random.Random(seed)
+    with engine.connect() as conn:
+        marks = conn.execute(text(
+            "SELECT serial_number, category_code, status, mark_identification FROM trademarks "
+            "WHERE mark_identification IS NOT NULL ORDER BY id LIMIT 20000"
+        )).all()
+        owners = conn.execute(text("SELECT name FROM owners ORDER BY id LIMIT 20000")).scalars().all()
+    if not marks:
+        raise SystemExit("the database has no trademarks to query")
+    samples = []
+    for _ in range(count):
+        serial, category, status, mark = rng.choice(marks)
+        samples.append({
+            'serial': serial, 'category': category, 'status': status, 'mark': mark,
+            'keyword': rng.choice(mark.split()),
+            'owner': rng.choice(owners) if owners else 'ACME INC',
+        })
+    return samples
+
+def run_graphql(args):
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['CACHE_BACKEND'] = 'memory' if args.cache else 'none'
+    sys.path.insert(0, os.path.join(ROOT, 'trademarkvista'))
+    import app
+    import db
+    from sqlalchemy import func, select
+
+    client = app.app.test_client()
+    samples = sample_values(db.engine, args.seed)
+    with db.engine.connect() as conn:
+        rows = conn.execute(select(func.count()).select_from(db.TrademarkModel.__table__)).scalar()
+    results = {'dialect': db.engine.dialect.name, 'rows': rows, 'cache': args.cache, 'operations': {}}
+    for name, query, variables in OPERATIONS:
+        timings = []
+        errors = 0
+        for i in range(args.warmup + args.repeat):
+            body = {'query': query, 'variables': variables(samples[i % len(samples)])}
+            start = time.perf_counter()
+            response = client.post('/graphql', json=body)
+            elapsed = (time.perf_counter() - start) * 1000
+            if i < args.warmup:
+                continue
+            timings.append(elapsed)
+            if response.status_code != 200 or response.get_json().get('errors'):
+                errors += 1
+        results['operations'][name] = dict(percentiles(timings), requests=len(timings), errors=errors)
+    return results
+
+RUNNERS = {
+    'parse_columns': run_parse_columns,
+    'parse_records': run_parse_records,
+    'load': run_load,
+    'graphql': run_graphql,
+}
+
+
+''' -------------Driver-----------------'''
+
+def restore_dump(dump, database_url):
+    """pg_restore `dump` into database_url (its tables are dropped first), then build the tables the dump predates."""
+    sys.path.insert(0, os.path.join(ROOT, 'uspto_db'))
+    from sqlalchemy import create_engine
+    from tables import metadata
+    from backfill_owners import backfill_owners
+    from backfill_mark_keys import backfill_mark_keys
+
+    engine = create_engine(database_url)
+    metadata.drop_all(engine)
+    subprocess.run([args.pg_restore, '--no-owner', '--no-privileges', '-d', database_url, dump], check=True)
+    backfill_owners(engine)
+    backfill_mark_keys(engine)
+    engine.dispose()
+
+def run_child(args, scenario):
+    """Runs one scenario in a fresh interpreter; returns its results plus its peak RSS."""
+    with tempfile.NamedTemporaryFile(suffix='.json') as output:
+        command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--xml-dir', args.xml_dir,
+                   '--load-url', args.load_url, '--child', scenario, '--child-output', output.name]
+        if args.database_url:
+            command += ['--database-url', args.database_url]
+        subprocess.run(command, check=True)
+        with open(output.name) as f:
+            return json.load(f)
+
+def flatten(results, prefix=''):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f'{prefix}{key}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f'{prefix}{key}', value
+
+def compare(baseline, current):
+    """Prints every timing / rate / memory figure of both runs and the change between them."""
+    before = dict(flatten(baseline['scenarios']))
+    print(f"\nvs {baseline.get('commit', '?')[:10]} ({baseline.get('case_files')} case-files)")
+    print(f"{'metric':>60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, value in flatten(current['scenarios']):
+        if key not in before or not key.endswith(('_ms', '_per_sec', 'seconds', 'rss_mb')):
+            continue
+        change = f"{(value - before[key]) / before[key] * 100:+.1f}%" if before[key] else '-'
+        print(f"{key:>60} {before[key]:>12.2f} {value:>12.2f} {change:>8}")
+
+def summary(results):
+    for name, result in results['scenarios'].items():
+        rate = result.get('case_files_per_sec') or result.get('rows_per_sec')
+        line = f"{name:>14}: peak RSS {result['peak_rss_mb']:.0f} MB"
+        if rate:
+            line += f", {result['seconds']:.1f}s, {rate:.0f} case-files/s"
+        print(line)
+        for operation, timing in result.get('operations', {}).items():
+            print(f"{operation:>32}: p50 {timing['p50_ms']:.2f} ms, p95 {timing['p95_ms']:.2f} ms, "
+                  f"p99 {timing['p99_ms']:.2f} ms, {timing['errors']} errors")
+
+
+def main():
+    if args.child:
+        result = RUNNERS[args.child](args)
+        result['peak_rss_mb'] = peak_rss_mb()
+        with open(args.child_output, 'w') as f:
+            json.dump(result, f)
+        return
+
+    work_dir = args.work_dir
+    if args.xml_dir is None:
+        # generated files are kept for the next run with the same size and seed
+        args.xml_dir = os.path.join(work_dir, f'xml-{args.case_files}-{args.per_file}-{args.seed}')
+        if not os.path.isdir(args.xml_dir):
+            start = time.perf_counter()
+            generate_xml.generate(args.xml_dir + '.tmp', args.case_files, args.per_file, args.seed,
+                                  workers=args.workers)
+            os.replace(args.xml_dir + '.tmp', args.xml_dir)
+            print(f"generated {args.case_files} case-files in {time.perf_counter() - start:.0f}s")
+    if args.load_url is None:
+        path = os.path.join(work_dir, f'load-{args.case_files}.db')
+        if 'load' in args.scenarios and os.path.exists(path):
+            os.remove(path)
+        args.load_url = f'sqlite:///{path}'
+    if args.restore_dump:
+        if not args.database_url:
+            raise SystemExit("--restore-dump needs --database-url")
+        restore_dump(args.restore_dump, args.database_url)
+    if args.database_url is None and 'graphql' in args.scenarios:
+        if 'load' not in args.scenarios:
+            raise SystemExit("graphql needs --database-url, or the load scenario to seed a database")
+        args.database_url = args.load_url
+
+    commit, dirty = git_commit()
+    results = {
+        'commit': commit, 'dirty': dirty,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'case_files': args.case_files, 'per_file': args.per_file, 'seed': args.seed,
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'scenarios': {},
+    }
+    # the order of SCENARIOS: load seeds the database graphql queries
+    for scenario in (s for s in SCENARIOS if s in args.scenarios):
+        print(f"running {scenario}", file=sys.stderr)
+        results['scenarios'][scenario] = run_child(args, scenario)
+
+    output = args.output or os.path.join(HERE, 'results', f"{(commit or 'unknown')[:10]}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    summary(results)
+    print(f"results written to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+parser = argparse.ArgumentParser(description="Parse / load / GraphQL benchmark suite on synthetic USPTO XML")
+parser.add_argument('--case-files', type=int, default=10000, help="size of the generated data, 10000 to 10000000")
+parser.add_argument('--per-file', type=int, default=generate_xml.PER_FILE)
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'tmv-bench'),
+                    help="where generated XML and the SQLite load database are kept")
+parser.add_argument('--xml-dir', help="existing apc*.xml files instead of generated ones")
+parser.add_argument('--workers', type=int, default=1, help="processes for generating and parse_columns")
+parser.add_argument('--batch-size', type=int, default=10000)
+parser.add_argument('--load-url', help="scratch database for the load scenario (its tables are dropped first); "
+                                       "default: a new SQLite file in --work-dir")
+parser.add_argument('--database-url', help="seeded database for graphql; default: the one load wrote")
+parser.add_argument('--restore-dump', help="pg_restore this dump (e.g. trademark_db.dump) into --database-url first")
+parser.add_argument('--pg-restore', default=shutil.which('pg_restore') or 'pg_restore')
+parser.add_argument('--repeat', type=int, default=200, help="timed requests per GraphQL operation")
+parser.add_argument('--warmup', type=int, default=10)
+parser.add_argument('--cache', action='store_true', help="keep the API query cache on (CACHE_BACKEND=memory)")
+parser.add_argument('--output', help="results file; default: benchmarks/results/<commit>.json")
+parser.add_argument('--compare', help="earlier results file to compare against")
+parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+parser.add_argument('--child-output', help=argparse.SUPPRESS)
+args = parser.parse_args()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'trademarkvista'))
+sys.path.append(os.path.join(ROOT, 'uspto_db'))
+sys.path.append(os.path.join(ROOT, 'TMV_local'))
+
+# trademarkvista/db.py connects at import time: point it at a scratch SQLite
+# file, with no result cache so every resolver reaches the database
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='tmv-tests-'), 'api.db')
+os.environ.pop('SNAPSHOT_PATH', None)
+os.environ['CACHE_BACKEND'] = 'none'
+# indexes are built by the first query that needs them
+os.environ['INDEX_PRELOAD'] = 'lazy'
+
+from tables import metadata, create_tables, bump_data_version
+from stream_to_db import stream_records_to_db
+
+# Ingestion tests run on SQLite, and on PostgreSQL as well when
+# TEST_DATABASE_URL names a scratch database (its tables are dropped):
+#   TEST_DATABASE_URL=postgresql://localhost/tmv_test python -m pytest tests
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+API_CASE_FILES = 250
+
+
+def case_file_records(count, start=0, category_code=None, owner=None, xml_filename='apc240101.xml'):
+    """
+    Parsed case-files as process_xml.read_case_files yields them: serial
+    numbers 80000000 + start onwards, spread over a few classes, statuses and
+    owners unless `category_code` / `owner` pin them.
+    """
+    records = []
+    for i in range(start, start + count):
+        owners = [owner] if owner else [f'OWNER {i % 7}, INC.'] + ([f'PARTNER {i % 3} LLC'] if i % 5 == 0 else [])
+        records.append({
+            'category-code': category_code or f'{i % 4 + 1:03d}',
+            'mark-identification': f'MARK {i}' if i % 11 else None,
+            'serial-number': str(80000000 + i),
+            'Case-File-Owners': ', '.join(owners),
+            'owners': owners,
+            'status': ('630', '700', '710')[i % 3],
+            'xml_filename': xml_filename,
+        })
+    return records
+
+def write_case_file_xml(path, records):
+    """A daily XML file holding `records`, laid out the way USPTO files are."""
+    from xml.sax.saxutils import escape
+
+    def element(tag, value):
+        return f'<{tag}>{escape(value)}</{tag}>' if value is not None else ''
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<trademark-applications-daily>'
+                '<application-information><file-segments><action-keys>\n')
+        for record in records:
+            owners = ''.join(f'<case-file-owner>{element("party-name", name)}</case-file-owner>'
+                             for name in record['owners'])
+            f.write(
+                '<case-file>'
+                + element('serial-number', record['serial-number'])
+                + '<case-file-header>' + element('mark-identification', record['mark-identification'])
+                + element('status-code', record['status']) + '</case-file-header>'
+                + '<classifications><classification>'
+                + element('international-code', record['category-code']) + '</classification></classifications>'
+                + f'<case-file-owners>{owners}</case-file-owners>'
+                + '</case-file>\n'
+            )
+        f.write('</action-keys></file-segments></application-information></trademark-applications-daily>\n')
+    return str(path)
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def ingest_engine(request, tmp_path):
+    """An empty trademarks database."""
+    if request.param == 'sqlite':
+        url = f'sqlite:///{tmp_path}/ingest.db'
+    elif TEST_DATABASE_URL:
+        url = TEST_DATABASE_URL
+    else:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(url)
+    metadata.drop_all(engine)
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(scope='session')
+def api_db():
+    """The API's database, loaded once with API_CASE_FILES case-files."""
+    import db
+    create_tables(db.engine)
+    stream_records_to_db(case_file_records(API_CASE_FILES), db.engine, batch_size=100)
+    bump_data_version(db.engine)
+    return db
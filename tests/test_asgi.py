@@ -0,0 +1,45 @@
+import asyncio
+import json
+from urllib.parse import urlencode
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+
+
+def request(method, params=None, body=b''):
+    """(status, JSON body) of one request to the ASGI app."""
+    from asgi import app
+
+    scope = {'type': 'http', 'method': method, 'path': '/graphql',
+             'query_string': urlencode(params or {}).encode()}
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+QUERY = 'query($first: Int) { allTrademarks(first: $first) { serialNumber } }'
+
+@pytest.mark.parametrize('variables, message', [
+    ('{bad', "Variables are invalid JSON."),
+    ('[1, 2]', "Variables must be a JSON object."),
+])
+def test_malformed_get_variables_are_a_bad_request(variables, message):
+    assert request('GET', {'query': QUERY, 'variables': variables}) == (400, {'errors': [{'message': message}]})
+
+def test_malformed_post_bodies_are_bad_requests():
+    assert request('POST', body=b'[1]')[0] == 400
+    body = json.dumps({'query': QUERY, 'variables': '{bad'}).encode()
+    assert request('POST', body=body) == (400, {'errors': [{'message': "Variables are invalid JSON."}]})
+
+def test_get_with_variables(api_db):
+    status, response = request('GET', {'query': QUERY, 'variables': '{"first": 2}'})
+    assert status == 200
+    assert response == {'data': {'allTrademarks': [{'serialNumber': '80000000'}, {'serialNumber': '80000001'}]}}
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+
+from background_index import BackgroundIndex
+
+
+class Builds:
+    """A build function that returns 1, 2, 3... and can be held mid-build."""
+    def __init__(self):
+        self.count = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+        self.fail = False
+
+    def __call__(self, session):
+        self.started.set()
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("build failed")
+        self.count += 1
+        return self.count
+
+@pytest.fixture
+def builds():
+    return Builds()
+
+@pytest.fixture
+def index(builds):
+    return BackgroundIndex(builds, create_engine('sqlite://'))
+
+
+def test_first_get_waits_for_the_build(index):
+    assert index.get() == 1
+    assert index.get() == 1
+
+def test_old_index_is_served_while_rebuilding(index, builds):
+    index.start()
+    assert index.get() == 1
+    builds.release.clear()
+    builds.started.clear()
+    index.invalidate()
+    assert builds.started.wait(5)
+    # the rebuild is held: requests keep the index they had
+    assert index.get() == 1
+    builds.release.set()
+    assert index.wait(5)
+    assert index.get() == 2
+
+def test_invalidate_during_a_build_builds_again(index, builds):
+    builds.release.clear()
+    index.start()
+    assert builds.started.wait(5)
+    index.invalidate()
+    builds.release.set()
+    assert index.wait(5)
+    assert index.get() == 2
+
+def test_failed_builds(index, builds):
+    builds.fail = True
+    with pytest.raises(RuntimeError, match="build failed"):
+        index.get()
+    builds.fail = False
+    assert index.get() == 1
+    # a failed rebuild keeps the index it would have replaced
+    builds.fail = True
+    index.invalidate()
+    assert index.wait(5)
+    assert index.get() == 1
+    assert isinstance(index.build_error, RuntimeError)
@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pytest
+
+from SmolLMWrapper import GenerationBatcher
+
+
+def submit_all(batcher, prompts):
+    """Submits every prompt from its own thread; the result or exception of each."""
+    def submit(prompt):
+        try:
+            return batcher.submit(prompt)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(prompts)) as pool:
+        return list(pool.map(submit, prompts))
+
+
+def test_identical_prompts_are_generated_once():
+    calls = []
+
+    def generate(prompts):
+        calls.append(prompts)
+        return [prompt.upper() for prompt in prompts]
+
+    batcher = GenerationBatcher(generate, max_batch=8, wait=0.2)
+    assert submit_all(batcher, ['a', 'b', 'a']) == ['A', 'B', 'A']
+    assert sum(map(len, calls)) == 2
+
+@pytest.mark.parametrize('generate, error', [
+    (lambda prompts: prompts[:-1], RuntimeError),
+    (lambda prompts: 1 / 0, ZeroDivisionError),
+])
+def test_failed_batch_fails_its_callers_and_worker_carries_on(generate, error):
+    results = iter([generate, lambda prompts: [p + '!' for p in prompts]])
+    batcher = GenerationBatcher(lambda prompts: next(results)(prompts), max_batch=8, wait=0.2, timeout=5)
+    failed = submit_all(batcher, ['a', 'b'])
+    assert all(isinstance(result, error) for result in failed)
+    assert batcher.submit('c') == 'c!'
+
+# the worker is ended on purpose
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_worker_is_restarted_after_it_exits(monkeypatch):
+    batcher = GenerationBatcher(lambda prompts: prompts, wait=0, timeout=0.5)
+    run_batch = batcher._run_batch
+
+    def exit_worker(batch):
+        monkeypatch.setattr(batcher, '_run_batch', run_batch)
+        raise SystemExit
+
+    monkeypatch.setattr(batcher, '_run_batch', exit_worker)
+    with pytest.raises(TimeoutError):
+        batcher.submit('a')
+    deadline = time.monotonic() + 5
+    while batcher._worker is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batcher._worker is None
+    assert batcher.submit('b') == 'b'
+
+def test_submit_times_out():
+    release = threading.Event()
+
+    def generate(prompts):
+        release.wait(5)
+        return prompts
+
+    batcher = GenerationBatcher(generate, wait=0, timeout=0.1)
+    with pytest.raises(TimeoutError):
+        batcher.submit('slow')
+    release.set()
@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from cache import InProcessCache, RedisCache, ResultCache
+
+
+def test_counters_are_exact_under_threads():
+    cache = ResultCache(InProcessCache())
+    cache.store('loader', 'value', 'hit')
+
+    def lookups():
+        for _ in range(2000):
+            cache.lookup('loader', 'hit')
+            cache.lookup('loader', 'miss')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (16000, 16000, 1)
+
+def test_redis_stats_do_not_scan():
+    fakeredis = pytest.importorskip('fakeredis')
+
+    class NoScan(fakeredis.FakeRedis):
+        def scan_iter(self, *args, **kwargs):
+            raise AssertionError("stats() scanned the keyspace")
+
+    cache = ResultCache(RedisCache(client=NoScan()))
+    cache.store('loader', [1, 2], 'key')
+    assert cache.lookup('loader', 'key') == (True, [1, 2])
+    stats = cache.stats()
+    assert 'size' not in stats
+    assert (stats['backend'], stats['hits']) == ('RedisCache', 1)
@@ -0,0 +1,167 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from download import DownloadError, download_file, download_files, remote_file_size
+from manifest import Manifest
+from process_xml import already_ingested
+
+CONTENT = os.urandom(256 * 1024)
+
+
+class FileServer(ThreadingHTTPServer):
+    """Serves CONTENT at /<name>.zip with Range support; `cut_after` bytes ends the next response early."""
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RangeHandler)
+        self.requests = []
+        self.cut_after = None
+        self.honour_range = True
+        # HEAD: answer head_error this many times, then report the size (if report_size)
+        self.failed_heads = 0
+        self.head_error = 503
+        self.report_size = True
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.server.requests.append((self.path, 'HEAD'))
+        if not self.path.endswith('.zip'):
+            self.send_error(404)
+            return
+        if self.server.failed_heads:
+            self.server.failed_heads -= 1
+            self.send_error(self.server.head_error)
+            return
+        self.send_response(200)
+        if self.server.report_size:
+            self.send_header('Content-Length', str(len(CONTENT)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('Range')))
+        if not self.path.endswith('.zip'):
+            self.send_error(404)
+            return
+        start = 0
+        match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range') or '')
+        if match and self.server.honour_range:
+            start = int(match[1])
+            if start >= len(CONTENT):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(CONTENT)}')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}')
+        else:
+            self.send_response(200)
+        body = CONTENT[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        cut_after, self.server.cut_after = self.server.cut_after, None
+        if cut_after is not None:
+            # announce the whole body, send part of it and drop the connection
+            self.wfile.write(body[:cut_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def url(server, name='apc240101.zip'):
+    return f'http://127.0.0.1:{server.server_port}/{name}'
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_download(server, tmp_path):
+    path = download_file(url(server), tmp_path, backoff=0)
+    assert read(path) == CONTENT
+    assert not os.path.exists(path + '.part')
+    assert server.requests == [('/apc240101.zip', None)]
+
+def test_resumes_a_part_file(server, tmp_path):
+    with open(tmp_path / 'apc240101.zip.part', 'wb') as f:
+        f.write(CONTENT[:100000])
+    path = download_file(url(server), tmp_path, backoff=0)
+    assert read(path) == CONTENT
+    assert server.requests == [('/apc240101.zip', 'bytes=100000-')]
+
+def test_retries_a_dropped_connection_from_where_it_stopped(server, tmp_path):
+    server.cut_after = 50000
+    path = download_file(url(server), tmp_path, backoff=0, chunk_size=8192)
+    assert read(path) == CONTENT
+    # the retry asks only for what is missing (from the last whole chunk written)
+    assert [path for path, _ in server.requests] == ['/apc240101.zip'] * 2
+    resumed_at = int(re.fullmatch(r'bytes=(\d+)-', server.requests[1][1])[1])
+    assert 0 < resumed_at <= 50000
+
+def test_complete_part_file(server, tmp_path):
+    with open(tmp_path / 'apc240101.zip.part', 'wb') as f:
+        f.write(CONTENT)
+    assert read(download_file(url(server), tmp_path, backoff=0)) == CONTENT
+
+def test_server_ignoring_range_starts_over(server, tmp_path):
+    server.honour_range = False
+    with open(tmp_path / 'apc240101.zip.part', 'wb') as f:
+        f.write(b'stale bytes')
+    assert read(download_file(url(server), tmp_path, backoff=0)) == CONTENT
+
+def test_missing_file_is_not_retried(server, tmp_path):
+    with pytest.raises(DownloadError) as error:
+        download_file(url(server, 'missing.txt'), tmp_path, backoff=0)
+    assert not error.value.retry
+    assert len(server.requests) == 1
+
+def test_download_files(server, tmp_path):
+    links = [url(server, f'apc24010{day}.zip') for day in range(1, 5)] + [url(server, 'missing.txt')]
+    paths = download_files(links, tmp_path, workers=3, backoff=0)
+    assert paths[links[-1]] is None
+    assert all(read(paths[link]) == CONTENT for link in links[:-1])
+
+def test_remote_file_size(server):
+    assert remote_file_size(url(server), backoff=0) == len(CONTENT)
+    server.report_size = False
+    assert remote_file_size(url(server), backoff=0) is None
+
+def test_remote_file_size_retries_server_errors(server):
+    server.failed_heads = 2
+    assert remote_file_size(url(server), backoff=0) == len(CONTENT)
+    assert len(server.requests) == 3
+    server.failed_heads = 5
+    with pytest.raises(DownloadError):
+        remote_file_size(url(server), retries=2, backoff=0)
+
+def test_remote_file_size_of_a_missing_file(server):
+    with pytest.raises(DownloadError) as error:
+        remote_file_size(url(server, 'missing.txt'), backoff=0)
+    assert not error.value.retry
+
+def test_only_a_matching_reported_size_skips_a_file(server, tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.json'))
+    path = download_file(url(server), tmp_path, backoff=0)
+    manifest.record('apc240101.zip', path, rows=1)
+    assert already_ingested(manifest, 'apc240101.zip', url(server))
+    # unknown size: downloaded again and compared by checksum
+    server.report_size = False
+    assert not already_ingested(manifest, 'apc240101.zip', url(server))
+    # HEAD fails: the same
+    server.report_size, server.failed_heads, server.head_error = True, 1, 403
+    assert not already_ingested(manifest, 'apc240101.zip', url(server))
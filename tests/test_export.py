@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+
+import pytest
+from flask import Flask
+
+from .conftest import API_CASE_FILES
+
+
+@pytest.fixture(scope='module')
+def client(api_db):
+    from export import export
+    app = Flask(__name__)
+    api_db.init_app(app)
+    app.register_blueprint(export)
+    return app.test_client()
+
+
+def test_ndjson_with_owner_and_status(client):
+    response = client.get('/export?format=ndjson&owner=Owner%203%20Inc&status=700')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # OWNER 3 holds every 7th case-file from the 4th, status 700 every 3rd from the 2nd
+    expected = [i for i in range(API_CASE_FILES) if i % 7 == 3 and i % 3 == 1]
+    assert [row['serial_number'] for row in rows] == [str(80000000 + i) for i in expected]
+    assert all(row['status'] == '700' and 'OWNER 3, INC.' in row['case_file_owners'] for row in rows)
+
+def test_csv_columns_and_category(client):
+    response = client.get('/export?format=csv&columns=serial_number,mark_identification&category_code=002')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename=trademarks.csv'
+    header, *rows = csv.reader(io.StringIO(response.get_data(as_text=True)))
+    assert header == ['serial_number', 'mark_identification']
+    expected = [i for i in range(API_CASE_FILES) if i % 4 == 1]
+    # case-files without a mark are exported with an empty one
+    assert rows == [[str(80000000 + i), f'MARK {i}' if i % 11 else ''] for i in expected]
+
+def test_csv_chunks_are_one_per_batch():
+    from export import csv_chunks
+    chunks = list(csv_chunks(['id', 'mark'], iter([[(1, 'A')], [(2, 'B, C'), (3, None)]])))
+    assert chunks == ['id,mark\r\n1,A\r\n', '2,"B, C"\r\n3,\r\n']
+
+@pytest.mark.parametrize('query', ['format=xml', 'columns=serial_number,nope'])
+def test_bad_requests(client, query):
+    assert client.get(f'/export?{query}').status_code == 400
@@ -0,0 +1,51 @@
+import pytest
+
+from query_planner import QueryIntent, QueryPlanner
+from SmolLMWrapper import SmolLMWrapper
+
+
+@pytest.fixture(scope='module')
+def wrapper():
+    wrapper = SmolLMWrapper()
+
+    def no_model(question):
+        raise AssertionError(f"asked the LLM about {question!r}")
+
+    # every question below is answered by the regex paths alone
+    wrapper._extract_trademark_name = no_model
+    return wrapper
+
+@pytest.fixture(scope='module')
+def planner(api_db):
+    from schema import schema
+    return QueryPlanner(schema)
+
+
+@pytest.mark.parametrize('question, intent, plan', [
+    ("Who is the owner of the mark MARK?",
+     QueryIntent(keyword='MARK'),
+     ('search', {'keyword': 'MARK', 'owner': None, 'categoryCode': None, 'status': None})),
+    ("marks owned by Owner 3, Inc. please",
+     QueryIntent(owner='Owner 3, Inc.'),
+     ('owner', {'owner': 'Owner 3, Inc.'})),
+    ("trademarks with status 700 for APPLE",
+     QueryIntent(keyword='APPLE', status='700'),
+     ('search', {'keyword': 'APPLE', 'owner': None, 'categoryCode': None, 'status': '700'})),
+    ("Are there any trademarks with NTHLIFE owned by Acme Inc in class 9?",
+     QueryIntent(keyword='NTHLIFE', owner='Acme Inc', category='009'),
+     ('search', {'keyword': 'NTHLIFE', 'owner': 'Acme Inc', 'categoryCode': '009', 'status': None})),
+])
+def test_intent_and_plan(wrapper, planner, question, intent, plan):
+    found = wrapper.get_intent(question)
+    assert found == intent
+    name, variables = planner.plan(found)
+    assert (name, variables) == (plan[0], dict(plan[1], first=None, after=None))
+
+def test_owner_question_finds_the_owners_marks(wrapper, planner, api_db):
+    intent = wrapper.get_intent("marks owned by Owner 3, Inc. please")
+    with api_db.session_scope():
+        result = planner.execute(intent, first=5)
+    assert not result.errors, result.errors
+    owners = [edge['node']['caseFileOwners'] for edge in result.data['searchMarks']['edges']]
+    assert len(owners) == 5
+    assert all('OWNER 3, INC.' in owner for owner in owners)
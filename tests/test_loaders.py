@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+
+@contextmanager
+def trademark_queries(engine):
+    """Collects the statements run against the trademarks table."""
+    statements = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM trademarks' in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+
+def execute(api_db, query):
+    from schema import schema
+    with api_db.session_scope():
+        result = schema.execute(query)
+    assert not result.errors, result.errors
+    return result.data
+
+
+def test_aliased_serial_lookups_share_one_query(api_db):
+    serial_numbers = [str(80000000 + i) for i in (3, 17, 42, 99, 3)] + ['79999999']
+    fields = ' '.join(
+        f'm{n}: trademarkBySerial(serialNumber: "{serial_number}") {{ serialNumber status }}'
+        for n, serial_number in enumerate(serial_numbers)
+    )
+    with trademark_queries(api_db.engine) as statements:
+        data = execute(api_db, f'{{ {fields} }}')
+
+    assert len(statements) == 1
+    statement, parameters = statements[0]
+    assert ' IN ' in statement
+    # de-duplicated: the repeated serial number is asked for once
+    assert sorted(parameters) == sorted(set(serial_numbers))
+    assert [data[f'm{n}'] and data[f'm{n}']['serialNumber'] for n in range(len(serial_numbers))] == \
+        serial_numbers[:-1] + [None]
+
+def test_serial_lookups_batch_with_trademarks_by_serials(api_db):
+    query = '''{
+        one: trademarkBySerial(serialNumber: "80000005") { serialNumber }
+        many: trademarksBySerials(serialNumbers: ["80000006", "80000007"]) { serialNumber }
+    }'''
+    with trademark_queries(api_db.engine) as statements:
+        data = execute(api_db, query)
+    assert len(statements) == 1
+    assert data == {'one': {'serialNumber': '80000005'},
+                    'many': [{'serialNumber': '80000006'}, {'serialNumber': '80000007'}]}
+
+def test_check_serials():
+    from loaders import check_serials, MAX_SERIALS
+    assert check_serials(None) == []
+    assert check_serials(['80000001']) == ['80000001']
+    with pytest.raises(ValueError):
+        check_serials(['80000001'] * (MAX_SERIALS + 1))
+
+def test_missing_serial_list_finds_nothing(api_db):
+    data = execute(api_db, '{ trademarksBySerials { serialNumber } }')
+    assert data == {'trademarksBySerials': []}
@@ -0,0 +1,22 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import metrics
+
+
+def timed_selects():
+    counts, _ = metrics.db_query_seconds._values.get(('SELECT',), ([0], 0.0))
+    return counts[-1]
+
+def test_failed_statements_leave_no_timer_behind():
+    engine = create_engine('sqlite://')
+    metrics.instrument_engine(engine)
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM missing_table'))
+        assert conn.info == {}
+        before = timed_selects()
+        conn.execute(text('SELECT 1'))
+    assert timed_selects() == before + 1
@@ -0,0 +1,95 @@
+import pytest
+
+from pagination import clamp_first, decode_cursor, encode_cursor, MAX_PAGE_SIZE
+
+from .conftest import API_CASE_FILES
+
+
+def execute(api_db, query, **variables):
+    from schema import schema
+    with api_db.session_scope():
+        result = schema.execute(query, variable_values=variables)
+    assert not result.errors, result.errors
+    return result.data
+
+def walk(api_db, field, arguments='', first=7):
+    """Every serial number a connection returns, following endCursor page by page."""
+    query = f'''
+        query($first: Int, $after: String) {{
+            page: {field}(first: $first, after: $after{arguments}) {{
+                edges {{ cursor node {{ serialNumber }} }}
+                pageInfo {{ hasNextPage endCursor }}
+                totalCount
+            }}
+        }}
+    '''
+    serial_numbers, after = [], None
+    while True:
+        page = execute(api_db, query, first=first, after=after)['page']
+        assert len(page['edges']) <= first
+        serial_numbers.extend(edge['node']['serialNumber'] for edge in page['edges'])
+        if page['edges']:
+            assert page['pageInfo']['endCursor'] == page['edges'][-1]['cursor']
+        if not page['pageInfo']['hasNextPage']:
+            return serial_numbers, page['totalCount']
+        after = page['pageInfo']['endCursor']
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('id', 42), 'id') == 42
+    assert decode_cursor(None, 'id') is None
+
+@pytest.mark.parametrize('cursor, kind', [
+    # another field's cursor
+    (encode_cursor('offset', 5), 'id'),
+    (encode_cursor('id', -1), 'id'),
+    (encode_cursor('offset', -5), 'offset'),
+    ('not a cursor', 'id'),
+    (encode_cursor('id', 'x'), 'id'),
+])
+def test_decode_cursor_rejects(cursor, kind):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(cursor, kind)
+
+def test_clamp_first():
+    assert clamp_first(None, 10) == 10
+    assert clamp_first(MAX_PAGE_SIZE + 1) == MAX_PAGE_SIZE
+    with pytest.raises(ValueError):
+        clamp_first(-1)
+
+@pytest.mark.parametrize('field, arguments, expected', [
+    ('allTrademarksConnection', '', API_CASE_FILES),
+    ('trademarksByCategoryConnection', ', categoryCode: "002"', API_CASE_FILES // 4 + 1),
+    # the category is an optional filter: without it every trademark is listed
+    ('trademarksByCategoryConnection', '', API_CASE_FILES),
+    # ranked: offset cursors
+    ('searchMarksConnection', ', keyword: "MARK 1"', None),
+    ('trademarksByOwnerConnection', ', owner: "Owner 3 Inc"', None),
+])
+def test_pages_cover_every_row_once(api_db, field, arguments, expected):
+    serial_numbers, total = walk(api_db, field, arguments)
+    assert len(serial_numbers) == len(set(serial_numbers)) == total
+    assert total > 7
+    if expected is not None:
+        assert total == expected
+
+def test_category_list_without_category(api_db):
+    data = execute(api_db, '{ trademarksByCategory(first: 3) { serialNumber } }')
+    assert [row['serialNumber'] for row in data['trademarksByCategory']] == [str(80000000 + i) for i in range(3)]
+
+def test_list_field_after(api_db):
+    query = 'query($after: String) { allTrademarks(first: 3, after: $after) { id serialNumber } }'
+    first_page = execute(api_db, query)['allTrademarks']
+    after = encode_cursor('id', first_page[-1]['id'])
+    second_page = execute(api_db, query, after=after)['allTrademarks']
+    assert [row['serialNumber'] for row in first_page + second_page] == [str(80000000 + i) for i in range(6)]
+
+@pytest.mark.parametrize('after', [encode_cursor('offset', -5), encode_cursor('id', 3), 'garbage'])
+def test_invalid_search_cursor_is_a_graphql_error(api_db, after):
+    from schema import schema
+    with api_db.session_scope():
+        result = schema.execute(
+            'query($after: String) { searchMarksConnection(keyword: "MARK", after: $after) { edges { cursor } } }',
+            variable_values={'after': after},
+        )
+    assert [str(error) for error in result.errors] == [f'Invalid cursor: {after}']
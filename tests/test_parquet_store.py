@@ -0,0 +1,48 @@
+import pyarrow.dataset as ds
+import pytest
+from sqlalchemy import select
+
+from parquet_store import iter_parquet_batches, load_parquet_to_db, write_parquet
+from process_xml import extract_columns
+from tables import trademarks, trademark_owners
+
+from .conftest import case_file_records, write_case_file_xml
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """30 case-files over two daily files, partitioned by category."""
+    path = str(tmp_path / 'parquet')
+    for day in (1, 2):
+        name = f'apc24010{day}.xml'
+        records = case_file_records(15, start=15 * (day - 1), xml_filename=name)
+        columns = extract_columns(write_case_file_xml(tmp_path / name, records))
+        write_parquet(columns, path, partition_by='category_code', basename=name[:-4])
+    return path
+
+def serial_numbers(batches):
+    return sorted(row['serial_number'] for rows in batches for row in rows)
+
+
+def test_rewriting_a_file_replaces_it(dataset, tmp_path):
+    columns = extract_columns(str(tmp_path / 'apc240101.xml'))
+    write_parquet(columns, dataset, partition_by='category_code', basename='apc240101')
+    assert serial_numbers(iter_parquet_batches(dataset)) == [str(80000000 + i) for i in range(30)]
+
+def test_partition_filter(dataset):
+    batches = iter_parquet_batches(dataset, batch_size=4, filter=ds.field('category_code') == '003')
+    assert serial_numbers(batches) == [str(80000000 + i) for i in range(30) if i % 4 == 2]
+
+def test_load_parquet_to_db(dataset, ingest_engine):
+    assert load_parquet_to_db(ingest_engine, dataset, batch_size=8) == 30
+    with ingest_engine.connect() as conn:
+        loaded = conn.execute(select(trademarks.c.serial_number, trademarks.c.category_code,
+                                     trademarks.c.mark_identification, trademarks.c.xml_filename)
+                              .order_by(trademarks.c.serial_number)).all()
+        links = conn.execute(select(trademark_owners)).all()
+    records = case_file_records(15) + case_file_records(15, start=15, xml_filename='apc240102.xml')
+    assert [tuple(row) for row in loaded] == [
+        (r['serial-number'], r['category-code'], r['mark-identification'], r['xml_filename']) for r in records
+    ]
+    # owners are split back out of the joined case_file_owners string
+    assert len(links) == sum(len(r['owners']) for r in records)
@@ -0,0 +1,102 @@
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select
+
+from process_xml import (CASE_FILE_FIELDS, EXTRA_FIELDS, bounded_map, extract_columns, read_case_files,
+                         read_columns)
+from stream_to_db import stream_xml_files_to_db
+from tables import trademarks
+
+from .conftest import case_file_records, write_case_file_xml
+
+
+def test_read_case_files_round_trip(tmp_path):
+    records = case_file_records(12)
+    path = write_case_file_xml(tmp_path / 'apc240101.xml', records)
+    parsed = list(read_case_files(path))
+    for record in records:
+        if record['mark-identification'] is None:
+            del record['mark-identification']
+    assert parsed == records
+
+def test_columns_match_the_records(tmp_path):
+    records = case_file_records(40)
+    columns = extract_columns(write_case_file_xml(tmp_path / 'apc240101.xml', records))
+    assert len(columns['xml_filename']) == 40
+    for key, _, _ in CASE_FILE_FIELDS:
+        assert columns[key] == [record[key] for record in records]
+    assert set(columns['xml_filename']) == {'apc240101.xml'}
+
+def test_columns_only_follow_their_own_paths(tmp_path):
+    path = tmp_path / 'apc240101.xml'
+    path.write_text(
+        '<file><case-file>'
+        '<serial-number>1</serial-number>'
+        # a party-name outside case-file-owners and a nested case-file-header are not ours
+        '<party-name>NOT AN OWNER</party-name>'
+        '<prior-registrations><case-file-header><status-code>999</status-code></case-file-header></prior-registrations>'
+        '<case-file-header><filing-date>20240101</filing-date><status-code>700</status-code></case-file-header>'
+        '<classifications><classification><international-code>009</international-code>'
+        '<international-code>042</international-code></classification></classifications>'
+        '<case-file-statements><case-file-statement><text>Software</text></case-file-statement>'
+        '<case-file-statement><text>Hardware</text></case-file-statement></case-file-statements>'
+        '<case-file-owners><case-file-owner><party-name>A</party-name></case-file-owner>'
+        '<case-file-owner><party-name>B</party-name></case-file-owner></case-file-owners>'
+        '</case-file>'
+        # skipped: no category code
+        '<case-file><serial-number>2</serial-number></case-file></file>'
+    )
+    columns = extract_columns(str(path), fields=CASE_FILE_FIELDS + EXTRA_FIELDS)
+    assert columns == {
+        'category-code': ['009'],
+        'mark-identification': [None],
+        'serial-number': ['1'],
+        'Case-File-Owners': ['A, B'],
+        'status': ['700'],
+        'filing-date': ['20240101'],
+        'registration-number': [None],
+        'goods-services': ['Software, Hardware'],
+        'xml_filename': ['apc240101.xml'],
+    }
+
+def test_read_columns_from_a_zip(tmp_path):
+    days = {f'apc2401{day:02d}.xml': case_file_records(5, start=5 * day) for day in (2, 1)}
+    with zipfile.ZipFile(tmp_path / 'apc240101.zip', 'w') as archive:
+        for name, records in days.items():
+            archive.write(write_case_file_xml(tmp_path / name, records), name)
+    columns = read_columns(str(tmp_path / 'apc240101.zip'))
+    # members in name order, each tagged with its own file name
+    assert columns['serial-number'] == [str(80000000 + i) for i in range(5, 15)]
+    assert columns['xml_filename'] == ['apc240101.xml'] * 5 + ['apc240102.xml'] * 5
+
+def test_bounded_map_keeps_a_window():
+    submitted = []
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            submitted.append(item)
+        return item * 2
+
+    with ThreadPoolExecutor(4) as executor:
+        results = bounded_map(executor, work, range(100), window=3)
+        assert next(results) == 0
+        # the first result was taken as soon as the window was full
+        assert len(submitted) <= 3
+        assert list(results) == [item * 2 for item in range(1, 100)]
+
+def test_parallel_parsing_loads_the_same_rows(ingest_engine, tmp_path):
+    paths = [
+        write_case_file_xml(tmp_path / f'apc2401{day:02d}.xml',
+                            case_file_records(30, start=30 * day, xml_filename=f'apc2401{day:02d}.xml'))
+        for day in range(1, 6)
+    ]
+    assert stream_xml_files_to_db(paths, ingest_engine, batch_size=40, upsert=True, workers=2) == 150
+    with ingest_engine.connect() as conn:
+        loaded = conn.execute(select(trademarks.c.serial_number, trademarks.c.xml_filename)
+                              .order_by(trademarks.c.serial_number)).all()
+    assert [tuple(row) for row in loaded] == [
+        (str(80000000 + i), f'apc2401{i // 30:02d}.xml') for i in range(30, 180)
+    ]
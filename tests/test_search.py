@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from build_snapshot import build_snapshot
+from db import TrademarkModel
+from search import FtsSearch
+from stream_to_db import stream_records_to_db
+from tables import create_tables
+
+from .conftest import case_file_records
+
+MARKS = [
+    'THE ORIGINAL SUNPEAK MOUNTAIN COFFEE ROASTERS OF COLORADO',
+    'SUNPEAK',
+    'BLUEWAVE',
+    'SUNPEAK SOLAR',
+    'SUN PEAK',
+    'SUNPEAK',
+]
+COLUMNS = [TrademarkModel.id, TrademarkModel.mark_identification]
+
+
+@pytest.fixture(scope='module')
+def snapshot(tmp_path_factory):
+    """A snapshot (with its FTS5 index) of a handful of marks; ids follow MARKS."""
+    path = tmp_path_factory.mktemp('snapshot')
+    source = create_engine(f'sqlite:///{path}/source.db')
+    records = case_file_records(len(MARKS))
+    for i, (record, mark) in enumerate(zip(records, MARKS)):
+        # owners of equal length, so only the marks tell the rows apart in bm25()
+        record['mark-identification'] = mark
+        record['owners'] = [f'OWNER {i}, INC.']
+        record['Case-File-Owners'] = f'OWNER {i}, INC.'
+    create_tables(source)
+    stream_records_to_db(iter(records), source)
+    build_snapshot(source, str(path / 'snapshot.sqlite'))
+    engine = create_engine(f'sqlite:///{path}/snapshot.sqlite')
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+def marks(rows):
+    return [(row.id, row.mark_identification) for row in rows]
+
+
+def test_closest_marks_rank_first(snapshot):
+    found = marks(FtsSearch().search(snapshot, COLUMNS, keyword='sunpeak'))
+    # bm25: the bare mark (ties by id), then the short and the long one; "SUN PEAK" does not match
+    assert found == [(2, 'SUNPEAK'), (6, 'SUNPEAK'), (4, 'SUNPEAK SOLAR'), (1, MARKS[0])]
+    assert FtsSearch().count(snapshot, keyword='sunpeak') == 4
+
+def test_pages_follow_the_ranking(snapshot):
+    backend = FtsSearch()
+    everything = marks(backend.search(snapshot, COLUMNS, keyword='sunpeak'))
+    pages = [marks(backend.search(snapshot, COLUMNS, keyword='sunpeak', limit=2, offset=offset))
+             for offset in (0, 2)]
+    assert pages[0] + pages[1] == everything
+
+def test_filters_and_owner(snapshot):
+    backend = FtsSearch()
+    # case_file_records: status ('630', '700', '710')[i % 3] for the i-th record (id i + 1)
+    found = backend.search(snapshot, COLUMNS, keyword='sunpeak', filters={'status': '700'})
+    assert marks(found) == [(2, 'SUNPEAK')]
+    found = backend.search(snapshot, COLUMNS, keyword='sunpeak', owner='owner 5, inc')
+    assert marks(found) == [(6, 'SUNPEAK')]
+
+def test_short_terms_fall_back_to_like(snapshot):
+    found = FtsSearch().search(snapshot, COLUMNS, keyword='wa')
+    assert marks(found) == [(3, 'BLUEWAVE')]
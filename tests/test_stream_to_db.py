@@ -0,0 +1,79 @@
+from sqlalchemy import func, select
+
+from tables import (trademarks, owners, trademark_owners, mark_keys,
+                    category_status_counts, owner_category_counts, filing_day_counts)
+from stream_to_db import batched, stream_records_to_db
+
+from .conftest import case_file_records
+
+
+def table_rows(engine, table, order_by):
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(select(table).order_by(*order_by))]
+
+def stored(engine):
+    """Everything an upsert writes, in a comparable form."""
+    return {
+        'trademarks': table_rows(engine, trademarks, [trademarks.c.id]),
+        'owners': table_rows(engine, owners, [owners.c.id]),
+        'trademark_owners': table_rows(engine, trademark_owners, [trademark_owners.c.trademark_id, trademark_owners.c.owner_id]),
+        'mark_keys': table_rows(engine, mark_keys, [mark_keys.c.trademark_id]),
+        'summaries': [table_rows(engine, table, list(table.primary_key)) for table in
+                      (category_status_counts, owner_category_counts, filing_day_counts)],
+    }
+
+def count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+def test_batched():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
+
+def test_stream_records_to_db(ingest_engine):
+    records = case_file_records(250)
+    assert stream_records_to_db(iter(records), ingest_engine, batch_size=100) == 250
+
+    rows = table_rows(ingest_engine, trademarks, [trademarks.c.serial_number])
+    assert [row[3] for row in rows] == [record['serial-number'] for record in records]
+    first = rows[0]
+    assert first[1:] == ('001', None, '80000000', 'OWNER 0, INC., PARTNER 0 LLC', '630', 'apc240101.xml')
+    # every owner of every case-file is linked, and every mark indexed
+    assert count(ingest_engine, trademark_owners) == sum(len(record['owners']) for record in records)
+    assert count(ingest_engine, mark_keys) == 250
+
+def test_upsert_rerun_is_idempotent(ingest_engine):
+    records = case_file_records(250)
+    stream_records_to_db(iter(records), ingest_engine, batch_size=100, upsert=True)
+    first_run = stored(ingest_engine)
+    stream_records_to_db(iter(records), ingest_engine, batch_size=100, upsert=True)
+    assert stored(ingest_engine) == first_run
+
+def test_upsert_updates_changed_case_files(ingest_engine):
+    stream_records_to_db(iter(case_file_records(50)), ingest_engine, upsert=True)
+    changed = case_file_records(10, category_code='045', owner='NEW OWNER LLC', xml_filename='apc240102.xml')
+    # a serial number listed twice in a batch keeps its last record
+    stream_records_to_db(iter(case_file_records(1) + changed), ingest_engine, upsert=True)
+
+    rows = table_rows(ingest_engine, trademarks, [trademarks.c.serial_number])
+    assert len(rows) == 50
+    assert [row[1] for row in rows[:11]] == ['045'] * 10 + ['003']
+    assert {row[4] for row in rows[:10]} == {'NEW OWNER LLC'}
+    with ingest_engine.connect() as conn:
+        new_owner = conn.execute(select(owners.c.id).where(owners.c.normalized_name == 'new owner')).scalar()
+        linked = conn.execute(select(func.count()).where(trademark_owners.c.owner_id == new_owner)).scalar()
+    assert linked == 10
+
+def test_owner_keeps_its_first_spelling(ingest_engine):
+    spellings = ['Zeta Widgets, Inc.', 'ZETA WIDGETS INC', 'Zeta Widgets Incorporated']
+    records = case_file_records(3)
+    for record, name in zip(records, spellings):
+        record['owners'] = [name]
+    stream_records_to_db(iter(records), ingest_engine, upsert=True)
+    # a later batch does not rename it either
+    later = case_file_records(1, start=3, owner='ZETA WIDGETS, INC')
+    stream_records_to_db(iter(later), ingest_engine, upsert=True)
+    with ingest_engine.connect() as conn:
+        names = conn.execute(select(owners.c.name).where(owners.c.normalized_name == 'zeta widgets')).scalars().all()
+    assert names == ['Zeta Widgets, Inc.']
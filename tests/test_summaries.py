@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import select
+
+import stream_to_db
+from stream_to_db import stream_records_to_db
+from backfill_owners import backfill_owners
+from refresh_summaries import refresh_summaries
+from tables import category_status_counts, owner_category_counts, filing_day_counts
+
+from .conftest import case_file_records
+
+SUMMARIES = (category_status_counts, owner_category_counts, filing_day_counts)
+
+
+def summaries(engine):
+    with engine.connect() as conn:
+        return [sorted(map(tuple, conn.execute(select(table)))) for table in SUMMARIES]
+
+def recount(engine):
+    refresh_summaries(engine)
+    return summaries(engine)
+
+
+def test_incremental_counts_match_a_recount(ingest_engine):
+    stream_records_to_db(iter(case_file_records(300)), ingest_engine, batch_size=70)
+    # re-ingested case-files move to other classes, owners and daily files
+    changed = case_file_records(120, start=250, category_code='045', owner='MOVED OWNER',
+                                xml_filename='apc240102.xml')
+    stream_records_to_db(iter(changed), ingest_engine, batch_size=50, upsert=True)
+    # and owners re-linked from case_file_owners
+    backfill_owners(ingest_engine, batch_size=90)
+
+    incremental = summaries(ingest_engine)
+    assert sum(total for _, _, total in incremental[0]) == 370
+    assert incremental == recount(ingest_engine)
+
+def test_failed_batch_keeps_its_counts(ingest_engine, monkeypatch):
+    stream_records_to_db(iter(case_file_records(100)), ingest_engine, upsert=True)
+    before = summaries(ingest_engine)
+
+    def index_marks(conn, rows):
+        raise RuntimeError("killed mid-batch")
+
+    monkeypatch.setattr(stream_to_db, 'index_marks', index_marks)
+    changed = case_file_records(40, category_code='045')
+    with pytest.raises(RuntimeError):
+        stream_records_to_db(iter(changed), ingest_engine, upsert=True)
+    # the batch was counted out and rewritten before failing: all of it rolls back
+    assert summaries(ingest_engine) == before == recount(ingest_engine)
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+import graphene
+from graphql.execution.executors.asyncio import AsyncioExecutor
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import metrics
+import queries
+from db import DATABASE_URL, SNAPSHOT_PATH, PoolMetrics, engine_options_from_env
+from snapshot import configure_snapshot_engine
+from pagination import MAX_PAGE_SIZE, clamp_first, decode_cursor, keyset_page, offset_page
+from projection import requested_column_keys
+from loaders import AsyncSerialLoader, check_serials, fetch_serials
+from schema import Query, NODE_PATH, DEFAULT_SIMILAR_LIMIT, DEFAULT_TOP_OWNERS, query_cache, start_index_builds
+
+# ASGI entry point serving the same schema with async resolvers:
+#   uvicorn asgi:app --workers 2
+#   gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+# Database I/O goes through SQLAlchemy's asyncio engine, so one worker can keep
+# hundreds of lookups in flight instead of blocking a thread on each.
+
+ASYNC_DRIVERS = {
+    'postgresql://': 'postgresql+asyncpg://',
+    'sqlite://': 'sqlite+aiosqlite://',
+}
+
+def async_database_url(url):
+    for prefix, async_prefix in ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options_from_env(ASYNC_DATABASE_URL))
+if SNAPSHOT_PATH:
+    configure_snapshot_engine(async_engine.sync_engine, SNAPSHOT_PATH)
+async_pool_metrics = PoolMetrics(async_engine.sync_engine)
+metrics.instrument_engine(async_engine.sync_engine)
+metrics.stats_gauge('query_cache', "Query cache counters (see /stats)", query_cache.stats)
+metrics.stats_gauge('db_pool', "Connection pool counters (see /stats)", async_pool_metrics.status)
+start_index_builds()
+
+
+''' -------------Sessions-----------------'''
+
+class RequestSession:
+    """
+    One AsyncSession per GraphQL operation. Sibling fields resolve concurrently
+    but an AsyncSession must not be used concurrently, so queries take turns.
+    """
+    def __init__(self):
+        self.session = AsyncSession(async_engine)
+        self.lock = asyncio.Lock()
+        self.serial_loaders = {}
+
+    async def run(self, query, *args):
+        # the sync query functions run unchanged on the async connection
+        async with self.lock:
+            return await self.session.run_sync(query, *args)
+
+_request_session = ContextVar('request_session')
+
+def run_query(query, *args):
+    return _request_session.get().run(query, *args)
+
+
+''' -------------Async data loaders-----------------'''
+
+# Same names (and so the same cache keys) as the loaders in schema.py
+@query_cache.acached
+async def load_trademarks(keys, category_code, limit, after_id):
+    return await run_query(queries.query_trademarks, keys, category_code, limit, after_id)
+
+@query_cache.acached
+async def count_trademarks(category_code):
+    return await run_query(queries.query_count_trademarks, category_code)
+
+@query_cache.acached
+async def load_search(keys, keyword, owner, category_code, status, limit, offset):
+    return await run_query(queries.query_search, keys, keyword, owner, category_code, status, limit, offset)
+
+@query_cache.acached
+async def count_search(keyword, owner, category_code, status):
+    return await run_query(queries.query_count_search, keyword, owner, category_code, status)
+
+@query_cache.acached
+async def load_trademarks_by_owner(keys, owner, limit, after_id):
+    return await run_query(queries.query_trademarks_by_owner, keys, owner, limit, after_id)
+
+@query_cache.acached
+async def count_trademarks_by_owner(owner):
+    return await run_query(queries.query_count_trademarks_by_owner, owner)
+
+@query_cache.acached
+async def load_similar_marks(keys, mark, category_code, limit):
+    return await run_query(queries.query_similar_marks, keys, mark, category_code, limit)
+
+@query_cache.acached
+async def load_category_status_counts(category_code, status):
+    return await run_query(queries.query_category_status_counts, category_code, status)
+
+@query_cache.acached
+async def load_top_owners(category_code, limit):
+    return await run_query(queries.query_top_owners, category_code, limit)
+
+@query_cache.acached
+async def load_filing_days(limit):
+    return await run_query(queries.query_filing_days, limit)
+
+def serial_loader(keys):
+    request_session = _request_session.get()
+    if tuple(keys) not in request_session.serial_loaders:
+        def fetch(session, serial_numbers):
+            query = lambda keys, chunk: queries.query_trademarks_by_serials(session, keys, chunk)
+            return fetch_serials(query_cache, query, keys, serial_numbers)
+        request_session.serial_loaders[tuple(keys)] = AsyncSerialLoader(
+            lambda serial_numbers: request_session.run(fetch, serial_numbers)
+        )
+    return request_session.serial_loaders[tuple(keys)]
+
+async def trademark_page(keys, category_code, first, after):
+    rows = await load_trademarks(keys, category_code, first + 1, decode_cursor(after, 'id'))
+    return keyset_page(rows, first, lambda: count_trademarks(category_code))
+
+async def owner_page(keys, owner, first, after):
+    rows = await load_trademarks_by_owner(keys, owner, first + 1, decode_cursor(after, 'id'))
+    return keyset_page(rows, first, lambda: count_trademarks_by_owner(owner))
+
+async def search_page(keys, keyword, owner, category_code, status, first, after):
+    offset = decode_cursor(after, 'offset') or 0
+    rows = await load_search(keys, keyword, owner, category_code, status, first + 1, offset)
+    return offset_page(rows, first, offset, lambda: count_search(keyword, owner, category_code, status))
+
+
+class AsyncQuery(Query):
+    """Query with coroutine resolvers; the fields (and so the schema) are inherited unchanged."""
+    class Meta:
+        name = 'Query'
+
+    async def resolve_all_trademarks(self, info, first=None, after=None):
+        keys = requested_column_keys(info)
+        return (await trademark_page(keys, None, clamp_first(first, MAX_PAGE_SIZE), after)).nodes
+
+    async def resolve_trademark_by_serial(self, info, serial_number):
+        return await serial_loader(requested_column_keys(info)).load(serial_number)
+
+    async def resolve_trademarks_by_serials(self, info, serial_numbers=None):
+        return await serial_loader(requested_column_keys(info)).load_many(check_serials(serial_numbers))
+
+    async def resolve_trademarks_by_category(self, info, category_code=None, first=None, after=None):
+        keys = requested_column_keys(info)
+        return (await trademark_page(keys, category_code, clamp_first(first, MAX_PAGE_SIZE), after)).nodes
+
+    async def resolve_search_marks(self, info, keyword=None, owner=None, category_code=None, status=None,
+                                   first=None, after=None):
+        keys = requested_column_keys(info)
+        return (await search_page(keys, keyword, owner, category_code, status, clamp_first(first, MAX_PAGE_SIZE), after)).nodes
+
+    async def resolve_trademarks_by_owner(self, info, owner, first=None, after=None):
+        keys = requested_column_keys(info)
+        return (await owner_page(keys, owner, clamp_first(first, MAX_PAGE_SIZE), after)).nodes
+
+    async def resolve_similar_marks(self, info, mark, category_code=None, limit=None):
+        keys = requested_column_keys(info)
+        return await load_similar_marks(keys, mark, category_code, clamp_first(limit, DEFAULT_SIMILAR_LIMIT))
+
+    async def resolve_category_status_counts(self, info, category_code=None, status=None):
+        return await load_category_status_counts(category_code, status)
+
+    async def resolve_mark_count(self, info, category_code=None, status=None):
+        return sum(row['count'] for row in await load_category_status_counts(category_code, status))
+
+    async def resolve_top_owners(self, info, category_code, first=None):
+        return await load_top_owners(category_code, clamp_first(first, DEFAULT_TOP_OWNERS))
+
+    async def resolve_filings_by_day(self, info, first=None):
+        return await load_filing_days(clamp_first(first, MAX_PAGE_SIZE))
+
+    async def resolve_all_trademarks_connection(self, info, first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return await trademark_page(keys, None, clamp_first(first), after)
+
+    async def resolve_trademarks_by_category_connection(self, info, category_code=None, first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return await trademark_page(keys, category_code, clamp_first(first), after)
+
+    async def resolve_search_marks_connection(self, info, keyword=None, owner=None, category_code=None, status=None,
+                                              first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return await search_page(keys, keyword, owner, category_code, status, clamp_first(first), after)
+
+    async def resolve_trademarks_by_owner_connection(self, info, owner, first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return await owner_page(keys, owner, clamp_first(first), after)
+
+async_schema = graphene.Schema(query=AsyncQuery)
+
+
+async def execute(query, variables=None, operation_name=None):
+    request_session = RequestSession()
+    token = _request_session.set(request_session)
+    try:
+        result = await async_schema.execute(
+            query,
+            variable_values=variables,
+            operation_name=operation_name,
+            executor=AsyncioExecutor(loop=asyncio.get_running_loop()),
+            middleware=metrics.resolver_middleware(),
+            return_promise=True,
+        )
+    finally:
+        _request_session.reset(token)
+        await request_session.session.close()
+    response = {'data': result.data}
+    if result.errors:
+        response['errors'] = [{'message': str(error)} for error in result.errors]
+    return response
+
+
+''' -------------ASGI app-----------------'''
+
+async def read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_text(send, status, text, content_type):
+    body = text.encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    path, method = scope['path'], scope['method']
+    if path == '/stats' and method == 'GET':
+        return await send_json(send, 200, {"cache": query_cache.stats(), "pool": async_pool_metrics.status()})
+    if path == '/metrics' and method == 'GET':
+        return await send_text(send, 200, metrics.render(), metrics.CONTENT_TYPE)
+    if path != '/graphql':
+        return await send_json(send, 404, {"error": "Not found"})
+
+    if method == 'POST':
+        try:
+            params = json.loads(await read_body(receive) or b'{}')
+        except ValueError:
+            return await send_json(send, 400, {"errors": [{"message": "Body must be JSON"}]})
+        if not isinstance(params, dict):
+            return await send_json(send, 400, {"errors": [{"message": "Body must be a JSON object"}]})
+    elif method == 'GET':
+        params = {k: v[0] for k, v in parse_qs(scope['query_string'].decode()).items()}
+    else:
+        return await send_json(send, 405, {"error": "Method not allowed"})
+
+    # GET passes variables as a JSON string, POST may too
+    if isinstance(params.get('variables'), str):
+        try:
+            params['variables'] = json.loads(params['variables'])
+        except ValueError:
+            return await send_json(send, 400, {"errors": [{"message": "Variables are invalid JSON."}]})
+    if params.get('variables') is not None and not isinstance(params['variables'], dict):
+        return await send_json(send, 400, {"errors": [{"message": "Variables must be a JSON object."}]})
+    if not params.get('query'):
+        return await send_json(send, 400, {"errors": [{"message": "Must provide query string."}]})
+    response = await execute(params['query'], params.get('variables'), params.get('operationName'))
+    await send_json(send, 200, response)
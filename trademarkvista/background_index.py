@@ -0,0 +1,79 @@
+import threading
+
+from sqlalchemy.orm import Session
+
+import db
+
+# In-process indexes (search.InMemorySearch, similar_marks.SimilarMarkIndex)
+# are built here, on a thread of their own with a session of their own, never
+# inside a request. A request that finds an index only waits when none has
+# been built yet; after invalidate() it keeps getting the previous index until
+# the rebuild is done and swapped in.
+
+
+class BackgroundIndex:
+    """The latest index built by build(session) from `engine` (db.engine if None)."""
+    def __init__(self, build, engine=None, name='index'):
+        self.build = build
+        self.engine = engine
+        self.name = name
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)
+        self._state = None
+        self._building = False
+        self._stale = False
+        self.build_error = None
+        self.builds = 0
+
+    def start(self):
+        """Starts a build unless one is running; returns at once."""
+        with self._lock:
+            self._start()
+
+    def invalidate(self):
+        """The data changed: rebuild, serving the current index meanwhile."""
+        with self._lock:
+            self._stale = True
+            self._start()
+
+    def get(self):
+        """The current index, waiting for the first build if there is none yet."""
+        with self._lock:
+            if self._state is None:
+                self._start()
+                while self._state is None and self._building:
+                    self._built.wait()
+                if self._state is None:
+                    raise self.build_error
+            return self._state
+
+    def wait(self, timeout=None):
+        """Blocks until no build is running (scripts and tests)."""
+        with self._lock:
+            return self._built.wait_for(lambda: not self._building, timeout)
+
+    def _start(self):
+        if not self._building:
+            self._building = True
+            threading.Thread(target=self._run, name=f'build-{self.name}', daemon=True).start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._stale = False
+            try:
+                with Session(db.engine if self.engine is None else self.engine) as session:
+                    state, error = self.build(session), None
+            except Exception as e:
+                state, error = None, e
+            with self._lock:
+                self.build_error = error
+                if error is None:
+                    self._state = state
+                    self.builds += 1
+                # data changed again while building: go once more
+                if error is None and self._stale:
+                    continue
+                self._building = False
+                self._built.notify_all()
+                return
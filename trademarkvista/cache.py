@@ -0,0 +1,232 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class InProcessCache:
+    """Thread-safe LRU cache with a per-entry TTL, local to one worker process."""
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Cache shared by all workers, stored in Redis (or anything speaking its
+    protocol, e.g. a local redis-server or fakeredis in tests). Values are JSON.
+    Size bounds are the server's job: run it with maxmemory and
+    maxmemory-policy allkeys-lru.
+    """
+    def __init__(self, url=None, client=None, ttl=300, prefix='tmv:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*', count=1000):
+            self.client.delete(key)
+
+    def __len__(self):
+        # SCANs the whole keyspace: not for every /stats or /metrics request
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*', count=1000))
+
+
+class NullCache:
+    """Backend that stores nothing (CACHE_BACKEND=none)."""
+    evictions = 0
+
+    def get(self, key):
+        return False, None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class ResultCache:
+    """
+    Memoizes resolver data loaders on (loader name, normalized arguments).
+
+    `version` returns the current data version written by the ingestion
+    pipeline. It is checked at most every `check_interval` seconds; when it
+    changes the cache is cleared and the invalidation callbacks run. The
+    version is also part of every key, so a shared backend never serves rows
+    from before the last load.
+    """
+    def __init__(self, backend, version=None, check_interval=5.0):
+        self.backend = backend
+        self._version_source = version
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._on_invalidate = []
+        # threaded workers count lookups concurrently
+        self._counter_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, found):
+        with self._counter_lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def on_invalidate(self, callback):
+        self._on_invalidate.append(callback)
+        return callback
+
+    def invalidate(self):
+        self.backend.clear()
+        for callback in self._on_invalidate:
+            callback()
+
+    def current_version(self):
+        if self._version_source is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return self._version
+            self._checked_at = now
+            previous, self._version = self._version, self._version_source()
+            changed = previous is not None and previous != self._version
+        if changed:
+            self.invalidate()
+        return self._version
+
+    @staticmethod
+    def make_key(name, args, kwargs, version):
+        # sorted JSON, so equivalent calls share one entry
+        return json.dumps([version, name, args, kwargs], sort_keys=True, default=str, separators=(',', ':'))
+
+    def lookup(self, name, *args):
+        """(found, value) for the entry cached() would use for name(*args)."""
+        found, value = self.backend.get(self.make_key(name, args, {}, self.current_version()))
+        self._count(found)
+        return found, value
+
+    def store(self, name, value, *args):
+        self.backend.set(self.make_key(name, args, {}, self.current_version()), value)
+
+    def cached(self, func):
+        """Decorator; the function's arguments and result must be JSON-serializable."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.make_key(func.__name__, args, kwargs, self.current_version())
+            found, value = self.backend.get(key)
+            self._count(found)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            self.backend.set(key, value)
+            return value
+        return wrapper
+
+    def acached(self, func):
+        """cached() for coroutine functions (the async server). Version checks run in a thread."""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if time.monotonic() - self._checked_at < self.check_interval:
+                version = self._version
+            else:
+                version = await asyncio.to_thread(self.current_version)
+            key = self.make_key(func.__name__, args, kwargs, version)
+            found, value = self.backend.get(key)
+            self._count(found)
+            if found:
+                return value
+            value = await func(*args, **kwargs)
+            self.backend.set(key, value)
+            return value
+        return wrapper
+
+    def stats(self):
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        stats = {
+            'backend': type(self.backend).__name__,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'evictions': self.backend.evictions,
+            'data_version': self._version,
+        }
+        # the local backends know their size; Redis would have to be scanned
+        if not isinstance(self.backend, RedisCache):
+            stats['size'] = len(self.backend)
+        return stats
+
+
+def cache_from_env(version=None):
+    """
+    CACHE_BACKEND: memory (default), redis or none
+    CACHE_URL: redis URL for the redis backend
+    CACHE_MAXSIZE / CACHE_TTL: LRU bound and entry lifetime in seconds
+    CACHE_VERSION_CHECK_SECONDS: how often to poll the data version
+    """
+    kind = os.environ.get('CACHE_BACKEND', 'memory')
+    ttl = int(os.environ.get('CACHE_TTL', 300))
+    if kind == 'redis':
+        backend = RedisCache(url=os.environ.get('CACHE_URL', 'redis://localhost:6379/0'), ttl=ttl)
+    elif kind == 'none':
+        backend = NullCache()
+    else:
+        backend = InProcessCache(maxsize=int(os.environ.get('CACHE_MAXSIZE', 10000)), ttl=ttl)
+    check_interval = float(os.environ.get('CACHE_VERSION_CHECK_SECONDS', 5))
+    return ResultCache(backend, version=version, check_interval=check_interval)
@@ -0,0 +1,216 @@
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_app_context
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from metrics import instrument_engine
+from snapshot import snapshot_url, snapshot_engine_options, configure_snapshot_engine
+
+# Get DATABASE_URL from environment; SNAPSHOT_PATH (a read-only SQLite
+# snapshot, see snapshot.py) takes its place when set
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH")
+DATABASE_URL = snapshot_url(SNAPSHOT_PATH) if SNAPSHOT_PATH else os.environ.get("DATABASE_URL")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+def engine_options_from_env(url):
+    """
+    Pool settings for create_engine, read from the environment:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (seconds to wait for a
+    connection), DB_POOL_RECYCLE (seconds before a connection is replaced)
+    and DB_POOL_PRE_PING (check connections on checkout, 1/0).
+    """
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1'}
+    if not url.startswith('sqlite'):
+        # SQLite uses its own pool classes, which take none of these
+        options.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        )
+    return options
+
+# Database Setup
+if SNAPSHOT_PATH:
+    engine = create_engine(DATABASE_URL, **snapshot_engine_options())
+    configure_snapshot_engine(engine, SNAPSHOT_PATH)
+else:
+    engine = create_engine(DATABASE_URL, **engine_options_from_env(DATABASE_URL))
+# db_query_seconds histogram and the SLOW_QUERY_MS log (see metrics.py)
+instrument_engine(engine)
+Base = declarative_base()
+
+# SQLAlchemy Model
+class TrademarkModel(Base):
+    __tablename__ = 'trademarks'
+    id = Column(Integer, primary_key=True)
+    category_code = Column(String)
+    mark_identification = Column(Text)
+    serial_number = Column(String, unique=True)
+    case_file_owners = Column(Text)
+    status = Column(String)
+    xml_filename = Column(String)
+
+# Normalized owners (filled by the ingestion pipeline, see normalize.py)
+class OwnerModel(Base):
+    __tablename__ = 'owners'
+    id = Column(Integer, primary_key=True)
+    name = Column(Text)
+    normalized_name = Column(Text, unique=True)
+
+class TrademarkOwnerModel(Base):
+    __tablename__ = 'trademark_owners'
+    trademark_id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    position = Column(Integer)
+
+# Precomputed mark keys for similarMarks (see phonetic.py)
+class MarkKeyModel(Base):
+    __tablename__ = 'mark_keys'
+    trademark_id = Column(Integer, primary_key=True)
+    normalized_mark = Column(Text)
+    phonetic_key = Column(String)
+    soundex_key = Column(String)
+
+# Summary tables kept current by the ingestion pipeline ('' = missing value)
+class CategoryStatusCountModel(Base):
+    __tablename__ = 'category_status_counts'
+    category_code = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    total = Column(Integer)
+
+class OwnerCategoryCountModel(Base):
+    __tablename__ = 'owner_category_counts'
+    owner_id = Column(Integer, primary_key=True)
+    category_code = Column(String, primary_key=True)
+    total = Column(Integer)
+
+class FilingDayCountModel(Base):
+    __tablename__ = 'filing_day_counts'
+    xml_filename = Column(String, primary_key=True)
+    total = Column(Integer)
+
+# Single-row table bumped by the ingestion pipeline after every load
+class DataVersionModel(Base):
+    __tablename__ = 'data_version'
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime)
+
+def read_data_version():
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(DataVersionModel.version)).scalar() or 0
+    except DBAPIError:
+        # database loaded before the table existed
+        return 0
+
+
+''' -------------Sessions-----------------'''
+
+_scoped_session = ContextVar('scoped_session', default=None)
+
+def init_app(app):
+    """Closes the request's session (and returns its connection) when the request ends."""
+    @app.teardown_appcontext
+    def close_session(exc):
+        session = g.pop('db_session', None)
+        if session is not None:
+            session.close()
+
+@contextmanager
+def session_scope():
+    """Shares one session with get_session() callers outside a Flask request (scripts, benchmarks)."""
+    session = _scoped_session.get()
+    if session is not None:
+        yield session
+        return
+    session = Session(engine)
+    token = _scoped_session.set(session)
+    try:
+        yield session
+    finally:
+        _scoped_session.reset(token)
+        session.close()
+
+def get_session():
+    """
+    The session shared by every resolver of the current GraphQL operation:
+    one per Flask request, or the enclosing session_scope(). The session only
+    checks a connection out of the pool on its first query, so operations
+    answered entirely from the cache never touch the pool.
+    """
+    if has_app_context():
+        if 'db_session' not in g:
+            g.db_session = Session(engine)
+        return g.db_session
+    session = _scoped_session.get()
+    if session is None:
+        raise RuntimeError("get_session() needs a Flask request or an enclosing session_scope()")
+    return session
+
+
+''' -------------Pool metrics-----------------'''
+
+class PoolMetrics:
+    """Counters fed by pool events; pool_status() adds the pool's own gauges."""
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.invalidations = 0
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out -= 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def status(self):
+        pool = self.engine.pool
+        status = {
+            'pool': type(pool).__name__,
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'checked_out': self.checked_out,
+            'peak_checked_out': self.peak_checked_out,
+            'invalidations': self.invalidations,
+        }
+        if hasattr(pool, 'overflow'):
+            status.update(
+                size=pool.size(),
+                idle=pool.checkedin(),
+                overflow=pool.overflow(),
+                # share of pool_size + max_overflow currently in use
+                utilization=pool.checkedout() / (pool.size() + pool._max_overflow)
+                if pool._max_overflow >= 0 else None,
+            )
+        return status
+
+pool_metrics = PoolMetrics(engine)
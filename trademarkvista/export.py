@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+import os
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+import queries
+from db import engine
+from projection import COLUMN_KEYS
+
+# Bulk export that streams rows instead of building one GraphQL response:
+#   GET /export?format=ndjson&category_code=009&status=700&owner=Acme%20Inc
+#   GET /export?format=csv&columns=serial_number,mark_identification
+# Rows come from a server-side cursor (a named cursor on PostgreSQL) in
+# batches of EXPORT_BATCH_SIZE, so memory stays flat however many rows match
+# and the first bytes go out as soon as the first batch is read.
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 5000))
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+export = Blueprint('export', __name__)
+
+
+def ndjson_chunks(keys, batches):
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(keys, row))) + '\n' for row in rows)
+
+def csv_chunks(keys, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stream_rows(stmt, batch_size=EXPORT_BATCH_SIZE):
+    """Batches of result tuples from a server-side cursor; the connection is held only while streaming."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        for rows in result.partitions(batch_size):
+            yield [tuple(row) for row in rows]
+
+@export.route('/export', methods=['GET'])
+def export_rows():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+    keys = request.args.get('columns')
+    keys = keys.split(',') if keys else list(COLUMN_KEYS)
+    unknown = [key for key in keys if key not in COLUMN_KEYS]
+    if unknown:
+        return jsonify({"error": f"unknown columns: {', '.join(unknown)}"}), 400
+
+    stmt = queries.export_statement(
+        keys,
+        category_code=request.args.get('category_code'),
+        status=request.args.get('status'),
+        owner=request.args.get('owner'),
+    )
+    chunks = (csv_chunks if fmt == 'csv' else ndjson_chunks)(keys, stream_rows(stmt))
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=trademarks.{fmt}'
+    return response
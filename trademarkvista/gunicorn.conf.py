@@ -1,4 +1,11 @@
+import os
+
 bind = "0.0.0.0:10000"
 workers = 2
 threads = 4
-timeout = 120
\ No newline at end of file
+timeout = 120
+
+# One pooled connection per thread, plus overflow for bursts
+# (see engine_options_from_env in db.py)
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+os.environ.setdefault("DB_MAX_OVERFLOW", str(threads))
@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+from promise import Promise
+from promise.dataloader import DataLoader
+
+# Most serial numbers one trademarksBySerials call may ask for
+MAX_SERIALS = int(os.environ.get("MAX_SERIALS", 5000))
+# Rows fetched per round trip; SQLite caps the number of bound parameters
+SERIAL_CHUNK_SIZE = 5000
+
+
+def check_serials(serial_numbers):
+    # a null list asks for nothing
+    serial_numbers = serial_numbers or []
+    if len(serial_numbers) > MAX_SERIALS:
+        raise ValueError(f"At most {MAX_SERIALS} serial numbers per request")
+    return serial_numbers
+
+def fetch_serials(cache, query, keys, serial_numbers):
+    """
+    Answers a batch of serial lookups: cached ones from `cache` (one entry
+    per serial number and selection), the rest with one query per
+    SERIAL_CHUNK_SIZE serials. Returns rows (or None) in request order.
+    """
+    found = {}
+    missing = []
+    for serial_number in dict.fromkeys(serial_numbers):
+        hit, value = cache.lookup('trademark_by_serial', keys, serial_number)
+        if hit:
+            found[serial_number] = value
+        else:
+            missing.append(serial_number)
+    for start in range(0, len(missing), SERIAL_CHUNK_SIZE):
+        chunk = missing[start:start + SERIAL_CHUNK_SIZE]
+        rows = query(keys, chunk)
+        for serial_number in chunk:
+            found[serial_number] = rows.get(serial_number)
+            cache.store('trademark_by_serial', found[serial_number], keys, serial_number)
+    return [found[serial_number] for serial_number in serial_numbers]
+
+
+class SerialLoader(DataLoader):
+    """
+    Per-operation DataLoader: every trademarkBySerial / trademarksBySerials
+    lookup made while resolving one document is collected, de-duplicated and
+    answered with a single WHERE serial_number = ANY(...) query.
+    """
+    def __init__(self, cache, query, keys):
+        super().__init__()
+        self.fetch = lambda serial_numbers: fetch_serials(cache, query, keys, serial_numbers)
+
+    def batch_load_fn(self, serial_numbers):
+        return Promise.resolve(self.fetch(serial_numbers))
+
+
+class AsyncSerialLoader:
+    """
+    asyncio counterpart of SerialLoader for the ASGI server: loads requested
+    in the same event-loop tick are answered by one batched query.
+    `fetch` is a coroutine taking the list of serial numbers.
+    """
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self._pending = {}
+
+    def load(self, serial_number):
+        future = self._pending.get(serial_number)
+        if future is None:
+            if not self._pending:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+            future = self._pending[serial_number] = asyncio.get_running_loop().create_future()
+        return future
+
+    def load_many(self, serial_numbers):
+        return asyncio.gather(*(self.load(s) for s in serial_numbers))
+
+    def _dispatch(self):
+        batch, self._pending = self._pending, {}
+        asyncio.ensure_future(self._resolve(batch))
+
+    async def _resolve(self, batch):
+        try:
+            rows = await self.fetch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for future, row in zip(batch.values(), rows):
+            future.set_result(row)
@@ -0,0 +1,322 @@
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from graphql.execution.middleware import MiddlewareManager
+from promise import Promise
+
+# Counters and histograms in the Prometheus text format, kept in-process:
+# the Flask apps and asgi.py serve them on GET /metrics, the ingestion scripts
+# write them to a file for node_exporter's textfile collector. Under gunicorn
+# every worker has its own numbers (each scrape sees one worker).
+#
+# SLOW_QUERY_MS / SLOW_RESOLVER_MS: log SQL statements / root GraphQL fields
+# slower than that to the 'trademarkvista.slow' logger (off when unset).
+SLOW_QUERY_MS = os.environ.get('SLOW_QUERY_MS')
+SLOW_RESOLVER_MS = os.environ.get('SLOW_RESOLVER_MS')
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+slow_log = logging.getLogger('trademarkvista.slow')
+_registry = {}
+_lock = threading.Lock()
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        # registering a name again (e.g. a module imported twice) replaces it
+        with _lock:
+            _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with _lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def clear(self):
+        with _lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self, key, value):
+        return [f'{self.name}{_label_text(self.labels, key)} {_number(value)}']
+
+
+class Gauge(_Metric):
+    """A value read when the metrics are rendered: `function()` -> {labels tuple: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def render(self):
+        if self.function is not None:
+            with _lock:
+                self._values = dict(self.function())
+        return super().render()
+
+    def _samples(self, key, value):
+        return [f'{self.name}{_label_text(self.labels, key)} {_number(value)}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines = [
+            f'{self.name}_bucket{_label_text(self.labels, key, [("le", _number(bound))])} {count}'
+            for bound, count in zip(self.buckets, counts)
+        ]
+        lines.append(f'{self.name}_sum{_label_text(self.labels, key)} {_number(total)}')
+        lines.append(f'{self.name}_count{_label_text(self.labels, key)} {counts[-1]}')
+        return lines
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    with _lock:
+        metrics = list(_registry.values())
+    return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+def write_textfile(path):
+    """Writes render() to `path` atomically (node_exporter reads *.prom files)."""
+    with open(path + '.tmp', 'w') as f:
+        f.write(render())
+    os.replace(path + '.tmp', path)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+''' -------------API metrics-----------------'''
+
+resolver_seconds = Histogram('graphql_resolver_seconds', "Latency of root GraphQL fields", ['field'])
+resolver_rows = Counter('graphql_resolver_rows_total', "Rows returned by root GraphQL fields", ['field'])
+resolver_errors = Counter('graphql_resolver_errors_total', "Root GraphQL fields that raised", ['field'])
+db_query_seconds = Histogram('db_query_seconds', "Latency of SQL statements", ['statement'])
+
+def _count_rows(value):
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    # connection pages
+    nodes = getattr(value, 'nodes', None)
+    if nodes is not None:
+        return len(nodes)
+    return 0 if value is None else 1
+
+
+class ResolverMetrics:
+    """
+    Graphene middleware timing the root fields of every operation (nested
+    fields are plain attribute reads and are passed through untouched). Works
+    with values, promises (the serial DataLoader) and coroutines (asgi.py).
+    """
+    def resolve(self, next, root, info, **args):
+        if root is not None:
+            return next(root, info, **args)
+        field = info.field_name
+        start = time.perf_counter()
+
+        def done(value):
+            seconds = time.perf_counter() - start
+            resolver_seconds.observe(seconds, field=field)
+            resolver_rows.inc(_count_rows(value), field=field)
+            if SLOW_RESOLVER_MS is not None and seconds * 1000 >= float(SLOW_RESOLVER_MS):
+                slow_log.warning("slow resolver %s %.1f ms args=%r", field, seconds * 1000, args)
+            return value
+
+        def failed(error):
+            resolver_errors.inc(field=field)
+            raise error
+
+        try:
+            result = next(root, info, **args)
+        except Exception:
+            resolver_errors.inc(field=field)
+            raise
+        if isinstance(result, Promise):
+            # a resolved promise is as good as a value; only a pending one
+            # (a DataLoader batch) is timed when it settles
+            if result.is_fulfilled:
+                return done(result.get())
+            if result.is_rejected:
+                resolver_errors.inc(field=field)
+                return result
+            return result.then(done, failed)
+        if inspect.isawaitable(result):
+            async def wait():
+                try:
+                    value = await result
+                except Exception as error:
+                    failed(error)
+                return done(value)
+            return wait()
+        return done(result)
+
+
+def resolver_middleware():
+    """
+    ResolverMetrics for schema.execute / GraphQLView. Without wrap_in_promise
+    the nested fields keep graphql-core's fast path instead of each getting
+    a Promise.
+    """
+    return MiddlewareManager(ResolverMetrics(), wrap_in_promise=False)
+
+def stats_gauge(name, help, stats):
+    """Gauge over the numeric entries of a stats() dict (query cache, connection pool)."""
+    return Gauge(name, help, ['stat'], lambda: {
+        (key,): value for key, value in stats().items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    })
+
+def instrument_engine(engine):
+    """Times every SQL statement on `engine` (sync engines; pass async_engine.sync_engine)."""
+    from sqlalchemy import event
+
+    # the start time lives on the statement's execution context, so a
+    # statement that raises (and never reaches after_cursor_execute) leaves
+    # nothing behind on the pooled connection
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, 'query_start', None)
+        if start is None:
+            return
+        seconds = time.perf_counter() - start
+        db_query_seconds.observe(seconds, statement=statement.split(None, 1)[0].upper())
+        if SLOW_QUERY_MS is not None and seconds * 1000 >= float(SLOW_QUERY_MS):
+            slow_log.warning("slow query %.1f ms: %s %r", seconds * 1000, ' '.join(statement.split()), parameters)
+
+
+''' -------------Ingestion metrics-----------------'''
+
+ingest_seconds = Counter('ingest_stage_seconds_total', "Time spent per ingestion stage", ['stage'])
+ingest_items = Counter('ingest_stage_items_total', "Files or case-files handled per ingestion stage", ['stage', 'unit'])
+ingest_bytes = Counter('ingest_stage_bytes_total', "Bytes handled per ingestion stage", ['stage'])
+
+def record_stage(stage, seconds, items=0, size=0, unit='case-files'):
+    ingest_seconds.inc(seconds, stage=stage)
+    ingest_items.inc(items, stage=stage, unit=unit)
+    if size:
+        ingest_bytes.inc(size, stage=stage)
+
+@contextmanager
+def ingest_stage(stage, unit='case-files'):
+    """
+    Times an ingestion stage; the block reports what it handled through the
+    yielded dict ({'items': n, 'bytes': n}).
+    """
+    counts = {'items': 0, 'bytes': 0}
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        record_stage(stage, time.perf_counter() - start, counts['items'], counts['bytes'], unit)
+
+def timed_iter(iterable, stage, count=None, unit='case-files'):
+    """
+    Passes `iterable` through, charging the time spent producing each item
+    (e.g. parsing the next file or batch) to `stage`; count(item) is how many
+    units the item holds (1 by default).
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record_stage(stage, time.perf_counter() - start, unit=unit)
+            return
+        record_stage(stage, time.perf_counter() - start, count(item) if count else 1, unit=unit)
+        yield item
+
+def report_ingest(metrics_file=None):
+    """Prints ingest_summary() and, if given, writes every metric to metrics_file."""
+    for line in ingest_summary():
+        print(line)
+    if metrics_file:
+        write_textfile(metrics_file)
+
+def ingest_stages():
+    """{stage: {'seconds', 'items', 'unit', 'bytes'}} of everything recorded so far."""
+    stages = {}
+    for (stage,), seconds in sorted(ingest_seconds._values.items()):
+        items = sum(value for (name, _), value in ingest_items._values.items() if name == stage)
+        units = [unit for (name, unit) in ingest_items._values if name == stage]
+        stages[stage] = {'seconds': seconds, 'items': items, 'unit': units[0] if units else 'items',
+                         'bytes': ingest_bytes.value(stage=stage)}
+    return stages
+
+def ingest_summary():
+    """One line per stage: time and throughput, e.g. for the end of a script."""
+    lines = []
+    for stage, totals in ingest_stages().items():
+        seconds, items, unit, size = totals['seconds'], totals['items'], totals['unit'], totals['bytes']
+        rate = f", {items / seconds:.0f} {unit}/s" if seconds and items else ''
+        rate += f", {size / seconds / 1024 / 1024:.1f} MB/s" if seconds and size else ''
+        lines.append(f"{stage}: {seconds:.1f}s, {items} {unit}{rate}")
+    return lines
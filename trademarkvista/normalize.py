@@ -0,0 +1,51 @@
+import re
+import unicodedata
+
+# Owner-name normalization, shared by the ingestion scripts (link_owners in
+# uspto_db/stream_to_db.py, uspto_db/backfill_owners.py) and the API so that
+# "Acme, Inc." and "ACME INC" find the same owner row.
+
+CORPORATE_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'llc', 'llp', 'lp',
+    'ltd', 'limited', 'plc', 'gmbh', 'ag', 'sa', 'sarl', 'srl', 'spa', 'bv', 'nv',
+    'pty', 'pte', 'kk', 'oy', 'ab', 'as',
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s&]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_owner(name):
+    """
+    Lookup key for an owner name: accents removed, case folded, punctuation
+    dropped and trailing corporate suffixes (Inc., LLC, GmbH, ...) stripped.
+    Returns '' for a name with nothing left.
+    """
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).casefold()
+    # "l.l.c." -> "llc" before the remaining punctuation becomes spaces
+    name = re.sub(r"\b(\w)\.(?=\w\.)", r"\1", name)
+    words = _SPACES.sub(' ', _PUNCTUATION.sub(' ', name)).split()
+    while len(words) > 1 and words[-1] in CORPORATE_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+def split_owners(case_file_owners):
+    """
+    Best-effort inverse of the parser's ', '.join(party names), for rows loaded
+    before owners were stored separately: a piece that is only a corporate
+    suffix ("INC.") is glued back to the name before it.
+    """
+    names = []
+    for piece in (case_file_owners or '').split(', '):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if names and normalize_owner(piece) in CORPORATE_SUFFIXES | {''}:
+            names[-1] = f"{names[-1]}, {piece}"
+        else:
+            names.append(piece)
+    return names
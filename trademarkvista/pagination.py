@@ -0,0 +1,70 @@
+import base64
+import os
+
+# Hard cap on rows per list field / connection page, whatever the client asks for
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 1000))
+DEFAULT_PAGE_SIZE = min(int(os.environ.get("DEFAULT_PAGE_SIZE", 100)), MAX_PAGE_SIZE)
+
+
+def clamp_first(first, default=DEFAULT_PAGE_SIZE):
+    if first is None:
+        return default
+    if first < 0:
+        raise ValueError("first must not be negative")
+    return min(first, MAX_PAGE_SIZE)
+
+def encode_cursor(kind, value):
+    """Opaque cursor: 'id:<last id>' for keyset pages, 'offset:<n>' for ranked searches."""
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode()
+
+def decode_cursor(cursor, kind):
+    if cursor is None:
+        return None
+    try:
+        cursor_kind, value = base64.urlsafe_b64decode(cursor.encode()).decode().split(':', 1)
+        value = int(value)
+        # a negative id / offset would reach the database as a bad OFFSET
+        if cursor_kind != kind or value < 0:
+            raise ValueError
+        return value
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+class Page:
+    """
+    One page of a connection. total_count is only computed (by calling `count`)
+    when the client actually selects totalCount.
+    """
+    def __init__(self, nodes, cursors, has_next_page, count):
+        self.nodes = nodes
+        self.edges = [{'cursor': cursor, 'node': node} for cursor, node in zip(cursors, nodes)]
+        self.page_info = {
+            'has_next_page': has_next_page,
+            'end_cursor': cursors[-1] if cursors else None,
+        }
+        self._count = count
+
+    @property
+    def total_count(self):
+        return self._count()
+
+
+def keyset_page(rows, first, count):
+    """
+    Keyset pagination on the primary key. `rows` are the rows with id > the
+    'id' cursor in id order, fetched with LIMIT first + 1; the extra row only
+    tells whether there is a next page.
+    """
+    nodes = rows[:first]
+    cursors = [encode_cursor('id', node['id']) for node in nodes]
+    return Page(nodes, cursors, len(rows) > first, count)
+
+def offset_page(rows, first, offset, count):
+    """
+    Pagination for ranked results, which have no stable key to seek on.
+    `rows` are fetched in rank order with LIMIT first + 1 OFFSET <'offset' cursor>.
+    """
+    nodes = rows[:first]
+    cursors = [encode_cursor('offset', offset + i + 1) for i in range(len(nodes))]
+    return Page(nodes, cursors, len(rows) > first, count)
@@ -0,0 +1,130 @@
+import re
+import unicodedata
+
+# Look-alike / sound-alike keys of a mark, shared by the ingestion scripts
+# (uspto_db/stream_to_db.py index_marks) and the similarMarks index, so both
+# sides compute exactly the same keys.
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_VOWELS = set('AEIOU')
+_SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'), **dict.fromkeys('CGJKQSXZ', '2'), **dict.fromkeys('DT', '3'),
+    'L': '4', **dict.fromkeys('MN', '5'), 'R': '6',
+}
+
+
+def normalize_mark(mark):
+    """Accents removed, case folded, everything but letters and digits dropped: "Nite-Life!" -> "nitelife"."""
+    if not mark:
+        return ''
+    mark = unicodedata.normalize('NFKD', mark)
+    mark = ''.join(c for c in mark if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub('', mark)
+
+def _letters(mark):
+    return re.sub(r'[^A-Z]', '', normalize_mark(mark).upper())
+
+def soundex(mark):
+    """American Soundex of the mark's letters ("Robert" -> "R163"); '' without letters."""
+    letters = _letters(mark)
+    if not letters:
+        return ''
+    key = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        code = _SOUNDEX_CODES.get(letter, '')
+        if code and code != previous:
+            key += code
+        # H and W do not separate letters with the same code, vowels do
+        if letter not in 'HW':
+            previous = code
+    return (key + '000')[:4]
+
+def metaphone(mark):
+    """
+    Lawrence Philips' original Metaphone of the mark's letters, e.g.
+    "Knight Life" -> "NTLF", "Quik" -> "KK". 0 stands for "th".
+    """
+    word = _letters(mark)
+    if not word:
+        return ''
+    if word[:2] in ('AE', 'GN', 'KN', 'PN', 'WR'):
+        word = word[1:]
+    if word[0] == 'X':
+        word = 'S' + word[1:]
+    elif word[:2] == 'WH':
+        word = 'W' + word[2:]
+
+    key = []
+    size = len(word)
+    at = lambda i: word[i] if 0 <= i < size else ''
+    for i, c in enumerate(word):
+        before, after, after2 = at(i - 1), at(i + 1), at(i + 2)
+        if c == before and c != 'C':
+            continue
+        if c in _VOWELS:
+            if i == 0:
+                key.append(c)
+        elif c == 'B':
+            if not (before == 'M' and i == size - 1):
+                key.append('B')
+        elif c == 'C':
+            if after == 'I' and after2 == 'A' or after == 'H':
+                key.append('K' if before == 'S' else 'X')
+            elif after in ('I', 'E', 'Y'):
+                if before != 'S':
+                    key.append('S')
+            else:
+                key.append('K')
+        elif c == 'D':
+            key.append('J' if after == 'G' and after2 in ('E', 'I', 'Y') else 'T')
+        elif c == 'G':
+            if after == 'H' and not (i + 2 >= size or after2 in _VOWELS):
+                continue
+            if after == 'N' and (i + 2 == size or word[i + 2:] == 'ED'):
+                continue
+            if before == 'D' and after in ('E', 'I', 'Y'):
+                continue
+            key.append('J' if after in ('I', 'E', 'Y') and before != 'G' else 'K')
+        elif c == 'H':
+            if before in ('C', 'S', 'P', 'T', 'G'):
+                continue
+            if before in _VOWELS and after not in _VOWELS:
+                continue
+            key.append('H')
+        elif c == 'K':
+            if before != 'C':
+                key.append('K')
+        elif c == 'P':
+            key.append('F' if after == 'H' else 'P')
+        elif c == 'Q':
+            key.append('K')
+        elif c == 'S':
+            if after == 'H' or after == 'I' and after2 in ('O', 'A'):
+                key.append('X')
+            else:
+                key.append('S')
+        elif c == 'T':
+            if after == 'I' and after2 in ('O', 'A'):
+                key.append('X')
+            elif after == 'H':
+                key.append('0')
+            elif not (after == 'C' and after2 == 'H'):
+                key.append('T')
+        elif c == 'V':
+            key.append('F')
+        elif c in ('W', 'Y'):
+            if after in _VOWELS:
+                key.append(c)
+        elif c == 'X':
+            key.append('KS')
+        elif c == 'Z':
+            key.append('S')
+        else:
+            # F J L M N R
+            key.append(c)
+    return ''.join(key)
+
+def mark_keys(mark):
+    """The keys stored per trademark in mark_keys."""
+    return {'normalized_mark': normalize_mark(mark), 'phonetic_key': metaphone(mark), 'soundex_key': soundex(mark)}
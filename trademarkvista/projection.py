@@ -0,0 +1,56 @@
+from graphene.utils.str_converters import to_camel_case
+from graphql.language.ast import Field, FragmentSpread, InlineFragment
+
+from db import TrademarkModel
+
+# GraphQL field name -> column key, e.g. 'markIdentification' -> 'mark_identification'
+COLUMN_KEYS = [column.key for column in TrademarkModel.__table__.columns]
+COLUMNS_BY_FIELD = {to_camel_case(key): key for key in COLUMN_KEYS}
+
+
+def _selected_names(selection_set, fragments, names):
+    for selection in selection_set.selections:
+        if isinstance(selection, Field):
+            names.setdefault(selection.name.value, []).append(selection)
+        elif isinstance(selection, FragmentSpread):
+            _selected_names(fragments[selection.name.value].selection_set, fragments, names)
+        elif isinstance(selection, InlineFragment):
+            _selected_names(selection.selection_set, fragments, names)
+    return names
+
+def requested_fields(info, path=()):
+    """
+    Names of the fields the client selected under the current field,
+    following `path` into nested objects (e.g. ('edges', 'node') for connections).
+    Fragments and inline fragments are expanded.
+    """
+    fields = list(info.field_asts)
+    for name in path:
+        nested = []
+        for field in fields:
+            if field.selection_set:
+                nested.extend(_selected_names(field.selection_set, info.fragments, {}).get(name, []))
+        fields = nested
+    names = {}
+    for field in fields:
+        if field.selection_set:
+            _selected_names(field.selection_set, info.fragments, names)
+    return set(names)
+
+def requested_column_keys(info, path=()):
+    """
+    Keys of the Trademark columns to SELECT for this field, in table order.
+    id is always included: it is the pagination key and what the search index
+    maps back to. Falls back to every column if nothing maps (e.g. only __typename).
+    """
+    fields = requested_fields(info, path)
+    if not fields.intersection(COLUMNS_BY_FIELD):
+        return list(COLUMN_KEYS)
+    return [key for field, key in COLUMNS_BY_FIELD.items() if field in fields or key == 'id']
+
+def to_columns(keys):
+    return [getattr(TrademarkModel, key) for key in keys]
+
+def rows_to_dicts(rows):
+    # plain dicts can be cached and serialized; graphene resolves fields from dict keys
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,140 @@
+import re
+
+from sqlalchemy import String, any_, bindparam, select, func
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from db import (engine, TrademarkModel, OwnerModel, TrademarkOwnerModel,
+                CategoryStatusCountModel, OwnerCategoryCountModel, FilingDayCountModel)
+from normalize import normalize_owner
+from search import get_search_backend
+from similar_marks import similar_mark_index
+from projection import to_columns, rows_to_dicts
+
+# The SQL behind the resolvers. Each function takes a (sync) session plus plain
+# arguments and returns plain dicts, so the results can be cached and the same
+# code runs under the async server through AsyncSession.run_sync.
+
+def _filtered(stmt, category_code):
+    if category_code is not None:
+        stmt = stmt.where(TrademarkModel.category_code == category_code)
+    return stmt
+
+def query_trademarks_by_serials(session, keys, serial_numbers):
+    """
+    Rows for many serial numbers in one round trip, as {serial_number: row}.
+    PostgreSQL gets a single array parameter (serial_number = ANY(:serials));
+    other databases an IN list.
+    """
+    columns = to_columns(keys if 'serial_number' in keys else keys + ['serial_number'])
+    if session.bind.dialect.name == 'postgresql':
+        condition = TrademarkModel.serial_number == any_(
+            bindparam('serials', list(serial_numbers), type_=ARRAY(String))
+        )
+    else:
+        condition = TrademarkModel.serial_number.in_(list(serial_numbers))
+    rows = session.execute(select(*columns).where(condition)).all()
+    return {row.serial_number: {key: row._mapping[key] for key in keys} for row in rows}
+
+def query_trademarks(session, keys, category_code, limit, after_id):
+    stmt = _filtered(select(*to_columns(keys)), category_code)
+    if after_id is not None:
+        stmt = stmt.where(TrademarkModel.id > after_id)
+    return rows_to_dicts(session.execute(stmt.order_by(TrademarkModel.id).limit(limit)).all())
+
+def query_count_trademarks(session, category_code):
+    stmt = _filtered(select(func.count()).select_from(TrademarkModel), category_code)
+    return session.execute(stmt).scalar_one()
+
+def _owned_by(stmt, owner):
+    # index lookups: owners.normalized_name, then trademark_owners (owner_id, trademark_id)
+    return (
+        stmt.join(TrademarkOwnerModel, TrademarkOwnerModel.trademark_id == TrademarkModel.id)
+        .join(OwnerModel, OwnerModel.id == TrademarkOwnerModel.owner_id)
+        .where(OwnerModel.normalized_name == normalize_owner(owner))
+    )
+
+def export_statement(keys, category_code=None, status=None, owner=None):
+    """SELECT behind the /export endpoint: every matching row in id order."""
+    stmt = _filtered(select(*to_columns(keys)), category_code)
+    if status is not None:
+        stmt = stmt.where(TrademarkModel.status == status)
+    if owner is not None:
+        stmt = _owned_by(stmt, owner)
+    return stmt.order_by(TrademarkModel.id)
+
+def query_trademarks_by_owner(session, keys, owner, limit, after_id):
+    stmt = _owned_by(select(*to_columns(keys)), owner)
+    if after_id is not None:
+        stmt = stmt.where(TrademarkModel.id > after_id)
+    return rows_to_dicts(session.execute(stmt.order_by(TrademarkModel.id).limit(limit)).all())
+
+def query_count_trademarks_by_owner(session, owner):
+    stmt = _owned_by(select(func.count()).select_from(TrademarkModel), owner)
+    return session.execute(stmt).scalar_one()
+
+def query_search(session, keys, keyword, owner, category_code, status, limit, offset):
+    # the category / status filters go into the same statement as the keyword match
+    filters = {'category_code': category_code, 'status': status}
+    return rows_to_dicts(get_search_backend(engine).search(
+        session, to_columns(keys), keyword=keyword, owner=owner, limit=limit, offset=offset, filters=filters
+    ))
+
+def query_count_search(session, keyword, owner, category_code, status):
+    filters = {'category_code': category_code, 'status': status}
+    return get_search_backend(engine).count(session, keyword=keyword, owner=owner, filters=filters)
+
+def query_similar_marks(session, keys, mark, category_code, limit):
+    """The most similar marks (similar_marks.py), best first, each with its score."""
+    scored = similar_mark_index.top_k(session, mark, category_code, limit)
+    if not scored:
+        return []
+    ids = [id_ for id_, _ in scored]
+    found = session.execute(select(*to_columns(keys)).where(TrademarkModel.id.in_(ids))).all()
+    by_id = {row.id: dict(row._mapping) for row in found}
+    return [dict(by_id[id_], score=score) for id_, score in scored if id_ in by_id]
+
+
+''' -------------Aggregates-----------------'''
+
+# Read from the summary tables the ingestion pipeline maintains, so their cost
+# depends on the number of classes / statuses / days, not of trademarks.
+DAILY_FILE = re.compile(r'apc(\d{2})(\d{2})(\d{2})')
+
+def _or_none(value):
+    return value if value != '' else None
+
+def file_day(xml_filename):
+    """YYYY-MM-DD of a USPTO daily file name (apcYYMMDD.xml), None for other names."""
+    match = DAILY_FILE.match(xml_filename or '')
+    return f'20{match[1]}-{match[2]}-{match[3]}' if match else None
+
+def query_category_status_counts(session, category_code, status):
+    stmt = select(CategoryStatusCountModel.category_code, CategoryStatusCountModel.status,
+                  CategoryStatusCountModel.total)
+    if category_code is not None:
+        stmt = stmt.where(CategoryStatusCountModel.category_code == category_code)
+    if status is not None:
+        stmt = stmt.where(CategoryStatusCountModel.status == status)
+    rows = session.execute(stmt.order_by(CategoryStatusCountModel.category_code, CategoryStatusCountModel.status))
+    return [{'category_code': _or_none(row.category_code), 'status': _or_none(row.status), 'count': row.total}
+            for row in rows]
+
+def query_top_owners(session, category_code, limit):
+    stmt = (
+        select(OwnerModel.name, OwnerCategoryCountModel.total)
+        .join(OwnerModel, OwnerModel.id == OwnerCategoryCountModel.owner_id)
+        .where(OwnerCategoryCountModel.category_code == category_code)
+        .order_by(OwnerCategoryCountModel.total.desc(), OwnerModel.name)
+        .limit(limit)
+    )
+    return [{'owner': row.name, 'count': row.total} for row in session.execute(stmt)]
+
+def query_filing_days(session, limit):
+    """Case-files per daily file, latest file first (apcYYMMDD names sort by day)."""
+    stmt = (
+        select(FilingDayCountModel.xml_filename, FilingDayCountModel.total)
+        .order_by(FilingDayCountModel.xml_filename.desc())
+        .limit(limit)
+    )
+    return [{'xml_filename': _or_none(row.xml_filename), 'day': file_day(row.xml_filename), 'count': row.total}
+            for row in session.execute(stmt)]
@@ -0,0 +1,253 @@
+import os
+
+import graphene
+
+import queries
+from db import engine, read_data_version, get_session
+from search import get_search_backend
+from similar_marks import DEFAULT_LIMIT as DEFAULT_SIMILAR_LIMIT, similar_mark_index
+from pagination import MAX_PAGE_SIZE, clamp_first, decode_cursor, keyset_page, offset_page
+from projection import requested_column_keys
+from cache import cache_from_env
+from loaders import SerialLoader, check_serials
+
+# GraphQL Schema
+class Trademark(graphene.ObjectType):
+    id = graphene.Int()
+    category_code = graphene.String()
+    mark_identification = graphene.String()
+    serial_number = graphene.String()
+    case_file_owners = graphene.String()
+    status = graphene.String()
+    xml_filename = graphene.String()
+
+class SimilarMark(Trademark):
+    # 0..1, how much the mark looks and sounds like the one searched for
+    score = graphene.Float()
+
+class PageInfo(graphene.ObjectType):
+    has_next_page = graphene.Boolean()
+    end_cursor = graphene.String()
+
+class TrademarkEdge(graphene.ObjectType):
+    cursor = graphene.String()
+    node = graphene.Field(Trademark)
+
+class TrademarkConnection(graphene.ObjectType):
+    edges = graphene.List(TrademarkEdge)
+    page_info = graphene.Field(PageInfo)
+    # only counted when selected
+    total_count = graphene.Int()
+
+# Aggregates, read from the summary tables
+class CategoryStatusCount(graphene.ObjectType):
+    category_code = graphene.String()
+    status = graphene.String()
+    count = graphene.Int()
+
+class OwnerCount(graphene.ObjectType):
+    owner = graphene.String()
+    count = graphene.Int()
+
+class FilingDayCount(graphene.ObjectType):
+    xml_filename = graphene.String()
+    # YYYY-MM-DD of the daily file
+    day = graphene.String()
+    count = graphene.Int()
+
+DEFAULT_TOP_OWNERS = 10
+
+# where the Trademark selection sits inside a connection
+NODE_PATH = ('edges', 'node')
+
+def page_args(**kwargs):
+    # first: page size (capped at MAX_PAGE_SIZE), after: cursor from a previous page
+    return dict(kwargs, first=graphene.Int(), after=graphene.String())
+
+# Data loaders behind the resolvers: the queries in queries.py, run on the
+# request's session and memoized in query_cache.
+query_cache = cache_from_env(version=read_data_version)
+
+def start_index_builds():
+    """
+    Starts building the in-process search and similar-mark indexes at startup,
+    so no request pays for it; INDEX_PRELOAD=lazy leaves it to the first query.
+    """
+    if os.environ.get('INDEX_PRELOAD', 'background') == 'lazy':
+        return
+    backend = get_search_backend(engine)
+    if hasattr(backend, 'start'):
+        backend.start()
+    similar_mark_index.start()
+
+@query_cache.on_invalidate
+def _reset_search_index():
+    backend = get_search_backend(engine)
+    if hasattr(backend, 'invalidate'):
+        backend.invalidate()
+    similar_mark_index.invalidate()
+
+@query_cache.cached
+def load_trademarks(keys, category_code, limit, after_id):
+    return queries.query_trademarks(get_session(), keys, category_code, limit, after_id)
+
+@query_cache.cached
+def count_trademarks(category_code):
+    return queries.query_count_trademarks(get_session(), category_code)
+
+@query_cache.cached
+def load_search(keys, keyword, owner, category_code, status, limit, offset):
+    return queries.query_search(get_session(), keys, keyword, owner, category_code, status, limit, offset)
+
+@query_cache.cached
+def count_search(keyword, owner, category_code, status):
+    return queries.query_count_search(get_session(), keyword, owner, category_code, status)
+
+@query_cache.cached
+def load_trademarks_by_owner(keys, owner, limit, after_id):
+    return queries.query_trademarks_by_owner(get_session(), keys, owner, limit, after_id)
+
+@query_cache.cached
+def count_trademarks_by_owner(owner):
+    return queries.query_count_trademarks_by_owner(get_session(), owner)
+
+@query_cache.cached
+def load_similar_marks(keys, mark, category_code, limit):
+    return queries.query_similar_marks(get_session(), keys, mark, category_code, limit)
+
+@query_cache.cached
+def load_category_status_counts(category_code, status):
+    return queries.query_category_status_counts(get_session(), category_code, status)
+
+@query_cache.cached
+def load_top_owners(category_code, limit):
+    return queries.query_top_owners(get_session(), category_code, limit)
+
+@query_cache.cached
+def load_filing_days(limit):
+    return queries.query_filing_days(get_session(), limit)
+
+def serial_loader(keys):
+    # one loader per selection for the whole operation, kept on the request's session
+    session = get_session()
+    loaders = session.info.setdefault('serial_loaders', {})
+    if tuple(keys) not in loaders:
+        query = lambda keys, serial_numbers: queries.query_trademarks_by_serials(session, keys, serial_numbers)
+        loaders[tuple(keys)] = SerialLoader(query_cache, query, keys)
+    return loaders[tuple(keys)]
+
+def trademark_page(keys, category_code, first, after):
+    rows = load_trademarks(keys, category_code, first + 1, decode_cursor(after, 'id'))
+    return keyset_page(rows, first, lambda: count_trademarks(category_code))
+
+def owner_page(keys, owner, first, after):
+    rows = load_trademarks_by_owner(keys, owner, first + 1, decode_cursor(after, 'id'))
+    return keyset_page(rows, first, lambda: count_trademarks_by_owner(owner))
+
+def search_page(keys, keyword, owner, category_code, status, first, after):
+    offset = decode_cursor(after, 'offset') or 0
+    rows = load_search(keys, keyword, owner, category_code, status, first + 1, offset)
+    return offset_page(rows, first, offset, lambda: count_search(keyword, owner, category_code, status))
+
+# keyword / owner are substring matches, categoryCode / status exact ones
+SEARCH_ARGS = dict(
+    keyword=graphene.String(), owner=graphene.String(), category_code=graphene.String(), status=graphene.String(),
+)
+
+class Query(graphene.ObjectType):
+    all_trademarks = graphene.List(Trademark, **page_args())
+    trademark_by_serial = graphene.Field(Trademark, serial_number=graphene.String())
+    # one entry per requested serial number, null where there is no match
+    trademarks_by_serials = graphene.List(Trademark, serial_numbers=graphene.List(graphene.String))
+    trademarks_by_category = graphene.List(Trademark, **page_args(category_code=graphene.String()))
+    search_marks = graphene.List(Trademark, **page_args(**SEARCH_ARGS))
+    # every mark of one owner, matched on the normalized name ("Acme, Inc." = "ACME INC")
+    trademarks_by_owner = graphene.List(Trademark, **page_args(owner=graphene.String(required=True)))
+    # clearance search: marks that look or sound like `mark`, most similar first
+    similar_marks = graphene.List(
+        SimilarMark, mark=graphene.String(required=True), category_code=graphene.String(), limit=graphene.Int()
+    )
+
+    # counts per class and status code, e.g. how many marks of class 040 are registered (700)
+    category_status_counts = graphene.List(
+        CategoryStatusCount, category_code=graphene.String(), status=graphene.String()
+    )
+    mark_count = graphene.Int(category_code=graphene.String(), status=graphene.String())
+    # owners with the most marks in a class
+    top_owners = graphene.List(OwnerCount, category_code=graphene.String(required=True), first=graphene.Int())
+    # case-files per USPTO daily file, latest first
+    filings_by_day = graphene.List(FilingDayCount, first=graphene.Int())
+
+    all_trademarks_connection = graphene.Field(TrademarkConnection, **page_args())
+    trademarks_by_category_connection = graphene.Field(
+        TrademarkConnection, **page_args(category_code=graphene.String())
+    )
+    search_marks_connection = graphene.Field(TrademarkConnection, **page_args(**SEARCH_ARGS))
+    trademarks_by_owner_connection = graphene.Field(
+        TrademarkConnection, **page_args(owner=graphene.String(required=True))
+    )
+
+    # Resolvers only SELECT the columns the client asked for and return
+    # lightweight rows instead of ORM entities; repeated lookups are served
+    # from query_cache.
+    # List fields return at most MAX_PAGE_SIZE rows; use `after` or the
+    # *Connection fields to walk through larger results.
+    def resolve_all_trademarks(self, info, first=None, after=None):
+        keys = requested_column_keys(info)
+        return trademark_page(keys, None, clamp_first(first, MAX_PAGE_SIZE), after).nodes
+
+    def resolve_trademark_by_serial(self, info, serial_number):
+        # batched with the operation's other serial lookups
+        return serial_loader(requested_column_keys(info)).load(serial_number)
+
+    def resolve_trademarks_by_serials(self, info, serial_numbers=None):
+        return serial_loader(requested_column_keys(info)).load_many(check_serials(serial_numbers))
+
+    def resolve_trademarks_by_category(self, info, category_code=None, first=None, after=None):
+        keys = requested_column_keys(info)
+        return trademark_page(keys, category_code, clamp_first(first, MAX_PAGE_SIZE), after).nodes
+
+    def resolve_search_marks(self, info, keyword=None, owner=None, category_code=None, status=None,
+                             first=None, after=None):
+        # Substring match on the mark (and optionally the owners), best matches first
+        keys = requested_column_keys(info)
+        return search_page(keys, keyword, owner, category_code, status, clamp_first(first, MAX_PAGE_SIZE), after).nodes
+
+    def resolve_trademarks_by_owner(self, info, owner, first=None, after=None):
+        keys = requested_column_keys(info)
+        return owner_page(keys, owner, clamp_first(first, MAX_PAGE_SIZE), after).nodes
+
+    def resolve_similar_marks(self, info, mark, category_code=None, limit=None):
+        keys = requested_column_keys(info)
+        return load_similar_marks(keys, mark, category_code, clamp_first(limit, DEFAULT_SIMILAR_LIMIT))
+
+    def resolve_category_status_counts(self, info, category_code=None, status=None):
+        return load_category_status_counts(category_code, status)
+
+    def resolve_mark_count(self, info, category_code=None, status=None):
+        return sum(row['count'] for row in load_category_status_counts(category_code, status))
+
+    def resolve_top_owners(self, info, category_code, first=None):
+        return load_top_owners(category_code, clamp_first(first, DEFAULT_TOP_OWNERS))
+
+    def resolve_filings_by_day(self, info, first=None):
+        return load_filing_days(clamp_first(first, MAX_PAGE_SIZE))
+
+    def resolve_all_trademarks_connection(self, info, first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return trademark_page(keys, None, clamp_first(first), after)
+
+    def resolve_trademarks_by_category_connection(self, info, category_code=None, first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return trademark_page(keys, category_code, clamp_first(first), after)
+
+    def resolve_search_marks_connection(self, info, keyword=None, owner=None, category_code=None, status=None,
+                                        first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return search_page(keys, keyword, owner, category_code, status, clamp_first(first), after)
+
+    def resolve_trademarks_by_owner_connection(self, info, owner, first=None, after=None):
+        keys = requested_column_keys(info, NODE_PATH)
+        return owner_page(keys, owner, clamp_first(first), after)
+
+schema = graphene.Schema(query=Query)
@@ -0,0 +1,259 @@
+import heapq
+import re
+import threading
+from array import array
+
+from sqlalchemy import inspect, select, func, text, literal_column, table
+
+from background_index import BackgroundIndex
+from db import TrademarkModel
+from snapshot import FTS_TABLE
+
+
+def word_trigrams(value):
+    """
+    Trigrams the way pg_trgm builds them: lower-cased alphanumeric words,
+    each padded with two spaces in front and one behind.
+    """
+    grams = set()
+    for word in re.findall(r'[a-z0-9]+', value.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a, b):
+    """pg_trgm's similarity(): shared trigrams over the union of both sets."""
+    grams_a, grams_b = word_trigrams(a or ''), word_trigrams(b or '')
+    if not grams_a or not grams_b:
+        return 0.0
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+
+# Exact-match filters every backend applies on top of the keyword / owner match
+FILTER_COLUMNS = ('category_code', 'status')
+
+
+class IlikeSearch:
+    """The original search: ILIKE '%keyword%', a sequential scan without pg_trgm."""
+    def _statement(self, keyword, owner, columns, filters=None):
+        stmt = select(*columns)
+        if keyword:
+            stmt = stmt.where(TrademarkModel.mark_identification.ilike(f'%{keyword}%'))
+        if owner:
+            stmt = stmt.where(TrademarkModel.case_file_owners.ilike(f'%{owner}%'))
+        for column, value in (filters or {}).items():
+            if value is not None:
+                stmt = stmt.where(getattr(TrademarkModel, column) == value)
+        return stmt
+
+    def _ordered(self, keyword, owner, columns, filters=None):
+        return self._statement(keyword, owner, columns, filters).order_by(TrademarkModel.id)
+
+    def search(self, session, columns, keyword=None, owner=None, limit=None, offset=0, filters=None):
+        """
+        Matching rows with just the requested columns (which must include id).
+        `filters` maps FILTER_COLUMNS to required values, e.g. {'category_code': '009'}.
+        """
+        stmt = self._ordered(keyword, owner, columns, filters).limit(limit).offset(offset)
+        return session.execute(stmt).all()
+
+    def count(self, session, keyword=None, owner=None, filters=None):
+        stmt = select(func.count()).select_from(
+            self._statement(keyword, owner, [TrademarkModel.id], filters).subquery()
+        )
+        return session.execute(stmt).scalar_one()
+
+
+class TrigramSearch(IlikeSearch):
+    """
+    PostgreSQL search backed by pg_trgm GIN indexes (see
+    uspto_db/migrate_search_indexes.py). The planner answers ILIKE '%keyword%'
+    from the trigram index, and matches are ranked by similarity().
+    """
+    def _ordered(self, keyword, owner, columns, filters=None):
+        ranking = []
+        if keyword:
+            ranking.append(func.similarity(TrademarkModel.mark_identification, keyword).desc())
+        if owner:
+            ranking.append(func.similarity(TrademarkModel.case_file_owners, owner).desc())
+        return self._statement(keyword, owner, columns, filters).order_by(*ranking, TrademarkModel.id)
+
+
+class FtsSearch(IlikeSearch):
+    """
+    Search on a SQLite snapshot (uspto_db/build_snapshot.py): keyword and
+    owner substrings are looked up in its FTS5 table, whose trigram tokenizer
+    answers '%keyword%' from the index. Terms shorter than a trigram fall back
+    to LIKE. Matches are ranked by bm25(), best first, so that like
+    TrigramSearch the top results (and offset cursors) favour the closest marks.
+    """
+    @staticmethod
+    def _phrases(keyword, owner):
+        phrases = []
+        for column, term in (('mark_identification', keyword), ('case_file_owners', owner)):
+            if term and len(term) >= 3:
+                phrases.append(f'{column} : "{term.replace(chr(34), chr(34) * 2)}"')
+        return phrases
+
+    @staticmethod
+    def _matches(phrases):
+        """rowid and bm25() score (lower is better) of the FTS rows matching every phrase."""
+        return select(
+            literal_column('rowid').label('rowid'), literal_column(f'bm25({FTS_TABLE})').label('score')
+        ).select_from(table(FTS_TABLE)).where(
+            text(f"{FTS_TABLE} MATCH :phrases").bindparams(phrases=' AND '.join(phrases))
+        ).subquery()
+
+    def _filtered(self, keyword, owner, columns, filters=None):
+        # the LIKE part: terms too short for the trigram index, and the exact filters
+        return super()._statement(
+            keyword if keyword and len(keyword) < 3 else None,
+            owner if owner and len(owner) < 3 else None,
+            columns, filters,
+        )
+
+    def _statement(self, keyword, owner, columns, filters=None):
+        stmt = self._filtered(keyword, owner, columns, filters)
+        phrases = self._phrases(keyword, owner)
+        if phrases:
+            stmt = stmt.where(TrademarkModel.id.in_(select(self._matches(phrases).c.rowid)))
+        return stmt
+
+    def _ordered(self, keyword, owner, columns, filters=None):
+        phrases = self._phrases(keyword, owner)
+        if not phrases:
+            return super()._ordered(keyword, owner, columns, filters)
+        matches = self._matches(phrases)
+        return (
+            self._filtered(keyword, owner, columns, filters)
+            .join(matches, matches.c.rowid == TrademarkModel.id)
+            .order_by(matches.c.score, TrademarkModel.id)
+        )
+
+
+class InMemorySearch:
+    """
+    In-process trigram index for SQLite and test setups, where there is no pg_trgm.
+    Built in the background (background_index.py) from (id, mark_identification,
+    case_file_owners and the FILTER_COLUMNS) and rebuilt after invalidate().
+    Postings are arrays of ids, so a keyword only has to be checked against the
+    rows that contain all of its trigrams.
+    """
+    def __init__(self, engine=None):
+        self._columns = BackgroundIndex(self._build, engine, name='search-index')
+
+    def start(self):
+        self._columns.start()
+
+    def invalidate(self):
+        self._columns.invalidate()
+
+    def _build(self, session):
+        columns = {}
+        rows = session.execute(
+            select(TrademarkModel.id, TrademarkModel.mark_identification, TrademarkModel.case_file_owners,
+                   *(getattr(TrademarkModel, column) for column in FILTER_COLUMNS))
+        ).all()
+        for name, position in (('mark_identification', 1), ('case_file_owners', 2)):
+            texts = {}
+            postings = {}
+            for row in rows:
+                value = (row[position] or '').lower()
+                texts[row[0]] = value
+                for gram in {value[i:i + 3] for i in range(len(value) - 2)}:
+                    postings.setdefault(gram, array('i')).append(row[0])
+            columns[name] = (texts, postings)
+        for position, name in enumerate(FILTER_COLUMNS, start=3):
+            columns[name] = {row[0]: row[position] for row in rows}
+        return columns
+
+    def _index(self, session):
+        return self._columns.get()
+
+    def _matches(self, column, term):
+        texts, postings = column
+        term = term.lower()
+        grams = {term[i:i + 3] for i in range(len(term) - 2)}
+        if grams:
+            lists = sorted((postings.get(g, ()) for g in grams), key=len)
+            candidates = set(lists[0]).intersection(*lists[1:])
+        else:
+            # one or two characters: nothing to look up, check every row
+            candidates = texts.keys()
+        return {id_ for id_ in candidates if term in texts[id_]}
+
+    def _matching_ids(self, session, keyword, owner, filters=None):
+        index = self._index(session)
+        ids = None
+        if keyword:
+            ids = self._matches(index['mark_identification'], keyword)
+        if owner:
+            owner_ids = self._matches(index['case_file_owners'], owner)
+            ids = owner_ids if ids is None else ids & owner_ids
+        if ids is None:
+            ids = index['mark_identification'][0].keys()
+        for column, value in (filters or {}).items():
+            if value is not None:
+                values = index[column]
+                ids = {id_ for id_ in ids if values[id_] == value}
+        return ids
+
+    def _ranked_ids(self, session, keyword, owner, filters=None, limit=None):
+        """The best `limit` matches (all of them if None), best first."""
+        ids = self._matching_ids(session, keyword, owner, filters)
+        index = self._index(session)
+        marks, owners = index['mark_identification'][0], index['case_file_owners'][0]
+
+        def rank(id_):
+            score = 0.0
+            if keyword:
+                score += similarity(marks[id_], keyword)
+            if owner:
+                score += similarity(owners[id_], owner)
+            return (-score, id_)
+
+        if limit is None:
+            return sorted(ids, key=rank)
+        # a page only needs its own rows ranked, not every match
+        return heapq.nsmallest(limit, ids, key=rank)
+
+    def search(self, session, columns, keyword=None, owner=None, limit=None, offset=0, filters=None):
+        ordered = self._ranked_ids(session, keyword, owner, filters, None if limit is None else offset + limit)
+        ordered = ordered[offset:]
+        if not ordered:
+            return []
+        found = session.execute(
+            select(*columns).where(TrademarkModel.id.in_(ordered))
+        ).all()
+        by_id = {row.id: row for row in found}
+        return [by_id[id_] for id_ in ordered if id_ in by_id]
+
+    def count(self, session, keyword=None, owner=None, filters=None):
+        return len(self._matching_ids(session, keyword, owner, filters))
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_search_backend(engine):
+    """
+    Picks the search backend for an engine (once per engine):
+    pg_trgm if the extension is installed, plain ILIKE on PostgreSQL without it,
+    FTS5 on a SQLite snapshot and the in-process index on anything else.
+    """
+    with _backends_lock:
+        backend = _backends.get(engine)
+        if backend is None:
+            if engine.dialect.name == 'postgresql':
+                with engine.connect() as conn:
+                    has_trgm = conn.execute(
+                        text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    ).first() is not None
+                backend = TrigramSearch() if has_trgm else IlikeSearch()
+            elif engine.dialect.name == 'sqlite' and inspect(engine).has_table(FTS_TABLE):
+                backend = FtsSearch()
+            else:
+                backend = InMemorySearch(engine)
+            _backends[engine] = backend
+        return backend
@@ -0,0 +1,125 @@
+from array import array
+
+import numpy as np
+from sqlalchemy import select
+
+from background_index import BackgroundIndex
+from db import TrademarkModel, MarkKeyModel
+from phonetic import mark_keys
+
+# Clearance search: marks that look or sound like a candidate. Every mark is
+# scored on three keys computed at ingest (mark_keys table, phonetic.py):
+#   spelling  - trigram overlap of the normalized mark ("nitelife")
+#   sound     - trigram overlap of its Metaphone key ("NTLF")
+#   soundex   - same Soundex code
+# An identical mark scores 1.0.
+WEIGHTS = {'spelling': 0.5, 'sound': 0.35, 'soundex': 0.15}
+DEFAULT_LIMIT = 20
+
+
+def padded_trigrams(value):
+    """Trigrams of one key, padded like pg_trgm so short keys still have a few."""
+    if not value:
+        return set()
+    padded = f'  {value} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrigramColumn:
+    """Postings (trigram -> row positions) and the trigram count of every row."""
+    def __init__(self, values):
+        postings = {}
+        sizes = array('h')
+        for position, value in enumerate(values):
+            grams = padded_trigrams(value)
+            sizes.append(min(len(grams), 32767))
+            for gram in grams:
+                postings.setdefault(gram, array('i')).append(position)
+        self.postings = {gram: np.frombuffer(positions, dtype=np.int32) for gram, positions in postings.items()}
+        self.sizes = np.frombuffer(sizes, dtype=np.int16).astype(np.float32)
+
+    def dice(self, value, rows):
+        """Dice coefficient of every row's trigrams with those of `value` (0 where none are shared)."""
+        grams = padded_trigrams(value)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return np.zeros(rows, dtype=np.float32)
+        shared = np.bincount(np.concatenate(lists), minlength=rows).astype(np.float32)
+        return 2 * shared / (len(grams) + self.sizes)
+
+
+class SimilarMarkIndex:
+    """
+    In-process index over every mark, built in the background
+    (background_index.py) from trademarks and mark_keys (rows loaded before
+    mark_keys existed get their keys computed here) and rebuilt after
+    invalidate(). A query is a handful of vectorized passes over the postings
+    of its own trigrams, then a partial sort for the top `limit`.
+    """
+    def __init__(self, engine=None):
+        self._state = BackgroundIndex(self._build, engine, name='similar-marks')
+
+    def start(self):
+        self._state.start()
+
+    def invalidate(self):
+        self._state.invalidate()
+
+    def _build(self, session):
+        rows = session.execute(
+            select(TrademarkModel.id, TrademarkModel.category_code, TrademarkModel.mark_identification,
+                   MarkKeyModel.normalized_mark, MarkKeyModel.phonetic_key, MarkKeyModel.soundex_key)
+            .outerjoin(MarkKeyModel, MarkKeyModel.trademark_id == TrademarkModel.id)
+            .order_by(TrademarkModel.id)
+        ).all()
+        keys = [
+            mark_keys(row.mark_identification) if row.normalized_mark is None else row._mapping
+            for row in rows
+        ]
+        categories = {}
+        soundex_codes = {}
+        return {
+            'ids': np.array([row.id for row in rows], dtype=np.int64),
+            'categories': categories,
+            'category': np.array([categories.setdefault(row.category_code, len(categories)) for row in rows],
+                                 dtype=np.int32),
+            'soundex_codes': soundex_codes,
+            'soundex': np.array([soundex_codes.setdefault(key['soundex_key'], len(soundex_codes)) for key in keys],
+                                dtype=np.int32),
+            'spelling': _TrigramColumn(key['normalized_mark'] for key in keys),
+            'sound': _TrigramColumn(key['phonetic_key'] for key in keys),
+        }
+
+    def _index(self, session):
+        return self._state.get()
+
+    def top_k(self, session, mark, category_code=None, limit=DEFAULT_LIMIT):
+        """[(trademark id, score)] of the `limit` most similar marks, best first."""
+        state = self._index(session)
+        rows = len(state['ids'])
+        query = mark_keys(mark)
+        if not rows or not (query['normalized_mark'] or query['phonetic_key']) or limit <= 0:
+            return []
+
+        score = WEIGHTS['spelling'] * state['spelling'].dice(query['normalized_mark'], rows)
+        score += WEIGHTS['sound'] * state['sound'].dice(query['phonetic_key'], rows)
+        # a shared Soundex code only counts for marks that share a trigram as well
+        candidates = score > 0
+        soundex = state['soundex_codes'].get(query['soundex_key'])
+        if query['soundex_key'] and soundex is not None:
+            score += WEIGHTS['soundex'] * (state['soundex'] == soundex)
+        if category_code is not None:
+            category = state['categories'].get(category_code)
+            if category is None:
+                return []
+            candidates &= state['category'] == category
+
+        positions = np.flatnonzero(candidates)
+        if len(positions) > limit:
+            positions = positions[np.argpartition(-score[positions], limit - 1)[:limit]]
+        # best first, ties by id
+        positions = positions[np.lexsort((state['ids'][positions], -score[positions]))]
+        return [(int(state['ids'][p]), round(float(score[p]), 4)) for p in positions]
+
+
+similar_mark_index = SimilarMarkIndex()
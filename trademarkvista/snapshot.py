@@ -0,0 +1,56 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.pool import QueuePool
+
+# Read-only snapshot mode: with SNAPSHOT_PATH set the API serves from a SQLite
+# file built by uspto_db/build_snapshot.py instead of DATABASE_URL, so a
+# deployment needs no database server. The file is opened read-only and
+# immutable (no locking) and read through mmap, so every gunicorn worker
+# shares the same pages of the OS page cache.
+#
+# SNAPSHOT_MMAP_MB: how much of the file to map (SQLite caps it at its
+# compile-time maximum, 2 GB in most builds); the rest is read with read().
+#
+# A new snapshot is published by renaming it over the old path; connections
+# opened on the old file are replaced when they are next checked out.
+SNAPSHOT_MMAP_MB = int(os.environ.get('SNAPSHOT_MMAP_MB', 2048))
+FTS_TABLE = 'trademarks_fts'
+
+
+def snapshot_url(path, driver='sqlite'):
+    """SQLAlchemy URL opening `path` read-only; immutable tells SQLite nothing else writes to it."""
+    return f'{driver}:///file:{os.path.abspath(path)}?mode=ro&immutable=1&uri=true'
+
+def snapshot_engine_options():
+    """
+    create_engine options for a snapshot: a pool of long-lived connections
+    (SQLAlchemy would open a new one per checkout for a SQLite file) and no
+    pre-ping, as there is no server to lose.
+    """
+    return {
+        'poolclass': QueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_pre_ping': False,
+        'connect_args': {'check_same_thread': False},
+    }
+
+def configure_snapshot_engine(engine, path):
+    """Sets the per-connection pragmas and reconnects once `path` has been replaced."""
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        # the file a connection was opened on; a rename in between is caught
+        # by DB_POOL_RECYCLE at the latest
+        connection_record.info['snapshot_inode'] = os.stat(path).st_ino
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA mmap_size = {SNAPSHOT_MMAP_MB * 1024 * 1024}')
+        cursor.execute('PRAGMA query_only = 1')
+        cursor.close()
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        if os.stat(path).st_ino != connection_record.info.get('snapshot_inode'):
+            # the pool discards the connection and opens the new file
+            raise DisconnectionError(f'{path} was replaced by a new snapshot')
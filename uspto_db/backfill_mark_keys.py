@@ -0,0 +1,46 @@
+import argparse
+import os
+
+from sqlalchemy import create_engine, select
+from tqdm import tqdm
+
+from stream_to_db import BATCH_SIZE, index_marks
+from tables import trademarks, create_tables, bump_data_version
+
+DATABASE_URL = 'postgresql://localhost/trademark_db'
+
+# Fills mark_keys (the similarMarks look-alike / sound-alike keys) for a
+# database loaded before the table existed, e.g. from trademark_db.dump.
+# Rows already indexed are recomputed, so the script can be re-run safely.
+
+def backfill_mark_keys(engine, batch_size=BATCH_SIZE):
+    create_tables(engine)
+    total = 0
+    after_id = 0
+    with tqdm(desc="Indexing marks", unit=" case-files") as progress:
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    select(trademarks.c.id, trademarks.c.serial_number, trademarks.c.mark_identification)
+                    .where(trademarks.c.id > after_id)
+                    .order_by(trademarks.c.id)
+                    .limit(batch_size)
+                ).mappings().all()
+            if not rows:
+                break
+            with engine.begin() as conn:
+                index_marks(conn, rows)
+            after_id = rows[-1]['id']
+            total += len(rows)
+            progress.update(len(rows))
+    bump_data_version(engine)
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the similarMarks keys of every trademark")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', DATABASE_URL))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    total = backfill_mark_keys(create_engine(args.database_url), args.batch_size)
+    print(f"Indexed {total} marks")
@@ -0,0 +1,50 @@
+import argparse
+import os
+
+from sqlalchemy import create_engine, select
+from tqdm import tqdm
+
+from stream_to_db import BATCH_SIZE, link_split_owners, update_summaries
+from tables import trademarks, create_tables, bump_data_version
+
+DATABASE_URL = 'postgresql://localhost/trademark_db'
+
+# Fills owners / trademark_owners for a database loaded before they existed
+# (e.g. from trademark_db.dump). The names come from splitting case_file_owners,
+# which re-ingesting the XML (stream_to_db.py --upsert) replaces with exact ones.
+
+def backfill_owners(engine, batch_size=BATCH_SIZE):
+    create_tables(engine)
+    total = 0
+    after_id = 0
+    with tqdm(desc="Linking owners", unit=" case-files") as progress:
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    select(trademarks.c.id, trademarks.c.serial_number, trademarks.c.case_file_owners)
+                    .where(trademarks.c.id > after_id)
+                    .order_by(trademarks.c.id)
+                    .limit(batch_size)
+                ).mappings().all()
+            if not rows:
+                break
+            # the owner counts follow the re-linked owners
+            serial_numbers = [row['serial_number'] for row in rows]
+            with engine.begin() as conn:
+                update_summaries(conn, serial_numbers, -1)
+                link_split_owners(conn, rows)
+                update_summaries(conn, serial_numbers)
+            after_id = rows[-1]['id']
+            total += len(rows)
+            progress.update(len(rows))
+    bump_data_version(engine)
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the owners tables from case_file_owners")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', DATABASE_URL))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    total = backfill_owners(create_engine(args.database_url), args.batch_size)
+    print(f"Linked owners of {total} case-files")
@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+
+from sqlalchemy import create_engine, event, inspect, select
+from tqdm import tqdm
+
+from tables import trademarks, owners, trademark_owners, mark_keys, data_version, create_tables
+from backfill_owners import backfill_owners
+from backfill_mark_keys import backfill_mark_keys
+from refresh_summaries import refresh_summaries
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+from snapshot import FTS_TABLE
+
+DATABASE_URL = 'postgresql://localhost/trademark_db'
+SNAPSHOT_PATH = 'data/trademarks.sqlite'
+BATCH_SIZE = 50000
+
+# Builds the read-only SQLite snapshot the API serves with SNAPSHOT_PATH set
+# (trademarkvista/snapshot.py) from a loaded database: the trademarks, owners,
+# mark_keys and summary tables with their indexes, plus an FTS5 trigram index
+# for searchMarks. The file is written next to the target, compacted and then
+# renamed over it, so running workers switch to it on their next checkout.
+#
+#   python build_snapshot.py --database-url postgresql://localhost/trademark_db --output data/trademarks.sqlite
+#   SNAPSHOT_PATH=data/trademarks.sqlite gunicorn app:app
+
+COPY_TABLES = [trademarks, owners, trademark_owners, mark_keys]
+# external-content FTS5 table over trademarks: the index only, no second copy of the text
+BUILD_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "mark_identification, case_file_owners, content='trademarks', content_rowid='id', tokenize='trigram')",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')",
+]
+
+def read_version(engine):
+    if not inspect(engine).has_table('data_version'):
+        return 0
+    with engine.connect() as conn:
+        return conn.execute(select(data_version.c.version)).scalar() or 0
+
+def copy_table(source, target, table, batch_size):
+    """Copies every row of `table`, streaming from the source in batches."""
+    if not inspect(source).has_table(table.name):
+        return 0
+    total = 0
+    with source.connect() as conn, tqdm(desc=f"Copying {table.name}", unit=" rows") as progress:
+        result = conn.execution_options(stream_results=True).execute(select(table))
+        for rows in result.mappings().partitions(batch_size):
+            with target.begin() as target_conn:
+                target_conn.execute(table.insert(), [dict(row) for row in rows])
+            total += len(rows)
+            progress.update(len(rows))
+    return total
+
+def build_snapshot(source, path, batch_size=BATCH_SIZE):
+    building = path + '.tmp'
+    if os.path.exists(building):
+        os.remove(building)
+    target = create_engine(f'sqlite:///{building}')
+
+    @event.listens_for(target, 'connect')
+    def bulk_load(dbapi_connection, connection_record):
+        # a half-written file is thrown away anyway
+        dbapi_connection.execute('PRAGMA journal_mode = OFF')
+        dbapi_connection.execute('PRAGMA synchronous = OFF')
+
+    create_tables(target)
+    counts = {table.name: copy_table(source, target, table, batch_size) for table in COPY_TABLES}
+    # databases restored from trademark_db.dump predate these tables
+    if counts['trademarks'] and not counts['owners']:
+        backfill_owners(target, batch_size)
+    if counts['trademarks'] and not counts['mark_keys']:
+        backfill_mark_keys(target, batch_size)
+    # counted afresh rather than copied, so they always match the copied rows
+    refresh_summaries(target)
+
+    # newer than both the source and the snapshot it replaces, so the API's
+    # cached results are dropped when workers move to this file
+    previous = read_version(create_engine(f'sqlite:///{path}')) if os.path.exists(path) else 0
+    version = max(read_version(source), previous) + 1
+    with target.begin() as conn:
+        conn.execute(data_version.delete())
+        conn.execute(data_version.insert().values(id=1, version=version))
+        for statement in BUILD_FTS:
+            conn.exec_driver_sql(statement)
+        conn.exec_driver_sql('ANALYZE')
+    with target.connect() as conn:
+        conn.exec_driver_sql('VACUUM')
+    target.dispose()
+    os.replace(building, path)
+    return counts['trademarks'], version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a read-only SQLite snapshot of the trademarks database")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', DATABASE_URL),
+                        help="database to copy (PostgreSQL or SQLite)")
+    parser.add_argument('--output', default=os.environ.get('SNAPSHOT_PATH', SNAPSHOT_PATH))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    total, version = build_snapshot(create_engine(args.database_url), args.output, args.batch_size)
+    print(f"Wrote {total} trademarks to {args.output} ({os.path.getsize(args.output) / 1024 / 1024:.0f} MB, "
+          f"data version {version})")
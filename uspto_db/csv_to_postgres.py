@@ -2,9 +2,13 @@ import pandas as pd
 from sqlalchemy import create_engine
 import numpy as np
 
+from stream_to_db import split_row_owners, write_case_files
+from tables import create_tables, bump_data_version
+
 def load_data_to_postgres():
     # Create SQLAlchemy engine
     engine = create_engine('postgresql://localhost/trademark_db')
+    create_tables(engine)
     
     # Read CSV file
     df = pd.read_csv('data/csv_files/trademarks_100.csv')
@@ -22,13 +26,13 @@ def load_data_to_postgres():
     # Clean data
     df = df.replace({np.nan: None})
     
-    # Load to PostgreSQL
-    df.to_sql('trademarks', 
-              engine, 
-              if_exists='append',
-              index=False,
-              method='multi',
-              chunksize=1000)
+    # Load to PostgreSQL, updating rows whose serial_number is already present
+    # so re-running the import does not violate the unique constraint
+    for start in range(0, len(df), 1000):
+        rows = df.iloc[start:start + 1000].to_dict('records')
+        write_case_files(engine, rows, split_row_owners(rows), upsert=True)
+
+    bump_data_version(engine)
 
 if __name__ == "__main__":
     try:
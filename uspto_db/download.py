@@ -0,0 +1,163 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from tqdm import tqdm
+
+# Concurrent, resumable downloads of the bulk zip files:
+#   python download.py https://bulkdata.uspto.gov/.../apc240101.zip ... --workers 4
+# Each file streams to <name>.part in CHUNK_SIZE pieces and is renamed once its
+# size matches what the server reported, so a half-written zip never looks
+# finished. Re-running (or retrying) continues a .part file with an HTTP Range
+# request instead of starting over.
+
+CHUNK_SIZE = 1024 * 1024
+RETRIES = 5
+BACKOFF = 1.0  # seconds, doubled after every failed attempt
+TIMEOUT = 60  # seconds to connect / between received chunks
+
+
+class DownloadError(Exception):
+    def __init__(self, message, retry=True):
+        super().__init__(message)
+        # False for answers another attempt will not change (404, 403, ...)
+        self.retry = retry
+
+
+def expected_size(response, offset):
+    """Full file size from a 200/206 response, or None if the server does not say."""
+    if response.status_code == 206:
+        # Content-Range: bytes <start>-<end>/<total>
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def fetch(session, link, part_path, chunk_size=CHUNK_SIZE):
+    """
+    One download attempt into part_path, continuing from its current size.
+    Returns the size the finished file must have (None if unknown).
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    with session.get(link, headers=headers, stream=True, timeout=TIMEOUT) as response:
+        if response.status_code == 416 and offset:
+            # nothing left to send; Content-Range: bytes */<total> says whether the .part file is whole
+            total = response.headers.get('Content-Range', '').rpartition('/')[2]
+            return int(total) if total.isdigit() else offset
+        if response.status_code not in (200, 206):
+            status = response.status_code
+            raise DownloadError(f"{link}: status code {status}", retry=status >= 500 or status in (408, 429))
+        if response.status_code == 200:
+            # the server ignored the Range header, start over
+            offset = 0
+        size = expected_size(response, offset)
+        with open(part_path, 'ab' if offset else 'wb') as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+    return size
+
+
+def retrying(link, attempt, retries=RETRIES, backoff=BACKOFF):
+    """
+    attempt() until it succeeds, retrying network errors and retryable
+    DownloadErrors with exponential backoff; raises DownloadError once
+    retries run out.
+    """
+    for n in range(retries + 1):
+        try:
+            return attempt()
+        except (requests.RequestException, DownloadError) as e:
+            if isinstance(e, DownloadError) and not e.retry:
+                raise
+            if n == retries:
+                raise DownloadError(f"{link}: giving up after {retries + 1} attempts ({e})") from e
+            time.sleep(backoff * 2 ** n)
+
+
+def download_file(link, dest_folder, session=None, retries=RETRIES, backoff=BACKOFF, chunk_size=CHUNK_SIZE):
+    """
+    Downloads link into dest_folder and returns the file's path. Network errors
+    and short reads are retried with exponential backoff, resuming where the
+    previous attempt stopped; raises DownloadError once retries run out.
+    """
+    os.makedirs(dest_folder, exist_ok=True)
+    file_path = os.path.join(dest_folder, link.split('/')[-1])
+    part_path = file_path + '.part'
+    session = session or requests.Session()
+
+    def attempt():
+        size = fetch(session, link, part_path, chunk_size)
+        actual = os.path.getsize(part_path)
+        if size is not None and actual != size:
+            if actual > size:
+                # more bytes than announced: the file changed upstream, restart it
+                os.remove(part_path)
+            raise DownloadError(f"{link}: got {actual} of {size} bytes")
+        os.replace(part_path, file_path)
+        return file_path
+
+    return retrying(link, attempt, retries, backoff)
+
+
+def remote_file_size(link, session=None, retries=RETRIES, backoff=BACKOFF):
+    """
+    Content-Length from a HEAD request, or None if the server does not report
+    it. Failed requests are retried like downloads; raises DownloadError once
+    retries run out.
+    """
+    session = session or requests.Session()
+
+    def attempt():
+        response = session.head(link, allow_redirects=True, timeout=TIMEOUT)
+        if response.status_code != 200:
+            status = response.status_code
+            raise DownloadError(f"{link}: status code {status}", retry=status >= 500 or status in (408, 429))
+        length = response.headers.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+
+    return retrying(link, attempt, retries, backoff)
+
+
+def download_files(links, dest_folder, workers=4, **kwargs):
+    """
+    Downloads links with `workers` concurrent threads. Returns {link: path},
+    with None for the files that could not be fetched.
+    """
+    paths = {}
+    with requests.Session() as session:
+        # one connection per worker, reused across that worker's files
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(download_file, link, dest_folder, session, **kwargs): link for link in links}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Downloading zipped files"):
+                link = futures[future]
+                try:
+                    paths[link] = future.result()
+                except DownloadError as e:
+                    print(f"Failed to download {e}")
+                    paths[link] = None
+    return paths
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download files concurrently, resuming partial downloads")
+    parser.add_argument('links', nargs='+', help="URLs to download")
+    parser.add_argument('--dest', default='data/xml_files_zip', help="destination folder")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent downloads")
+    parser.add_argument('--retries', type=int, default=RETRIES, help="retries per file")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = download_files(args.links, args.dest, workers=args.workers, retries=args.retries)
+    failed = [link for link, path in results.items() if path is None]
+    print(f"Downloaded {len(results) - len(failed)} of {len(results)} files")
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+manifest_path = 'data/manifest.json'
+
+
+def file_checksum(file_path, chunk_size=1024 * 1024):
+    """sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Persisted record of the zip files that have already been ingested
+    (file name -> size, sha256 checksum, row count, ingestion time).
+    """
+    def __init__(self, path=manifest_path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, file_name):
+        return file_name in self.entries
+
+    def is_current(self, file_name, size=None, checksum=None):
+        """True if file_name was ingested and still matches the given size/checksum."""
+        entry = self.entries.get(file_name)
+        if entry is None:
+            return False
+        if size is not None and entry['size'] != size:
+            return False
+        if checksum is not None and entry['sha256'] != checksum:
+            return False
+        return True
+
+    def record(self, file_name, file_path, rows, checksum=None):
+        self.entries[file_name] = {
+            'size': os.path.getsize(file_path),
+            'sha256': checksum or file_checksum(file_path),
+            'rows': rows,
+            'ingested_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        # replace in one step so a crash never leaves a half-written manifest
+        os.replace(tmp_path, self.path)
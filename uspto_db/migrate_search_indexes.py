@@ -0,0 +1,41 @@
+import argparse
+import os
+
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = 'postgresql://localhost/trademark_db'
+
+# pg_trgm GIN indexes used by the searchMarks resolver (trademarkvista/search.py).
+# A trigram GIN index also serves ILIKE '%keyword%', so no query rewrite is needed.
+UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS trademarks_mark_identification_trgm "
+    "ON trademarks USING gin (mark_identification gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS trademarks_case_file_owners_trgm "
+    "ON trademarks USING gin (case_file_owners gin_trgm_ops)",
+    # keyset pagination of trademarksByCategory: WHERE category_code = ? AND id > ? ORDER BY id
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS trademarks_category_code_id "
+    "ON trademarks (category_code, id)",
+    "ANALYZE trademarks",
+]
+
+DOWNGRADE = [
+    "DROP INDEX CONCURRENTLY IF EXISTS trademarks_mark_identification_trgm",
+    "DROP INDEX CONCURRENTLY IF EXISTS trademarks_case_file_owners_trgm",
+    "DROP INDEX CONCURRENTLY IF EXISTS trademarks_category_code_id",
+]
+
+def run(engine, statements):
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for statement in statements:
+            print(statement)
+            conn.execute(text(statement))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create (or drop) the trigram search indexes")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', DATABASE_URL))
+    parser.add_argument('--downgrade', action='store_true', help="drop the indexes again")
+    args = parser.parse_args()
+
+    run(create_engine(args.database_url), DOWNGRADE if args.downgrade else UPGRADE)
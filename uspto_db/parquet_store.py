@@ -0,0 +1,109 @@
+import argparse
+import os
+import re
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+from sqlalchemy import create_engine
+from tqdm import tqdm
+
+from tables import RECORD_COLUMNS, COLUMNS, create_tables, bump_data_version
+
+# Typed, partitioned Parquet copy of the parsed case-files, next to (or instead
+# of) trademarks.csv. Reloading it skips CSV parsing and type guessing, and
+# analytics can read just the columns / partitions they need:
+#   python process_xml.py --output parquet
+#   python parquet_store.py data/parquet --database-url postgresql://localhost/trademark_db --upsert
+
+parquet_path = 'data/parquet'
+BATCH_SIZE = 10000
+PARTITION_KEYS = ('file_date', 'category_code')
+
+# Explicit column types; the low-cardinality codes are dictionary encoded
+SCHEMA = pa.schema([
+    ('category_code', pa.dictionary(pa.int16(), pa.string())),
+    ('mark_identification', pa.string()),
+    ('serial_number', pa.string()),
+    ('case_file_owners', pa.string()),
+    ('status', pa.dictionary(pa.int16(), pa.string())),
+    ('xml_filename', pa.string()),
+    # day of the daily file, from apcYYMMDD.xml
+    ('file_date', pa.string()),
+])
+
+def file_date(xml_filename):
+    match = re.search(r'(\d{2})(\d{2})(\d{2})\.xml$', xml_filename or '')
+    return f"20{match[1]}-{match[2]}-{match[3]}" if match else None
+
+def columns_to_table(columns):
+    """Arrow table from process_xml.extract_columns output (record keys -> value lists)."""
+    data = {column: columns[key] for key, column in RECORD_COLUMNS.items()}
+    # same cleaning as stream_to_db.record_to_row
+    data['case_file_owners'] = [owners or None for owners in data['case_file_owners']]
+    data['file_date'] = [file_date(name) for name in data['xml_filename']]
+    return pa.table(data, schema=SCHEMA)
+
+def write_parquet(columns, dataset_path=parquet_path, partition_by='file_date', basename='part'):
+    """
+    Adds one batch of columns to the dataset as <partition_by>=<value>/<basename>-N.parquet.
+    Writing the same basename again replaces those files, so re-runs are idempotent.
+    """
+    if partition_by not in PARTITION_KEYS:
+        raise ValueError(f"partition_by must be one of {PARTITION_KEYS}")
+    ds.write_dataset(
+        columns_to_table(columns),
+        dataset_path,
+        format='parquet',
+        partitioning=[partition_by],
+        partitioning_flavor='hive',
+        basename_template=f'{basename}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+def open_dataset(dataset_path=parquet_path):
+    # Partition values are read back as plain strings ('005', not 5), so the
+    # partition columns are strings in the dataset schema whichever was used
+    string_keys = pa.schema([(key, pa.string()) for key in PARTITION_KEYS])
+    schema = pa.schema([
+        field.with_type(pa.string()) if field.name in PARTITION_KEYS else field for field in SCHEMA
+    ])
+    return ds.dataset(
+        dataset_path,
+        format='parquet',
+        schema=schema,
+        partitioning=ds.partitioning(string_keys, flavor='hive'),
+    )
+
+def iter_parquet_batches(dataset_path=parquet_path, batch_size=BATCH_SIZE, columns=COLUMNS, filter=None):
+    """
+    Yields lists of row dicts, `batch_size` at a time, so memory stays bounded
+    by one record batch. `filter` is a pyarrow expression, e.g.
+    ds.field('category_code') == '009', and skips partitions that cannot match.
+    """
+    for batch in open_dataset(dataset_path).to_batches(columns=columns, filter=filter, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pylist()
+
+def load_parquet_to_db(engine, dataset_path=parquet_path, batch_size=BATCH_SIZE, upsert=False):
+    from stream_to_db import split_row_owners, write_case_files
+
+    create_tables(engine)
+    total = 0
+    for rows in tqdm(iter_parquet_batches(dataset_path, batch_size), desc="Loading Parquet batches"):
+        write_case_files(engine, rows, split_row_owners(rows), upsert)
+        total += len(rows)
+    bump_data_version(engine)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a Parquet dataset written by process_xml.py into the trademarks table")
+    parser.add_argument('dataset', nargs='?', default=parquet_path)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', 'postgresql://localhost/trademark_db'))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--upsert', action='store_true',
+                        help="update existing serial numbers instead of failing on duplicates")
+    args = parser.parse_args()
+
+    total = load_parquet_to_db(create_engine(args.database_url), args.dataset, args.batch_size, args.upsert)
+    print(f"Loaded {total} rows")
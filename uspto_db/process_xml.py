@@ -5,12 +5,22 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import zipfile
+import argparse
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from lxml import etree
 
+from manifest import Manifest, file_checksum, manifest_path
+import download
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+from metrics import ingest_stage, timed_iter, report_ingest
+
 
 ''' ---------------Define Variables----------------'''
-# URL of the website to scrape
-url = 'https://bulkdata.uspto.gov/data/trademark/dailyxml/applications/'
+# URL of the website to scrape (point USPTO_BULK_URL at a local mirror for testing)
+url = os.environ.get('USPTO_BULK_URL', 'https://bulkdata.uspto.gov/data/trademark/dailyxml/applications/')
 
 pattern = re.compile(r'^apc2401\d{2}\.zip$') # only jan mon of 2024
 path_base = 'data/xml_files_zip'
@@ -23,10 +33,14 @@ def unzip_file(zip_file_path, dest_folder):
     with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
         zip_ref.extractall(dest_folder)
     
-def extract_info_from_large_xml(xml_file_path):
-    filename = os.path.basename(xml_file_path)
-    context = etree.iterparse(xml_file_path, events=('end',), tag='case-file')
-    data = []
+def iter_case_files(xml_file, filename=None):
+    """
+    Yields one record dict per <case-file> element as the file is parsed,
+    so callers can consume the records without holding the whole file.
+    xml_file is a path or a binary file object (then pass its filename).
+    """
+    filename = filename or os.path.basename(xml_file)
+    context = etree.iterparse(xml_file, events=('end',), tag='case-file')
 
     for event, elem in context:
         case_file_data = {}
@@ -51,9 +65,11 @@ def extract_info_from_large_xml(xml_file_path):
             party_names = []
             for owner in owners:
                 party_name_elem = owner.find('party-name')
-                if party_name_elem is not None:
+                if party_name_elem is not None and party_name_elem.text is not None:
                     party_names.append(party_name_elem.text)
             case_file_data['Case-File-Owners'] = ', '.join(party_names) 
+            # kept as a list too: names can contain ', ' themselves
+            case_file_data['owners'] = party_names
             
             # Extract status code
             status_elem = elem.find('case-file-header/status-code')
@@ -63,93 +79,378 @@ def extract_info_from_large_xml(xml_file_path):
             case_file_data['xml_filename'] = filename
 
         if case_file_data:
-            data.append(case_file_data)
+            yield case_file_data
         
         # Clear the element to free memory
         elem.clear()
         while elem.getprevious() is not None:
             del elem.getparent()[0]
 
-    return data
+# Table-driven extractor: (record key, path below <case-file>, joined).
+# Joined fields collect every match into one ', '-separated string; the
+# others keep the first match. Case-files without REQUIRED_FIELD are skipped.
+CASE_FILE_FIELDS = [
+    ('category-code', 'classifications/classification/international-code', False),
+    ('mark-identification', 'case-file-header/mark-identification', False),
+    ('serial-number', 'serial-number', False),
+    ('Case-File-Owners', 'case-file-owners/case-file-owner/party-name', True),
+    ('status', 'case-file-header/status-code', False),
+]
+REQUIRED_FIELD = 'category-code'
+# more USPTO fields, e.g. extract_columns(path, fields=CASE_FILE_FIELDS + EXTRA_FIELDS)
+EXTRA_FIELDS = [
+    ('filing-date', 'case-file-header/filing-date', False),
+    ('registration-number', 'registration-number', False),
+    ('goods-services', 'case-file-statements/case-file-statement/text', True),
+]
+
+def new_columns(fields=CASE_FILE_FIELDS):
+    return {key: [] for key, _, _ in fields} | {'xml_filename': []}
+
+def extract_columns(xml_file, filename=None, fields=CASE_FILE_FIELDS, columns=None):
+    """
+    Faster, columnar counterpart of iter_case_files: returns {record key: list of values}
+    (appending to `columns` if given). iterparse only reports the leaf tags named in
+    `fields`, so each value is picked up as it is parsed instead of searching every
+    <case-file> again with find().
+    """
+    filename = filename or os.path.basename(xml_file)
+    columns = columns if columns is not None else new_columns(fields)
+    # leaf tag -> [(key, ancestor tags from the parent up, joined)]
+    by_tag = {}
+    for key, path, joined in fields:
+        *ancestors, tag = path.split('/')
+        by_tag.setdefault(tag, []).append((key, ancestors[::-1], joined))
+    appenders = [(key, joined, columns[key].append) for key, _, joined in fields]
+    append_filename = columns['xml_filename'].append
+
+    values = {}
+    for event, elem in etree.iterparse(xml_file, events=('end',), tag=['case-file', *by_tag]):
+        if elem.tag != 'case-file':
+            for key, ancestors, joined in by_tag[elem.tag]:
+                node = elem.getparent()
+                for ancestor in ancestors:
+                    if node is None or node.tag != ancestor:
+                        break
+                    node = node.getparent()
+                else:
+                    # the path must start right below <case-file>
+                    if node is None or node.tag != 'case-file':
+                        continue
+                    if joined:
+                        if elem.text is not None:
+                            values.setdefault(key, []).append(elem.text)
+                    elif key not in values:
+                        values[key] = elem.text
+            continue
+
+        if REQUIRED_FIELD in values:
+            for key, joined, append in appenders:
+                value = values.get(key)
+                append(', '.join(value or ()) if joined else value)
+            append_filename(filename)
+        values = {}
+
+        # Clear the element to free memory
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    return columns
+
+def read_columns(file_path, fields=CASE_FILE_FIELDS):
+    """extract_columns for an XML file, or for every XML file inside a .zip archive."""
+    if not file_path.endswith('.zip'):
+        return extract_columns(file_path, fields=fields)
+    columns = new_columns(fields)
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        for member in sorted(m for m in zip_ref.namelist() if m.endswith('.xml')):
+            with zip_ref.open(member) as xml_file:
+                extract_columns(xml_file, os.path.basename(member), fields, columns)
+    return columns
+
+def iter_zipped_case_files(zip_file_path):
+    """
+    Parses the XML members of a zip archive straight from the decompressing
+    stream: nothing is extracted to disk and each member is read once.
+    """
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        for member in sorted(m for m in zip_ref.namelist() if m.endswith('.xml')):
+            with zip_ref.open(member) as xml_file:
+                yield from iter_case_files(xml_file, os.path.basename(member))
+
+def read_case_files(file_path):
+    """Records from an XML file, or from every XML file inside a .zip archive."""
+    if file_path.endswith('.zip'):
+        return iter_zipped_case_files(file_path)
+    return iter_case_files(file_path)
+
+def extract_info_from_large_xml(xml_file_path):
+    return list(read_case_files(xml_file_path))
+
+def bounded_map(executor, fn, items, window):
+    """
+    executor.map(fn, items) in order, but with at most `window` calls submitted
+    ahead of the consumer, so results of a slow consumer do not pile up.
+    """
+    pending = deque()
+    try:
+        for item in items:
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(executor.submit(fn, item))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def iter_file_columns(xml_files, extracted_path, workers=1):
+    """
+    Yields (file name, columns) per file, in the order of xml_files. With
+    workers > 1 the files are parsed on a pool of worker processes, each
+    worker handling whole files and at most 2 * workers files parsed ahead.
+    """
+    xml_file_paths = [os.path.join(extracted_path, f) for f in xml_files]
+    if workers <= 1:
+        results = map(read_columns, xml_file_paths)
+        desc = "Processing XML files"
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = bounded_map(executor, read_columns, xml_file_paths, 2 * workers)
+        desc = f"Processing XML files ({workers} workers)"
+    try:
+        parsed = tqdm(zip(xml_files, results), total=len(xml_files), desc=desc)
+        yield from timed_iter(parsed, 'parse', count=lambda item: len(item[1]['xml_filename']))
+    finally:
+        if workers > 1:
+            results.close()
+            executor.shutdown()
+
+def iter_file_records(xml_file_paths, workers=1):
+    """
+    The records of each file in turn, for stream_to_db. With workers > 1 the
+    next files (at most 2 * workers) are parsed on worker processes while the
+    current one is consumed.
+    """
+    if workers <= 1:
+        yield from map(read_case_files, xml_file_paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = bounded_map(executor, extract_info_from_large_xml, xml_file_paths, 2 * workers)
+        try:
+            yield from results
+        finally:
+            results.close()
 
 def process_xml_files_to_dataframe(xml_files,extracted_path):
-    all_data = []
-    
-    for filename in tqdm(xml_files, desc="Processing XML files"):
-        xml_file_path = os.path.join(extracted_path, filename)
-        file_data = extract_info_from_large_xml(xml_file_path)
-        all_data.extend(file_data)
-    # Create a DataFrame from the aggregated data
-    df = pd.DataFrame(all_data)
+    return process_xml_files_parallel(xml_files, extracted_path, 1)
+
+def process_xml_files_parallel(xml_files, extracted_path, workers):
+    """
+    Parses the XML files (on `workers` processes) into one DataFrame.
+    Results are merged in the order of xml_files so the output does not
+    depend on which worker finishes first.
+    """
+    columns = new_columns()
+    for _, file_columns in iter_file_columns(xml_files, extracted_path, workers):
+        for key, values in file_columns.items():
+            columns[key].extend(values)
+    # Create a DataFrame from the aggregated columns
+    df = pd.DataFrame(columns)
     return df
 
+def save_files_to_parquet(xml_files, extracted_path, workers, partition_by='file_date'):
+    """Writes each file's case-files to the Parquet dataset as soon as it is parsed."""
+    from parquet_store import parquet_path, write_parquet
+
+    total = 0
+    for xml_file, columns in iter_file_columns(xml_files, extracted_path, workers):
+        with ingest_stage('write') as stage:
+            write_parquet(columns, parquet_path, partition_by, basename=os.path.splitext(xml_file)[0])
+            stage['items'] = len(columns['xml_filename'])
+        total += stage['items']
+    return total
+
 def save_dataframe_to_csv(df, output_csv_path):
     path = os.path.join(output_csv_path, f"trademarks.csv")
     # Write the DataFrame to a CSV file
-    df.to_csv(path, index=False)
+    with ingest_stage('write') as stage:
+        df.to_csv(path, index=False)
+        stage['items'], stage['bytes'] = len(df), os.path.getsize(path)
 
 
-''' -------------Main Code-----------------'''
+def list_zip_links(file_pattern=pattern):
+    # Send a GET request to the website
+    response = requests.get(url)
 
-# Send a GET request to the website
-response = requests.get(url)
+    if response.status_code != 200:
+        print(f"Failed to retrieve the webpage. Status code: {response.status_code}")
+        return []
 
-if response.status_code == 200:
     print(f" Status code: {response.status_code}")
     soup = BeautifulSoup(response.content, 'html.parser')
     # Find all <a> tags
     links = soup.find_all('a')
-    if not os.path.exists(path_base):
-        os.makedirs(path_base)
-
     # Filter and collect links whose names match the specified pattern
-    apc_links = [url + link.get('href') for link in links if pattern.match(link.get('href'))]
-    # Download each file
-    for link in tqdm(apc_links, desc="Downloading zipped files"):
+    return [url + link.get('href') for link in links if file_pattern.match(link.get('href') or '')]
+
+def download_file(link, dest_folder=path_base):
+    """Downloads one file into dest_folder, returning its path (None on failure)."""
+    try:
+        return download.download_file(link, dest_folder)
+    except download.DownloadError as e:
+        print(f"Failed to download {e}")
+        return None
+
+def download_zip_files(file_pattern=pattern, workers=4):
+    apc_links = list_zip_links(file_pattern)
+    # several files at a time, streamed to disk and resumed if interrupted
+    with ingest_stage('download', unit='files') as stage:
+        paths = [p for p in download.download_files(apc_links, path_base, workers=workers).values() if p]
+        stage['items'], stage['bytes'] = len(paths), sum(os.path.getsize(p) for p in paths)
+
+def already_ingested(manifest, file_name, link):
+    """
+    True if the manifest has file_name at the size the server reports now.
+    A size the server does not report (or a HEAD request that keeps failing)
+    proves nothing: the file is downloaded and checked against its checksum.
+    """
+    try:
+        size = download.remote_file_size(link)
+    except download.DownloadError as e:
+        print(f"Could not get the size of {file_name}: {e}")
+        return False
+    return size is not None and manifest.is_current(file_name, size=size)
+
+def ingest_incremental(engine, manifest, file_pattern=pattern):
+    """
+    Downloads and ingests only the zip files that are not in the manifest yet
+    (or whose size/checksum changed), upserting their case-files on serial_number.
+    Each file is recorded in the manifest as soon as it is loaded, so an
+    interrupted run picks up where it stopped.
+    """
+    from stream_to_db import stream_xml_files_to_db
+
+    for link in list_zip_links(file_pattern):
         file_name = link.split('/')[-1]
-        file_response = requests.get(link)
-        if file_response.status_code == 200:
-            with open(os.path.join(path_base, file_name), 'wb') as file:
-                file.write(file_response.content)
-        else:
-            print(f"Failed to download {file_name}. Status code: {file_response.status_code}")
-else:
-    print(f"Failed to retrieve the webpage. Status code: {response.status_code}")
-
-print('~~~~~~~~~~~~~zipped files downloaded!')
-
-#extract zipped files
-zip_files = [f for f in os.listdir(path_base) if f.endswith('.zip')]
-for zip_file in tqdm(zip_files, desc="Extracting zipped files"):
-    zip_file_path = os.path.join(path_base, zip_file)
-    unzip_file(zip_file_path, extracted_path_base)
-
-print('~~~~~~~~~~~~~zipped files extracted!')
-
-
-# Process XML files and get the DataFrame
-xml_files = [f for f in os.listdir(extracted_path_base) if f.endswith('.xml')]
-print(f"Number of XML files: {len(xml_files)}")
-#split xml_files into 2 halves
-xml_files1 = xml_files[:len(xml_files)//2]
-xml_files2 = xml_files[len(xml_files)//2:]
-
-print('1st half WIP')
-df1 = process_xml_files_to_dataframe(xml_files1,extracted_path_base)
-
-print('2nd half WIP')
-df2 = process_xml_files_to_dataframe(xml_files2,extracted_path_base)
-# Combine the two DataFrames
-df = pd.concat([df1, df2], ignore_index=True)
-print('Done! saving to csv')
-save_dataframe_to_csv(df, output_csv_path)
-
-# delete contents of extracted folder
-for f in os.listdir(path_base):
-    os.remove(os.path.join(path_base, f))
-
-#delete zipped files
-for f in os.listdir(extracted_path_base):
-    os.remove(os.path.join(extracted_path_base, f))
-
-print('~~~~~~~~~~~~~cleaned up!')
\ No newline at end of file
+        if already_ingested(manifest, file_name, link):
+            print(f"Skipping {file_name}, already ingested")
+            continue
+
+        with ingest_stage('download', unit='files') as stage:
+            zip_file_path = download_file(link)
+            if zip_file_path is not None:
+                stage['items'], stage['bytes'] = 1, os.path.getsize(zip_file_path)
+        if zip_file_path is None:
+            continue
+        checksum = file_checksum(zip_file_path)
+        if manifest.is_current(file_name, checksum=checksum):
+            print(f"Skipping {file_name}, unchanged since last ingest")
+            os.remove(zip_file_path)
+            continue
+
+        # parsed straight out of the archive, nothing is extracted
+        rows = stream_xml_files_to_db([zip_file_path], engine, upsert=True)
+
+        manifest.record(file_name, zip_file_path, rows, checksum=checksum)
+        manifest.save()
+        print(f"Ingested {file_name}: {rows} case-files")
+
+        os.remove(zip_file_path)
+
+def extract_zip_files():
+    zip_files = [f for f in os.listdir(path_base) if f.endswith('.zip')]
+    for zip_file in tqdm(zip_files, desc="Extracting zipped files"):
+        zip_file_path = os.path.join(path_base, zip_file)
+        with ingest_stage('unzip', unit='files') as stage:
+            unzip_file(zip_file_path, extracted_path_base)
+            with zipfile.ZipFile(zip_file_path) as archive:
+                stage['items'], stage['bytes'] = 1, sum(info.file_size for info in archive.infolist())
+
+def clean_up():
+    # delete zipped files
+    for f in os.listdir(path_base):
+        os.remove(os.path.join(path_base, f))
+
+    # delete extracted xml files (there are none with --from-zip)
+    if not os.path.isdir(extracted_path_base):
+        return
+    for f in os.listdir(extracted_path_base):
+        os.remove(os.path.join(extracted_path_base, f))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download and parse USPTO daily trademark XML files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="number of processes used to parse XML files (1 = serial)")
+    parser.add_argument('--download-workers', type=int, default=4,
+                        help="number of zip files downloaded concurrently")
+    parser.add_argument('--database-url',
+                        help="stream records straight into this database instead of writing trademarks.csv")
+    parser.add_argument('--output', choices=['csv', 'parquet'], default='csv',
+                        help="write trademarks.csv or a partitioned Parquet dataset (see parquet_store.py)")
+    parser.add_argument('--partition-by', choices=['file_date', 'category_code'], default='file_date',
+                        help="partition column of the Parquet dataset")
+    parser.add_argument('--pattern', default=pattern.pattern,
+                        help="regex for the zip file names to fetch")
+    parser.add_argument('--from-zip', action='store_true',
+                        help="parse the XML inside the downloaded zips directly instead of extracting them first")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only ingest files missing from the manifest and upsert them (needs --database-url)")
+    parser.add_argument('--manifest', default=manifest_path,
+                        help="manifest of already ingested files used by --incremental")
+    parser.add_argument('--metrics-file', default=os.environ.get('METRICS_TEXTFILE'),
+                        help="write per-stage timings/throughput here in Prometheus format (e.g. for node_exporter)")
+    return parser.parse_args()
+
+
+''' -------------Main Code-----------------'''
+
+def main():
+    args = parse_args()
+    file_pattern = re.compile(args.pattern)
+
+    if args.incremental:
+        if not args.database_url:
+            raise SystemExit("--incremental needs --database-url")
+        from sqlalchemy import create_engine
+        ingest_incremental(create_engine(args.database_url), Manifest(args.manifest), file_pattern)
+        report_ingest(args.metrics_file)
+        return
+
+    download_zip_files(file_pattern, args.download_workers)
+    print('~~~~~~~~~~~~~zipped files downloaded!')
+
+    if args.from_zip:
+        # decompress and parse in one pass, no scratch copy of the XML
+        source_path = path_base
+        xml_files = sorted(f for f in os.listdir(path_base) if f.endswith('.zip'))
+    else:
+        #extract zipped files
+        extract_zip_files()
+        print('~~~~~~~~~~~~~zipped files extracted!')
+        source_path = extracted_path_base
+        xml_files = sorted(f for f in os.listdir(extracted_path_base) if f.endswith('.xml'))
+
+    # Process XML files and get the DataFrame
+    print(f"Number of {'zip' if args.from_zip else 'XML'} files: {len(xml_files)}")
+    if args.database_url:
+        from sqlalchemy import create_engine
+        from stream_to_db import stream_xml_files_to_db
+        xml_file_paths = [os.path.join(source_path, f) for f in xml_files]
+        total = stream_xml_files_to_db(xml_file_paths, create_engine(args.database_url), upsert=True,
+                                       workers=args.workers)
+        print(f'Done! streamed {total} rows to the database')
+    elif args.output == 'parquet':
+        total = save_files_to_parquet(xml_files, source_path, args.workers, args.partition_by)
+        print(f'Done! wrote {total} rows to the Parquet dataset')
+    else:
+        df = process_xml_files_parallel(xml_files, source_path, args.workers)
+        print('Done! saving to csv')
+        save_dataframe_to_csv(df, output_csv_path)
+
+    clean_up()
+    print('~~~~~~~~~~~~~cleaned up!')
+    report_ingest(args.metrics_file)
+
+if __name__ == '__main__':
+    main()
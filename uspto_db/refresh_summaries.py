@@ -0,0 +1,32 @@
+import argparse
+import os
+
+from sqlalchemy import create_engine
+
+from stream_to_db import SUMMARY_UPDATES, DROP_EMPTY_SUMMARIES
+from tables import category_status_counts, owner_category_counts, filing_day_counts, create_tables, bump_data_version
+
+DATABASE_URL = 'postgresql://localhost/trademark_db'
+
+# Recounts the summary tables behind the aggregate GraphQL fields from scratch,
+# for a database loaded before they existed (e.g. from trademark_db.dump, after
+# backfill_owners.py). The ingestion scripts keep them current from then on.
+
+def refresh_summaries(engine):
+    create_tables(engine)
+    with engine.begin() as conn:
+        for table in (category_status_counts, owner_category_counts, filing_day_counts):
+            conn.execute(table.delete())
+        for statement in SUMMARY_UPDATES:
+            conn.exec_driver_sql(statement.format(sign='', source='trademarks t'))
+        for statement in DROP_EMPTY_SUMMARIES:
+            conn.exec_driver_sql(statement)
+    bump_data_version(engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the category / status / owner / filing-day counts")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', DATABASE_URL))
+    args = parser.parse_args()
+
+    refresh_summaries(create_engine(args.database_url))
+    print("Summary tables rebuilt")
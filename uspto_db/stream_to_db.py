@@ -0,0 +1,337 @@
+import argparse
+import csv
+import io
+import os
+import sys
+from itertools import islice
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import sqlite
+from tqdm import tqdm
+
+from process_xml import iter_file_records
+from tables import trademarks, RECORD_COLUMNS, COLUMNS, create_tables, bump_data_version
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trademarkvista'))
+from normalize import normalize_owner, split_owners
+from phonetic import mark_keys
+from metrics import ingest_stage, timed_iter, report_ingest
+
+DATABASE_URL = 'postgresql://localhost/trademark_db'
+BATCH_SIZE = 10000
+
+
+def batched(iterable, size):
+    """Yields lists of at most `size` items from any iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def record_to_row(record):
+    """Maps a parsed case-file record to a trademarks row (missing fields -> None)."""
+    row = {column: record.get(key) for key, column in RECORD_COLUMNS.items()}
+    if not row['case_file_owners']:
+        row['case_file_owners'] = None
+    return row
+
+def copy_rows(connection, rows, table='trademarks', columns=COLUMNS):
+    """Bulk loads rows with COPY FROM STDIN on a raw psycopg2 connection."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # an unquoted empty field is NULL in COPY's csv format
+        writer.writerow(['' if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+def write_batch(conn, rows):
+    """Writes one batch: COPY on PostgreSQL, executemany INSERT elsewhere (e.g. SQLite)."""
+    if conn.dialect.name == 'postgresql':
+        copy_rows(conn.connection, rows)
+    else:
+        conn.execute(trademarks.insert(), rows)
+
+def dedupe_rows(rows):
+    """
+    Keeps the last row for each serial number. ON CONFLICT cannot touch the
+    same row twice in one statement, and later records are the newer ones.
+    """
+    by_serial = {}
+    without_serial = []
+    for row in rows:
+        if row['serial_number'] is None:
+            without_serial.append(row)
+        else:
+            by_serial[row['serial_number']] = row
+    return without_serial + list(by_serial.values())
+
+UPSERT_FROM_STAGING = (
+    f"INSERT INTO trademarks ({', '.join(COLUMNS)}) "
+    f"SELECT {', '.join(COLUMNS)} FROM trademarks_staging "
+    f"ON CONFLICT (serial_number) DO UPDATE SET "
+    + ', '.join(f"{c} = EXCLUDED.{c}" for c in COLUMNS if c != 'serial_number')
+    # skip rewriting case-files that did not change
+    + f" WHERE ({', '.join('trademarks.' + c for c in COLUMNS)}) "
+    f"IS DISTINCT FROM ({', '.join('EXCLUDED.' + c for c in COLUMNS)})"
+)
+
+def upsert_batch(conn, rows):
+    """
+    Inserts new case-files and updates changed ones, keyed on serial_number.
+    On PostgreSQL the batch is COPYed into a temporary staging table and merged
+    with a single INSERT ... ON CONFLICT DO UPDATE; on the SQLite stand-in the
+    same upsert is run with executemany.
+    """
+    rows = dedupe_rows(rows)
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE IF NOT EXISTS trademarks_staging ON COMMIT DELETE ROWS AS "
+            f"SELECT {', '.join(COLUMNS)} FROM trademarks WITH NO DATA"
+        )
+        conn.exec_driver_sql("DELETE FROM trademarks_staging")
+        copy_rows(conn.connection, rows, table='trademarks_staging')
+        conn.exec_driver_sql(UPSERT_FROM_STAGING)
+        return
+
+    stmt = sqlite.insert(trademarks)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['serial_number'],
+        set_={c: stmt.excluded[c] for c in COLUMNS if c != 'serial_number'}
+    )
+    conn.execute(stmt, rows)
+
+# seen: order of the row in the batch, so an owner keeps its first spelling
+OWNER_STAGING_COLUMNS = [
+    ('serial_number', 'varchar(20)'), ('position', 'integer'), ('name', 'text'), ('normalized_name', 'text'),
+    ('seen', 'integer'),
+]
+
+# Statements shared by PostgreSQL and SQLite, run after the batch's owners are
+# in owner_staging (serial numbers without owners have a row with NULL names)
+LINK_OWNERS = [
+    "INSERT INTO owners (name, normalized_name) "
+    "SELECT s.name, s.normalized_name FROM owner_staging s "
+    "JOIN (SELECT normalized_name, MIN(seen) AS seen FROM owner_staging "
+    "WHERE normalized_name IS NOT NULL GROUP BY normalized_name) f "
+    "ON f.normalized_name = s.normalized_name AND f.seen = s.seen WHERE true "
+    "ON CONFLICT (normalized_name) DO NOTHING",
+    # re-ingested case-files get their current owners only
+    "DELETE FROM trademark_owners WHERE trademark_id IN ("
+    "SELECT id FROM trademarks WHERE serial_number IN (SELECT serial_number FROM owner_staging))",
+    "INSERT INTO trademark_owners (trademark_id, owner_id, position) "
+    "SELECT t.id, o.id, MIN(s.position) FROM owner_staging s "
+    "JOIN trademarks t ON t.serial_number = s.serial_number "
+    "JOIN owners o ON o.normalized_name = s.normalized_name "
+    "GROUP BY t.id, o.id",
+]
+
+def owner_staging_rows(owners_by_serial):
+    """(serial number, owner names) pairs -> owner_staging rows; the last pair per serial wins."""
+    latest = {serial_number: names for serial_number, names in owners_by_serial if serial_number is not None}
+    rows = []
+    for serial_number, names in latest.items():
+        linked = [name for name in names if normalize_owner(name)]
+        for position, name in enumerate(linked):
+            rows.append({'serial_number': serial_number, 'position': position,
+                         'name': name, 'normalized_name': normalize_owner(name), 'seen': len(rows)})
+        if not linked:
+            rows.append({'serial_number': serial_number, 'position': 0, 'name': None, 'normalized_name': None,
+                         'seen': len(rows)})
+    return rows
+
+def fill_staging(conn, table, columns, rows):
+    """
+    Replaces the rows of a temp table (created on first use) inside the
+    caller's transaction: COPY on PostgreSQL, executemany elsewhere. `columns`
+    is a list of (name, type) pairs. A batch can stage the same table twice
+    in its transaction, so earlier rows are cleared first.
+    """
+    definition = ', '.join(f'{name} {type_}' for name, type_ in columns)
+    names = [name for name, _ in columns]
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql(f"CREATE TEMP TABLE IF NOT EXISTS {table} ({definition}) ON COMMIT DELETE ROWS")
+        conn.exec_driver_sql(f"DELETE FROM {table}")
+        copy_rows(conn.connection, rows, table=table, columns=names)
+    else:
+        conn.exec_driver_sql(f"CREATE TEMP TABLE IF NOT EXISTS {table} ({definition})")
+        conn.exec_driver_sql(f"DELETE FROM {table}")
+        conn.execute(text(f"INSERT INTO {table} VALUES ({', '.join(':' + name for name in names)})"), rows)
+
+def link_owners(conn, owners_by_serial):
+    """
+    Fills owners / trademark_owners for a batch of already written case-files:
+    the names are staged in bulk (COPY on PostgreSQL), then merged with three
+    set-based statements.
+    """
+    rows = owner_staging_rows(owners_by_serial)
+    if not rows:
+        return
+    fill_staging(conn, 'owner_staging', OWNER_STAGING_COLUMNS, rows)
+    for statement in LINK_OWNERS:
+        conn.exec_driver_sql(statement)
+
+def split_row_owners(rows):
+    """(serial number, owner names) pairs of trademarks rows that only have the joined case_file_owners string (CSV, Parquet)."""
+    return [(row['serial_number'], split_owners(row['case_file_owners'])) for row in rows]
+
+def link_split_owners(conn, rows):
+    """link_owners for trademarks rows without parsed owner lists."""
+    link_owners(conn, split_row_owners(rows))
+
+MARK_KEY_STAGING_COLUMNS = [
+    ('serial_number', 'varchar(20)'), ('normalized_mark', 'text'), ('phonetic_key', 'text'), ('soundex_key', 'text'),
+]
+
+INDEX_MARKS = [
+    "DELETE FROM mark_keys WHERE trademark_id IN ("
+    "SELECT id FROM trademarks WHERE serial_number IN (SELECT serial_number FROM mark_key_staging))",
+    # COPY reads the empty keys of a wordless mark back as NULL
+    "INSERT INTO mark_keys (trademark_id, normalized_mark, phonetic_key, soundex_key) "
+    "SELECT t.id, COALESCE(s.normalized_mark, ''), COALESCE(s.phonetic_key, ''), COALESCE(s.soundex_key, '') "
+    "FROM mark_key_staging s "
+    "JOIN trademarks t ON t.serial_number = s.serial_number",
+]
+
+def index_marks(conn, rows):
+    """Stores the look-alike / sound-alike keys (phonetic.mark_keys) of a batch of written trademarks rows."""
+    latest = {row['serial_number']: row['mark_identification'] for row in rows if row['serial_number'] is not None}
+    staged = [dict(mark_keys(mark), serial_number=serial_number) for serial_number, mark in latest.items()]
+    if not staged:
+        return
+    fill_staging(conn, 'mark_key_staging', MARK_KEY_STAGING_COLUMNS, staged)
+    for statement in INDEX_MARKS:
+        conn.exec_driver_sql(statement)
+
+SUMMARY_STAGING_COLUMNS = [('serial_number', 'varchar(20)')]
+STAGED_CASE_FILES = "trademarks t JOIN summary_staging s ON s.serial_number = t.serial_number"
+
+# Adds {sign}1 per case-file of {source} to each summary table (see tables.py).
+# The WHERE clauses also keep SQLite from reading ON CONFLICT as a join constraint.
+SUMMARY_UPDATES = [
+    "INSERT INTO category_status_counts (category_code, status, total) "
+    "SELECT COALESCE(t.category_code, ''), COALESCE(t.status, ''), {sign}COUNT(*) FROM {source} "
+    "WHERE t.serial_number IS NOT NULL "
+    "GROUP BY COALESCE(t.category_code, ''), COALESCE(t.status, '') "
+    "ON CONFLICT (category_code, status) DO UPDATE SET total = category_status_counts.total + excluded.total",
+    "INSERT INTO owner_category_counts (owner_id, category_code, total) "
+    "SELECT o.owner_id, COALESCE(t.category_code, ''), {sign}COUNT(*) FROM {source} "
+    "JOIN trademark_owners o ON o.trademark_id = t.id WHERE t.serial_number IS NOT NULL "
+    "GROUP BY o.owner_id, COALESCE(t.category_code, '') "
+    "ON CONFLICT (owner_id, category_code) DO UPDATE SET total = owner_category_counts.total + excluded.total",
+    "INSERT INTO filing_day_counts (xml_filename, total) "
+    "SELECT COALESCE(t.xml_filename, ''), {sign}COUNT(*) FROM {source} "
+    "WHERE t.serial_number IS NOT NULL GROUP BY COALESCE(t.xml_filename, '') "
+    "ON CONFLICT (xml_filename) DO UPDATE SET total = filing_day_counts.total + excluded.total",
+]
+DROP_EMPTY_SUMMARIES = [
+    f"DELETE FROM {table} WHERE total <= 0"
+    for table in ('category_status_counts', 'owner_category_counts', 'filing_day_counts')
+]
+
+def update_summaries(conn, serial_numbers, sign=1):
+    """
+    Counts case-files into (sign=1) or out of (sign=-1) the summary tables as
+    they are stored now. Rewritten case-files are counted out before the write
+    and back in after it (and after their owners are linked), so each batch
+    costs the same however large the tables have grown. Both calls belong in
+    the batch's transaction (see write_case_files): a batch that fails in
+    between must not stay counted out.
+    """
+    staged = [{'serial_number': serial_number} for serial_number in dict.fromkeys(serial_numbers)
+              if serial_number is not None]
+    if not staged:
+        return
+    fill_staging(conn, 'summary_staging', SUMMARY_STAGING_COLUMNS, staged)
+    for statement in SUMMARY_UPDATES:
+        conn.exec_driver_sql(statement.format(sign='-' if sign < 0 else '', source=STAGED_CASE_FILES))
+    for statement in DROP_EMPTY_SUMMARIES:
+        conn.exec_driver_sql(statement)
+
+def write_case_files(engine, rows, owners_by_serial, upsert=False):
+    """
+    Stores one batch of trademarks rows with their owners, mark keys and
+    summary counts in a single transaction, so an interrupted load leaves
+    either all of the batch or none of it.
+    """
+    serial_numbers = [row['serial_number'] for row in rows]
+    with engine.begin() as conn:
+        if upsert:
+            with ingest_stage('summaries'):
+                update_summaries(conn, serial_numbers, -1)
+        with ingest_stage('write') as stage:
+            if upsert:
+                upsert_batch(conn, rows)
+            else:
+                write_batch(conn, rows)
+            stage['items'] = len(rows)
+        with ingest_stage('link_owners') as stage:
+            link_owners(conn, owners_by_serial)
+            stage['items'] = len(rows)
+        with ingest_stage('index_marks') as stage:
+            index_marks(conn, rows)
+            stage['items'] = len(rows)
+        with ingest_stage('summaries') as stage:
+            update_summaries(conn, serial_numbers)
+            stage['items'] = len(rows)
+
+def stream_records_to_db(records, engine, batch_size=BATCH_SIZE, upsert=False):
+    """
+    Streams parsed records into the trademarks table in fixed-size batches.
+    Only one batch is held in memory at a time. Returns the number of records read.
+    """
+    total = 0
+    # parse: time spent reading the next batch out of the XML
+    for batch in timed_iter(batched(records, batch_size), 'parse', count=len):
+        rows = [record_to_row(record) for record in batch]
+        owners_by_serial = [(record.get('serial-number'), record.get('owners', [])) for record in batch]
+        write_case_files(engine, rows, owners_by_serial, upsert)
+        total += len(rows)
+    return total
+
+def stream_xml_files_to_db(xml_file_paths, engine, batch_size=BATCH_SIZE, upsert=False, workers=1):
+    create_tables(engine)
+    total = 0
+    # .zip paths are parsed straight from the archive; with workers > 1 the
+    # next files are parsed on other processes while this one is written
+    records = iter_file_records(xml_file_paths, workers)
+    for file_records in tqdm(records, total=len(xml_file_paths), desc="Streaming XML files to database"):
+        total += stream_records_to_db(iter(file_records), engine, batch_size, upsert)
+    bump_data_version(engine)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream USPTO XML files straight into the trademarks table")
+    parser.add_argument('xml_files', nargs='+', help="XML or zip files (or directories of them) to load")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL', DATABASE_URL))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--upsert', action='store_true',
+                        help="update existing serial numbers instead of failing on duplicates")
+    parser.add_argument('--metrics-file', default=os.environ.get('METRICS_TEXTFILE'),
+                        help="write per-stage timings/throughput here in Prometheus format")
+    parser.add_argument('--snapshot', help="also write a read-only SQLite snapshot of the database here "
+                                           "(see build_snapshot.py)")
+    args = parser.parse_args()
+
+    xml_file_paths = []
+    for path in args.xml_files:
+        if os.path.isdir(path):
+            xml_file_paths.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(('.xml', '.zip'))))
+        else:
+            xml_file_paths.append(path)
+
+    engine = create_engine(args.database_url)
+    total = stream_xml_files_to_db(xml_file_paths, engine, args.batch_size, args.upsert)
+    print(f"Loaded {total} rows")
+    if args.snapshot:
+        from build_snapshot import build_snapshot
+        with ingest_stage('snapshot') as stage:
+            stage['items'], _ = build_snapshot(engine, args.snapshot)
+    report_ingest(args.metrics_file)
@@ -0,0 +1,113 @@
+from sqlalchemy import MetaData, Table, Column, DateTime, ForeignKey, Index, Integer, String, Text, func
+
+# Table definitions used by the ingestion scripts.
+# Mirrors TrademarkModel in trademarkvista/app.py and the schema in trademark_db.dump.
+metadata = MetaData()
+
+trademarks = Table(
+    'trademarks', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('category_code', String(10)),
+    Column('mark_identification', Text),
+    Column('serial_number', String(20), unique=True),
+    Column('case_file_owners', Text),
+    Column('status', String(50)),
+    Column('xml_filename', String(255)),
+    Index('trademarks_category_code_id', 'category_code', 'id'),
+)
+
+# One row per distinct owner; normalized_name (see trademarkvista/normalize.py)
+# is the lookup key, name the first spelling seen
+owners = Table(
+    'owners', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', Text, nullable=False),
+    Column('normalized_name', Text, nullable=False, unique=True),
+)
+
+# Which owners hold which trademark, in the order the case-file lists them
+trademark_owners = Table(
+    'trademark_owners', metadata,
+    Column('trademark_id', Integer, ForeignKey('trademarks.id', ondelete='CASCADE'), primary_key=True),
+    Column('owner_id', Integer, ForeignKey('owners.id', ondelete='CASCADE'), primary_key=True),
+    Column('position', Integer, nullable=False),
+    # an owner's portfolio, already in trademark id order for keyset pages
+    Index('trademark_owners_owner_id_trademark_id', 'owner_id', 'trademark_id'),
+)
+
+# Look-alike / sound-alike keys of each mark (see trademarkvista/phonetic.py),
+# computed at ingest for the similarMarks index
+mark_keys = Table(
+    'mark_keys', metadata,
+    Column('trademark_id', Integer, ForeignKey('trademarks.id', ondelete='CASCADE'), primary_key=True),
+    Column('normalized_mark', Text, nullable=False),
+    Column('phonetic_key', Text, nullable=False),
+    Column('soundex_key', String(4), nullable=False),
+    # exact sound-alike lookups
+    Index('mark_keys_phonetic_key', 'phonetic_key'),
+    Index('mark_keys_soundex_key', 'soundex_key'),
+)
+
+# Precomputed counts behind the aggregate GraphQL fields, kept up to date batch
+# by batch by the ingestion scripts (stream_to_db.update_summaries). '' stands
+# for a missing category / status / file name: key columns cannot be NULL.
+category_status_counts = Table(
+    'category_status_counts', metadata,
+    Column('category_code', String(10), primary_key=True),
+    Column('status', String(50), primary_key=True),
+    Column('total', Integer, nullable=False),
+)
+
+owner_category_counts = Table(
+    'owner_category_counts', metadata,
+    Column('owner_id', Integer, ForeignKey('owners.id', ondelete='CASCADE'), primary_key=True),
+    Column('category_code', String(10), primary_key=True),
+    Column('total', Integer, nullable=False),
+    # top owners of a class: read backwards from the biggest total
+    Index('owner_category_counts_category_code_total', 'category_code', 'total'),
+)
+
+# case-files per USPTO daily file (apcYYMMDD.xml)
+filing_day_counts = Table(
+    'filing_day_counts', metadata,
+    Column('xml_filename', String(255), primary_key=True),
+    Column('total', Integer, nullable=False),
+)
+
+# Single row, bumped after every load so the API can drop its cached results
+# (read by trademarkvista/db.py read_data_version)
+data_version = Table(
+    'data_version', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('updated_at', DateTime),
+)
+
+# Parsed record keys (see process_xml.iter_case_files) -> trademarks columns
+RECORD_COLUMNS = {
+    'category-code': 'category_code',
+    'mark-identification': 'mark_identification',
+    'serial-number': 'serial_number',
+    'Case-File-Owners': 'case_file_owners',
+    'status': 'status',
+    'xml_filename': 'xml_filename',
+}
+COLUMNS = list(RECORD_COLUMNS.values())
+
+def create_tables(engine):
+    metadata.create_all(engine)
+
+def bump_data_version(engine):
+    """
+    Marks the data as changed: every loader calls this once it has written,
+    and the API drops its cached query results and rebuilds its in-process
+    indexes when it sees the new version.
+    """
+    with engine.begin() as conn:
+        updated = conn.execute(
+            data_version.update()
+            .where(data_version.c.id == 1)
+            .values(version=data_version.c.version + 1, updated_at=func.now())
+        ).rowcount
+        if not updated:
+            conn.execute(data_version.insert().values(id=1, version=1, updated_at=func.now()))